@@ -3,8 +3,9 @@ from __future__ import annotations
 import math
 from collections import defaultdict
 from dataclasses import dataclass
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
 
+from .pipeline_context import PipelineContext
 from .week_agg import week_id_from_night_id
 
 STATUS_ORDER: tuple[str, ...] = ("P", "B", "O")
@@ -73,8 +74,13 @@ def _night_meta_from_doc(doc: dict) -> NightMeta | None:
     return NightMeta(night_id=night_id, pre=pre_meta, post=post_meta)
 
 
-def _collect_attendance_stats(db) -> Tuple[List[str], List[PlayerAttendance]]:
-    night_docs = list(db["night_qa"].find({}, {"_id": 0}))
+def _collect_attendance_stats(
+    db, context: Optional[PipelineContext] = None
+) -> Tuple[List[str], List[PlayerAttendance]]:
+    if context is not None:
+        night_docs = context.night_qa_docs()
+    else:
+        night_docs = list(db["night_qa"].find({}, {"_id": 0}))
     night_meta_by_id: Dict[str, NightMeta] = {}
     weeks: Dict[str, List[str]] = defaultdict(list)
 
@@ -92,10 +98,14 @@ def _collect_attendance_stats(db) -> Tuple[List[str], List[PlayerAttendance]]:
     all_night_ids = sorted(night_meta_by_id.keys())
     week_ids = sorted(weeks.keys())
 
-    bench_docs = list(db["bench_night_totals"].find({}, {"_id": 0}))
+    if context is not None:
+        bench_docs = context.bench_night_docs()
+        roster_docs = context.team_roster
+    else:
+        bench_docs = list(db["bench_night_totals"].find({}, {"_id": 0}))
+        roster_docs = list(db["team_roster"].find({}, {"_id": 0}))
     bench_by_key = {(doc["night_id"], doc["main"]): doc for doc in bench_docs}
 
-    roster_docs = list(db["team_roster"].find({}, {"_id": 0}))
     roster: Dict[str, dict] = {doc["main"]: doc for doc in roster_docs if doc.get("main")}
 
     bench_mains = {doc["main"] for doc in bench_docs if doc.get("main")}
@@ -198,8 +208,8 @@ def _collect_attendance_stats(db) -> Tuple[List[str], List[PlayerAttendance]]:
     return week_ids, players
 
 
-def build_attendance_rows(db) -> List[List]:
-    week_ids, players = _collect_attendance_stats(db)
+def build_attendance_rows(db, context: Optional[PipelineContext] = None) -> List[List]:
+    week_ids, players = _collect_attendance_stats(db, context)
 
     header = [
         "Player",
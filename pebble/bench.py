@@ -0,0 +1,402 @@
+"""Reproducible benchmarks driven by the ``pebble bench`` commands."""
+
+from __future__ import annotations
+
+import logging
+import random
+import time
+from datetime import datetime, timedelta
+from typing import List, Mapping, Optional, Tuple
+
+from .config_loader import (
+    CacheConfig,
+    MongoConfig,
+    Settings,
+    SheetsConfig,
+    SheetsTriggers,
+    WCLConfig,
+)
+from .blocks import build_blocks, build_blocks_from_fights
+from .boss_index import BossIntervalIndex
+from .ingest import REPORT_HEADERS, ingest_reports
+from .night_compute import NightInputs, NightTimeSettings, compute_nights
+from .participation import build_mythic_participation
+from .utils.names import NameResolver
+from .utils.time import PT
+from .wcl_client import clear_shared_clients, get_shared_client
+from .wcl_standin import StandinOptions, WCLStandin
+
+logger = logging.getLogger(__name__)
+
+
+class _NullSheetsClient:
+    """Sheets client for runs whose rows are supplied up front."""
+
+    svc = None
+
+    def execute(self, _req):
+        raise RuntimeError("benchmarks do not talk to Google Sheets")
+
+
+def _bench_settings(
+    standin: WCLStandin, *, concurrency: int, batch_size: int, events_presence: bool = False
+) -> Settings:
+    return Settings(
+        sheets=SheetsConfig(
+            spreadsheet_id="bench",
+            triggers=SheetsTriggers(ingest_compute_week="Reports!B2"),
+        ),
+        # Never connected to: bench runs hand ingest an in-process database.
+        mongo=MongoConfig(uri="mongodb://bench.invalid"),
+        wcl=WCLConfig(
+            client_id="bench",
+            client_secret="bench",
+            base_url=standin.base_url,
+            token_url=standin.token_url,
+            max_concurrency=concurrency,
+            batch_size=batch_size,
+            share_token=False,
+            events_presence=events_presence,
+        ),
+        cache=CacheConfig(backend="memory"),
+    )
+
+
+def bench_ingest(
+    recordings: Mapping[str, dict],
+    options: Optional[StandinOptions] = None,
+    *,
+    concurrency: int = 4,
+    batch_size: int = 1,
+    iterations: int = 2,
+    events_presence: bool = False,
+) -> dict:
+    """Run ``ingest_reports`` against a :class:`WCLStandin` serving ``recordings``.
+
+    Every iteration forces a full reingest of all recorded reports into an
+    in-process ``mongomock`` database. The first one starts with a cold
+    cache; later iterations measure the warm path. ``events_presence`` also
+    walks the recordings' ``events``, which must then be present. Returns
+    per-iteration timings plus the stand-in's request counters.
+    """
+
+    import mongomock
+
+    if events_presence and not any(bundle.get("events") for bundle in recordings.values()):
+        raise ValueError("events_presence needs recordings with events (see 'bench record --events')")
+
+    header = list(REPORT_HEADERS)
+    rows = [header] + [
+        [f"https://www.warcraftlogs.com/reports/{code}"] + [""] * (len(header) - 1)
+        for code in recordings
+    ]
+    runs = []
+    with WCLStandin(recordings, options) as standin:
+        settings = _bench_settings(
+            standin,
+            concurrency=concurrency,
+            batch_size=batch_size,
+            events_presence=events_presence,
+        )
+        db = mongomock.MongoClient().db
+        clear_shared_clients()
+        try:
+            for i in range(max(1, iterations)):
+                before = standin.stats.as_dict()
+                started = time.perf_counter()
+                res = ingest_reports(
+                    settings, rows=rows, client=_NullSheetsClient(), force_full_reingest=True, db=db
+                )
+                elapsed_ms = round((time.perf_counter() - started) * 1000, 1)
+                after = standin.stats.as_dict()
+                run = {
+                    "iteration": i + 1,
+                    "elapsed_ms": elapsed_ms,
+                    "reports": res.get("reports", 0),
+                    "fights": res.get("fights", 0),
+                    "presence_intervals": res.get("presence_intervals", 0),
+                    "graphql_requests": after["graphql_requests"] - before["graphql_requests"],
+                    "throttled": after["throttled"] - before["throttled"],
+                    "server_errors": after["server_errors"] - before["server_errors"],
+                    "cache": res.get("cache"),
+                }
+                logger.info("bench ingest iteration", extra=run)
+                runs.append(run)
+            get_shared_client(settings).wait_for_refreshes(timeout=30)
+        finally:
+            clear_shared_clients()
+        stats = standin.stats.as_dict()
+    return {
+        "reports": len(recordings),
+        "concurrency": concurrency,
+        "batch_size": batch_size,
+        "runs": runs,
+        "standin": stats,
+    }
+
+
+def synthetic_night(
+    pulls: int = 300,
+    mains: int = 20,
+    *,
+    non_mythic_share: float = 0.15,
+    seed: int = 0,
+    night_id: str = "2024-01-01",
+    start_ms: int = 1_704_164_400_000,  # 2024-01-01 19:00 PT
+    names: Optional[List[str]] = None,
+) -> Tuple[List[dict], List[dict]]:
+    """Build ``fights_all`` and Mythic participation rows for a long prog night.
+
+    Pulls last 2-6 minutes with 30-120 second gaps; roughly
+    ``non_mythic_share`` of them are non-Mythic boss kills and each main sits
+    out about one Mythic pull in ten. ``names`` replaces the generated
+    ``MainNN`` player names.
+    """
+
+    rng = random.Random(seed)
+    t = start_ms
+    fights: List[dict] = []
+    rows: List[dict] = []
+    names = list(names or [f"Main{i:02d}" for i in range(mains)])
+    for i in range(pulls):
+        start = t + rng.randint(30, 120) * 1000
+        end = start + rng.randint(120, 360) * 1000
+        t = end
+        mythic = rng.random() >= non_mythic_share
+        fights.append(
+            {
+                "night_id": night_id,
+                "report_code": f"R{night_id}",
+                "id": i + 1,
+                "encounter_id": 3000 + i % 8,
+                "is_mythic": mythic,
+                "fight_abs_start_ms": start,
+                "fight_abs_end_ms": end,
+            }
+        )
+        if mythic:
+            present = [name for name in names if rng.random() >= 0.1]
+            fights[-1]["participants"] = [{"name": name} for name in present]
+            rows.extend(
+                {"main": name, "night_id": night_id, "fight_id": i + 1, "start_ms": start, "end_ms": end}
+                for name in present
+            )
+    return fights, rows
+
+
+def _best_of_ms(fn, iterations: int) -> float:
+    timings = []
+    for _ in range(max(1, iterations)):
+        started = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - started) * 1000)
+    return round(min(timings), 3)
+
+
+def _linear_has_nm_boss_between(fights_all: List[dict], s: int, e: int) -> bool:
+    # The scan build_blocks did before the interval index, kept as a baseline.
+    for f in fights_all:
+        if not f.get("is_mythic") and f.get("encounter_id", 0) > 0:
+            if s <= f.get("fight_abs_start_ms", 0) and f.get("fight_abs_end_ms", 0) <= e:
+                return True
+    return False
+
+
+def bench_blocks(
+    *, pulls: int = 300, mains: int = 20, iterations: int = 5, seed: int = 0
+) -> dict:
+    """Time block building on a :func:`synthetic_night`.
+
+    Reports ``build_blocks`` wall time, the participation rows plus
+    ``build_blocks`` path against the fused :func:`build_blocks_from_fights`
+    and, for the gap queries ``build_blocks`` issues (consecutive pulls of
+    each main), the time spent by the interval index versus a linear scan
+    over the night's fights.
+    """
+
+    fights, rows = synthetic_night(pulls, mains, seed=seed)
+    gaps = []
+    by_main: dict = {}
+    for r in rows:
+        by_main.setdefault(r["main"], []).append(r)
+    for main_rows in by_main.values():
+        main_rows.sort(key=lambda r: r["start_ms"])
+        gaps.extend((a["end_ms"], b["start_ms"]) for a, b in zip(main_rows, main_rows[1:]))
+
+    def best_of(fn) -> float:
+        return _best_of_ms(fn, iterations)
+
+    index = BossIntervalIndex(fights)
+    indexed = [index.has_non_mythic_within(s, e) for s, e in gaps]
+    linear = [_linear_has_nm_boss_between(fights, s, e) for s, e in gaps]
+    if indexed != linear:
+        raise AssertionError("interval index disagrees with the linear scan")
+
+    blocks = build_blocks(rows, break_range=None, fights_all=fights)
+    fights_m = [f for f in fights if f["is_mythic"]]
+
+    def via_rows() -> list:
+        part_rows = build_mythic_participation(fights_m)
+        return build_blocks(part_rows, break_range=None, boss_index=index)
+
+    def fused() -> list:
+        return build_blocks_from_fights(fights_m, break_range=None, boss_index=index)
+
+    if fused() != via_rows():
+        raise AssertionError("fused block builder disagrees with build_blocks")
+    res = {
+        "pulls": pulls,
+        "mains": mains,
+        "rows": len(rows),
+        "gap_queries": len(gaps),
+        "blocks": len(blocks),
+        "index_build_ms": best_of(lambda: BossIntervalIndex(fights)),
+        "index_queries_ms": best_of(lambda: [index.has_non_mythic_within(s, e) for s, e in gaps]),
+        "linear_queries_ms": best_of(lambda: [_linear_has_nm_boss_between(fights, s, e) for s, e in gaps]),
+        "build_blocks_ms": best_of(lambda: build_blocks(rows, break_range=None, fights_all=fights)),
+        "participation_blocks_ms": best_of(via_rows),
+        "fused_blocks_ms": best_of(fused),
+    }
+    logger.info("bench blocks", extra=res)
+    return res
+
+
+def synthetic_season(
+    weeks: int = 30,
+    *,
+    nights_per_week: int = 2,
+    pulls: int = 40,
+    mains: int = 20,
+    bench_size: int = 6,
+    seed: int = 0,
+) -> Tuple[List[NightInputs], List[dict]]:
+    """Build night inputs and ``team_roster`` docs for ``weeks`` raid weeks.
+
+    Nights fall on Wednesdays and Thursdays (then the following days) from
+    2024-01-03. Each night draws ``mains`` of the ``mains + bench_size``
+    rostered players plus an occasional unrostered pug; every other night
+    carries a break override, and some nights an availability override.
+    Two roster entries join late or leave early.
+    """
+
+    rng = random.Random(seed)
+    roster_names = [f"Raider{i:02d}" for i in range(mains + bench_size)]
+    roster = [{"main": name, "active": True} for name in roster_names]
+    if len(roster) > 2:
+        roster[-1]["join_night"] = "2024-03-01"
+        roster[-2]["leave_night"] = "2024-02-15"
+    first = datetime(2024, 1, 3, 19, 0, tzinfo=PT)
+    inputs: List[NightInputs] = []
+    for week in range(weeks):
+        for n in range(nights_per_week):
+            start = first + timedelta(days=7 * week + n)
+            night_id = start.strftime("%Y-%m-%d")
+            names = [f"{name}-Illidan" for name in rng.sample(roster_names, mains)]
+            if rng.random() < 0.2:
+                names[-1] = "Pug-Stormrage"
+            fights, _ = synthetic_night(
+                pulls,
+                mains,
+                seed=rng.randrange(1 << 30),
+                night_id=night_id,
+                start_ms=int(start.timestamp() * 1000),
+                names=names,
+            )
+            for f in fights:
+                f["participants"] = f.get("participants") or [{"name": name} for name in names]
+            report = {
+                "code": f"R{night_id}",
+                "night_id": night_id,
+                "start_ms": fights[0]["fight_abs_start_ms"] - 60_000,
+                "end_ms": fights[-1]["fight_abs_end_ms"] + 60_000,
+            }
+            if len(inputs) % 2:
+                middle = fights[len(fights) // 2]
+                report["break_override_start_ms"] = middle["fight_abs_start_ms"]
+                report["break_override_end_ms"] = middle["fight_abs_start_ms"] + 15 * 60_000
+            overrides = {}
+            if rng.random() < 0.3:
+                overrides[rng.choice(roster_names)] = rng.choice(
+                    [{"pre": False}, {"post": True}, {"pre": 30}, {"post": -20}]
+                )
+            inputs.append(
+                NightInputs(night=night_id, fights_all=fights, reports=[report], overrides=overrides)
+            )
+    return inputs, roster
+
+
+def bench_season(
+    *,
+    weeks: int = 60,
+    nights_per_week: int = 2,
+    pulls: int = 40,
+    mains: int = 20,
+    iterations: int = 3,
+    seed: int = 0,
+) -> dict:
+    """Time the loop and columnar engines on a :func:`synthetic_season`.
+
+    Covers the night stage (blocks and bench rows for every night) and the
+    season stage (week totals, rankings and attendance over an in-process
+    ``mongomock`` database), after checking that both engines agree.
+    """
+
+    import mongomock
+
+    from .attendance import build_attendance_rows
+    from .season_engine import compute_nights_columnar, materialize_season_frame
+    from .week_agg import materialize_rankings, materialize_week_totals
+
+    inputs, roster = synthetic_season(weeks, nights_per_week=nights_per_week, pulls=pulls, mains=mains, seed=seed)
+    resolver = NameResolver([r["main"] for r in roster])
+    ts = NightTimeSettings(
+        break_start_pt="20:30",
+        break_end_pt="21:30",
+        min_gap_minutes=10,
+        max_gap_minutes=30,
+        mythic_post_extension_min=5,
+    )
+
+    loop_results = compute_nights(inputs, resolver, ts)
+    columnar_results = compute_nights_columnar(inputs, resolver, ts)
+    if loop_results != columnar_results:
+        raise AssertionError("columnar engine disagrees with the loop engine on nights")
+
+    db = mongomock.MongoClient().db
+    db["team_roster"].insert_many([dict(r) for r in roster])
+    for result in loop_results:
+        if result is None:
+            continue
+        db["night_qa"].insert_one(dict(result.qa_doc))
+        if result.bench_docs:
+            db["bench_night_totals"].insert_many([dict(doc) for doc in result.bench_docs])
+
+    def loop_season():
+        _, week_docs = materialize_week_totals(db, include_docs=True)
+        _, ranking_docs = materialize_rankings(db, include_docs=True)
+        return week_docs, ranking_docs, build_attendance_rows(db)
+
+    def strip(docs):
+        return [{k: v for k, v in doc.items() if k not in ("_id", "updated_at")} for doc in docs]
+
+    loop_weeks, loop_ranks, loop_attendance = loop_season()
+    frame_weeks, frame_ranks, frame_attendance = materialize_season_frame(db)
+    if (
+        strip(loop_weeks) != strip(frame_weeks)
+        or strip(loop_ranks) != strip(frame_ranks)
+        or loop_attendance != frame_attendance
+    ):
+        raise AssertionError("columnar engine disagrees with the loop engine on season totals")
+
+    res = {
+        "weeks": weeks,
+        "nights": len(inputs),
+        "bench_rows": sum(len(r.bench_docs) for r in loop_results if r),
+        "week_rows": len(loop_weeks),
+        "loop_nights_ms": _best_of_ms(lambda: compute_nights(inputs, resolver, ts), iterations),
+        "columnar_nights_ms": _best_of_ms(lambda: compute_nights_columnar(inputs, resolver, ts), iterations),
+        "loop_season_ms": _best_of_ms(loop_season, iterations),
+        "columnar_season_ms": _best_of_ms(lambda: materialize_season_frame(db), iterations),
+    }
+    logger.info("bench season", extra=res)
+    return res
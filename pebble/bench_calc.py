@@ -1,6 +1,7 @@
 from __future__ import annotations
 from typing import Dict, Iterable, List, Optional, Set, Union
 
+from .boss_index import BossIntervalIndex
 from .utils.names import NameResolver
 
 # Availability inference policy (V2):
@@ -158,20 +159,15 @@ def last_non_mythic_boss_mains(
     roster_map: Optional[Dict[str, str]] = None,
     *,
     resolver: Optional[NameResolver] = None,
+    boss_index: Optional[BossIntervalIndex] = None,
 ) -> Set[str]:
     """Return mains who appeared in the last non-Mythic boss fight before Mythic."""
 
     roster_map = roster_map or {}
     # Only consider non-Mythic fights with a valid encounter id (boss pulls).
-    non_mythic_pre = [
-        f
-        for f in fights_all
-        if not f.get("is_mythic") and f.get("encounter_id", 0) > 0 and f.get("fight_abs_start_ms", 0) < mythic_start_ms
-    ]
-    if not non_mythic_pre:
+    last_nm = (boss_index or BossIntervalIndex(fights_all)).last_non_mythic_before(mythic_start_ms)
+    if last_nm is None:
         return set()
-
-    last_nm = max(non_mythic_pre, key=lambda f: f.get("fight_abs_start_ms", 0))
     mains: Set[str] = set()
     for p in last_nm.get("participants", []):
         name = p.get("name")
@@ -0,0 +1,251 @@
+"""NumPy engine for the bench calculation.
+
+Computes the same rows as :func:`pebble.bench_calc.bench_minutes_for_night`
+with array operations over every (night, main) pair at once. Per-night
+inputs are flattened into one row per main; availability inference, last
+fight credit, extensions and overrides then become ``np.where`` selections
+instead of per-main branches. Batching many nights into one call (see
+:func:`bench_minutes_for_nights`) is where the engine pays off; a single
+short night is dominated by the fixed cost of building the arrays.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Sequence, Union
+
+import numpy as np
+
+MS_PER_MIN = 60000
+
+# Override codes per half: no override, explicit bool, signed minutes.
+_OV_NONE = 0
+_OV_BOOL = 1
+_OV_MINUTES = 2
+
+_STATUS = np.array(["none", "blocks", "last_fight", "override"], dtype=object)
+
+
+@dataclass
+class BenchNight:
+    """Arguments of :func:`pebble.bench_calc.bench_minutes_for_night` for one night."""
+
+    blocks: List[dict]
+    pre_ms: int
+    post_ms: int
+    overrides: Dict[str, Dict[str, Optional[Union[bool, int]]]] = field(default_factory=dict)
+    last_fight_mains: Iterable[str] = ()
+    roster_map: Dict[str, str] = field(default_factory=dict)
+    pre_extension_ms: int = 0
+    pre_extension_mains: Iterable[str] = ()
+    post_extension_ms: int = 0
+    post_extension_mains: Iterable[str] = ()
+
+
+def _override_code(value) -> tuple[int, int]:
+    # Mirrors the isinstance checks of the scalar engine: bools first since
+    # bool is an int, anything else counts as no override.
+    if isinstance(value, bool):
+        return _OV_BOOL, int(value)
+    if isinstance(value, int):
+        return _OV_MINUTES, value
+    return _OV_NONE, 0
+
+
+def _half_available(played, full, avail, avail_ms, code, value):
+    """Apply one half's override codes to the inferred availability."""
+
+    is_bool = code == _OV_BOOL
+    avail = np.where(is_bool, value.astype(bool), avail)
+    avail_ms = np.where(is_bool, np.where(value > 0, full, played), avail_ms)
+
+    numeric = np.where(
+        value > 0,
+        np.minimum(full, value * MS_PER_MIN),
+        np.maximum(0, full - np.abs(value) * MS_PER_MIN),
+    )
+    numeric = np.maximum(numeric, played)
+    is_minutes = code == _OV_MINUTES
+    avail_ms = np.where(is_minutes, numeric, avail_ms)
+    avail = np.where(is_minutes, numeric > 0, avail)
+    return avail, avail_ms
+
+
+def bench_minutes_for_nights(nights: Sequence[BenchNight]) -> List[List[dict]]:
+    """Return the bench rows of every night in ``nights``, in order."""
+
+    mains: List[str] = []
+    night_of_row: List[int] = []
+    pre_raw: List[int] = []
+    post_raw: List[int] = []
+    in_pre_ext: List[bool] = []
+    in_post_ext: List[bool] = []
+    in_last: List[bool] = []
+    pre_code: List[int] = []
+    pre_value: List[int] = []
+    post_code: List[int] = []
+    post_value: List[int] = []
+    has_override: List[bool] = []
+    counts: List[int] = []
+
+    for n, night in enumerate(nights):
+        roster_map = night.roster_map or {}
+        overrides = night.overrides or {}
+        last_fight = set(night.last_fight_mains or [])
+        pre_ext = set(night.pre_extension_mains or [])
+        post_ext = set(night.post_extension_mains or [])
+        played: Dict[str, List[int]] = {}
+        for b in night.blocks:
+            main = roster_map.get(b["main"], b["main"])
+            halves = played.setdefault(main, [0, 0])
+            halves[0 if b["half"] == "pre" else 1] += b["end_ms"] - b["start_ms"]
+
+        night_mains = sorted(set(played) | set(overrides) | last_fight)
+        counts.append(len(night_mains))
+        for main in night_mains:
+            halves = played.get(main, (0, 0))
+            ov = overrides.get(main) or {}
+            mains.append(main)
+            night_of_row.append(n)
+            pre_raw.append(halves[0])
+            post_raw.append(halves[1])
+            in_pre_ext.append(main in pre_ext)
+            in_post_ext.append(main in post_ext)
+            in_last.append(main in last_fight)
+            code, value = _override_code(ov.get("pre"))
+            pre_code.append(code)
+            pre_value.append(value)
+            code, value = _override_code(ov.get("post"))
+            post_code.append(code)
+            post_value.append(value)
+            has_override.append(ov.get("pre") is not None or ov.get("post") is not None)
+
+    if not mains:
+        return [[] for _ in nights]
+
+    idx = np.asarray(night_of_row, dtype=np.intp)
+    pre_full = np.asarray([n.pre_ms for n in nights], dtype=np.int64)[idx]
+    post_full = np.asarray([n.post_ms for n in nights], dtype=np.int64)[idx]
+    pre_ext_ms = np.asarray([max(0, int(n.pre_extension_ms)) for n in nights], dtype=np.int64)[idx]
+    post_ext_ms = np.asarray([max(0, int(n.post_extension_ms)) for n in nights], dtype=np.int64)[idx]
+
+    pre_raw_a = np.asarray(pre_raw, dtype=np.int64)
+    post_raw_a = np.asarray(post_raw, dtype=np.int64)
+    last = np.asarray(in_last, dtype=bool)
+
+    pre_played = np.where(
+        (pre_ext_ms > 0) & np.asarray(in_pre_ext, dtype=bool),
+        np.minimum(pre_full, pre_raw_a + pre_ext_ms),
+        pre_raw_a,
+    )
+    post_played = np.where(
+        (post_ext_ms > 0) & np.asarray(in_post_ext, dtype=bool),
+        np.minimum(post_full, post_raw_a + post_ext_ms),
+        post_raw_a,
+    )
+
+    # Playing either half implies availability for both; last fight credit
+    # covers the whole envelope.
+    inferred = (pre_played > 0) | (post_raw_a > 0)
+    pre_avail = inferred | last
+    post_avail = inferred | last
+    pre_avail_ms = np.where(inferred | last, pre_full, pre_played)
+    post_avail_ms = np.where(inferred | last, post_full, post_played)
+
+    pre_avail, pre_avail_ms = _half_available(
+        pre_played,
+        pre_full,
+        pre_avail,
+        pre_avail_ms,
+        np.asarray(pre_code, dtype=np.int8),
+        np.asarray(pre_value, dtype=np.int64),
+    )
+    post_avail, post_avail_ms = _half_available(
+        post_played,
+        post_full,
+        post_avail,
+        post_avail_ms,
+        np.asarray(post_code, dtype=np.int8),
+        np.asarray(post_value, dtype=np.int64),
+    )
+
+    pre_bench = np.where(pre_avail, np.maximum(0, pre_avail_ms - pre_played), 0)
+    post_bench = np.where(post_avail, np.maximum(0, post_avail_ms - post_played), 0)
+
+    played_pre_min = pre_played // MS_PER_MIN
+    played_post_min = post_played // MS_PER_MIN
+    bench_pre_min = pre_bench // MS_PER_MIN
+    bench_post_min = post_bench // MS_PER_MIN
+
+    status = _STATUS[
+        np.select(
+            [np.asarray(has_override, dtype=bool), last, (pre_played > 0) | (post_played > 0)],
+            [3, 2, 1],
+            default=0,
+        )
+    ]
+
+    columns = zip(
+        mains,
+        bench_pre_min.tolist(),
+        bench_post_min.tolist(),
+        (bench_pre_min + bench_post_min).tolist(),
+        played_pre_min.tolist(),
+        played_post_min.tolist(),
+        (played_pre_min + played_post_min).tolist(),
+        pre_avail.tolist(),
+        post_avail.tolist(),
+        status.tolist(),
+    )
+    rows = [
+        {
+            "main": main,
+            "bench_pre_min": b_pre,
+            "bench_post_min": b_post,
+            "bench_total_min": b_total,
+            "played_pre_min": p_pre,
+            "played_post_min": p_post,
+            "played_total_min": p_total,
+            "avail_pre": a_pre,
+            "avail_post": a_post,
+            "status_source": source,
+        }
+        for main, b_pre, b_post, b_total, p_pre, p_post, p_total, a_pre, a_post, source in columns
+    ]
+
+    out: List[List[dict]] = []
+    offset = 0
+    for count in counts:
+        out.append(rows[offset : offset + count])
+        offset += count
+    return out
+
+
+def bench_minutes_for_night_numpy(
+    blocks: List[dict],
+    pre_ms: int,
+    post_ms: int,
+    *,
+    overrides: Optional[Dict[str, Dict[str, Optional[Union[bool, int]]]]] = None,
+    last_fight_mains: Iterable[str] | None = None,
+    roster_map: Optional[Dict[str, str]] = None,
+    pre_extension_ms: int = 0,
+    pre_extension_mains: Iterable[str] | None = None,
+    post_extension_ms: int = 0,
+    post_extension_mains: Iterable[str] | None = None,
+) -> List[dict]:
+    """Drop-in for :func:`pebble.bench_calc.bench_minutes_for_night`."""
+
+    night = BenchNight(
+        blocks=blocks,
+        pre_ms=pre_ms,
+        post_ms=post_ms,
+        overrides=overrides or {},
+        last_fight_mains=last_fight_mains or (),
+        roster_map=roster_map or {},
+        pre_extension_ms=pre_extension_ms,
+        pre_extension_mains=pre_extension_mains or (),
+        post_extension_ms=post_extension_ms,
+        post_extension_mains=post_extension_mains or (),
+    )
+    return bench_minutes_for_nights([night])[0]
@@ -1,14 +1,30 @@
 from __future__ import annotations
-from typing import List, Dict, Tuple
+from typing import Dict, Iterable, List, Optional, Tuple
+from .boss_index import BossIntervalIndex
+from .participation import mythic_fight_spans
+from .utils.names import NameResolver
 from .utils.time import ms_to_pt_iso
 
 
+def _half(start_ms: int, end_ms: int, break_range: tuple[int, int] | None) -> str:
+    if not break_range:
+        return "pre"
+    mid = (start_ms + end_ms) // 2
+    return "pre" if mid < break_range[0] else "post"
+
+
 def build_blocks(
-    participation_rows: List[dict], *, break_range: tuple[int, int] | None, fights_all: List[dict] | None = None
+    participation_rows: List[dict],
+    *,
+    break_range: tuple[int, int] | None,
+    fights_all: List[dict] | None = None,
+    boss_index: BossIntervalIndex | None = None,
 ) -> List[dict]:
     """Collapse per‑fight rows into contiguous blocks per (main, night_id, half).
+    Rows with ``intervals`` (presence from WCL events) contribute one span per interval.
     Trash between fights does not split blocks, regardless of time spent.
     Only non‑Mythic boss fights occurring between Mythic pulls break blocks.
+    Pass ``boss_index`` to reuse a night's index instead of building one from ``fights_all``.
     """
     if not participation_rows:
         return []
@@ -18,33 +34,26 @@ def build_blocks(
 
     groups: Dict[tuple, list] = defaultdict(list)
     for r in participation_rows:
-        groups[(r["main"], r["night_id"])].append(r)
-
-    # Pre-compute non-Mythic boss intervals for block splitting
-    nm_boss_intervals: List[Tuple[int, int]] = []
-    if fights_all:
-        for f in fights_all:
-            if not f.get("is_mythic") and f.get("encounter_id", 0) > 0:
-                nm_boss_intervals.append((f.get("fight_abs_start_ms", 0), f.get("fight_abs_end_ms", 0)))
+        # Event-derived rows carry the player's presence intervals within the
+        # fight; each interval is treated like its own pull.
+        intervals = r.get("intervals")
+        if intervals:
+            for s, e in intervals:
+                groups[(r["main"], r["night_id"])].append({**r, "start_ms": s, "end_ms": e})
+        else:
+            groups[(r["main"], r["night_id"])].append(r)
 
-    def has_nm_boss_between(s: int, e: int) -> bool:
-        for bs, be in nm_boss_intervals:
-            if s <= bs and be <= e:
-                return True
-        return False
+    # Non-Mythic boss intervals for block splitting
+    if boss_index is None:
+        boss_index = BossIntervalIndex(fights_all)
+    has_nm_boss_between = boss_index.has_non_mythic_within
 
     blocks: List[dict] = []
     for (main, night), rows in groups.items():
         rows.sort(key=lambda r: r["start_ms"])
         current = None
         for r in rows:
-            half = None
-            if break_range:
-                bs, be = break_range
-                mid = (r["start_ms"] + r["end_ms"]) // 2
-                half = "pre" if mid < bs else "post"
-            else:
-                half = "pre"
+            half = _half(r["start_ms"], r["end_ms"], break_range)
 
             if current and current["half"] == half and not has_nm_boss_between(current["end_ms"], r["start_ms"]):
                 current["end_ms"] = max(current["end_ms"], r["end_ms"])
@@ -64,3 +73,91 @@ def build_blocks(
         if current:
             blocks.append(current)
     return blocks
+
+
+def build_blocks_from_fights(
+    fights_mythic: List[dict],
+    *,
+    break_range: tuple[int, int] | None,
+    resolver: Optional[NameResolver] = None,
+    presence: Optional[List[dict]] = None,
+    fights_all: List[dict] | None = None,
+    boss_index: BossIntervalIndex | None = None,
+) -> List[dict]:
+    """Build blocks straight from Mythic fights, without participation rows.
+
+    Returns the same blocks, in the same order, as :func:`build_blocks` over
+    :func:`pebble.participation.build_mythic_participation`. See
+    :func:`build_blocks_from_spans`.
+    """
+    player_spans = (
+        (main, f.get("night_id"), spans)
+        for f, main, spans, _ in mythic_fight_spans(fights_mythic, resolver, presence)
+    )
+    return build_blocks_from_spans(
+        player_spans, break_range=break_range, fights_all=fights_all, boss_index=boss_index
+    )
+
+
+def build_blocks_from_spans(
+    player_spans: Iterable[Tuple[str, str, List[Tuple[int, int]]]],
+    *,
+    break_range: tuple[int, int] | None,
+    fights_all: List[dict] | None = None,
+    boss_index: BossIntervalIndex | None = None,
+) -> List[dict]:
+    """Build blocks from ``(main, night_id, spans)`` entries in fight order.
+
+    Every player span becomes a small tuple; the spans are walked once in
+    time order while each (main, night_id) keeps one open block, and PT
+    timestamps are only formatted for finished blocks.
+    """
+    spans = []
+    # Blocks are emitted per (main, night_id) in order of first appearance,
+    # like the groups in build_blocks.
+    closed: Dict[tuple, list] = {}
+    for main, night, fight_spans in player_spans:
+        key = (main, night)
+        if key not in closed:
+            closed[key] = []
+        for s, e in fight_spans:
+            # The running sequence number breaks ties on start like the stable
+            # per-group sort in build_blocks.
+            spans.append((s, len(spans), e, key))
+    if not spans:
+        return []
+    spans.sort()
+
+    if boss_index is None:
+        boss_index = BossIntervalIndex(fights_all)
+    has_nm_boss_between = boss_index.has_non_mythic_within
+
+    open_blocks: Dict[tuple, list] = {}
+    for s, _, e, key in spans:
+        half = _half(s, e, break_range)
+        current = open_blocks.get(key)
+        if current and current[0] == half and not has_nm_boss_between(current[2], s):
+            if e > current[2]:
+                current[2] = e
+        else:
+            if current:
+                closed[key].append(current)
+            open_blocks[key] = [half, s, e]
+    for key, current in open_blocks.items():
+        closed[key].append(current)
+
+    blocks: List[dict] = []
+    for (main, night), spans_of_key in closed.items():
+        for half, start_ms, end_ms in spans_of_key:
+            blocks.append(
+                {
+                    "main": main,
+                    "night_id": night,
+                    "half": half,
+                    "start_ms": start_ms,
+                    "end_ms": end_ms,
+                    "start_pt": ms_to_pt_iso(start_ms),
+                    "end_pt": ms_to_pt_iso(end_ms),
+                }
+            )
+    return blocks
@@ -0,0 +1,63 @@
+from __future__ import annotations
+
+from bisect import bisect_left
+from typing import List, Optional
+
+import numpy as np
+
+
+class BossIntervalIndex:
+    """Boss pulls of one night sorted by start, built once per night.
+
+    Serves the three questions the night stage asks about boss fights:
+    the boss pulls in time order (:func:`pebble.breaks.detect_break`),
+    whether a non-Mythic boss pull lies inside a gap
+    (:func:`pebble.blocks.build_blocks`) and the last non-Mythic boss pull
+    before Mythic starts (:func:`pebble.bench_calc.last_non_mythic_boss_mains`).
+    Containment uses a suffix minimum of end times over the start-sorted
+    non-Mythic pulls, so each query is a single bisect.
+    """
+
+    def __init__(self, fights_all: Optional[List[dict]]):
+        fights = [f for f in fights_all or [] if f.get("encounter_id", 0) > 0]
+        # ``sorted`` is stable, so pulls with equal starts keep input order.
+        self.bosses: List[dict] = sorted(fights, key=lambda f: f.get("fight_abs_start_ms", 0))
+        self.non_mythic: List[dict] = [f for f in self.bosses if not f.get("is_mythic")]
+        self._nm_starts = [f.get("fight_abs_start_ms", 0) for f in self.non_mythic]
+        suffix_min_end: List[int] = [0] * len(self.non_mythic)
+        running: Optional[int] = None
+        for i in range(len(self.non_mythic) - 1, -1, -1):
+            end = self.non_mythic[i].get("fight_abs_end_ms", 0)
+            running = end if running is None else min(running, end)
+            suffix_min_end[i] = running
+        self._nm_suffix_min_end = suffix_min_end
+
+    def has_non_mythic_within(self, start_ms: int, end_ms: int) -> bool:
+        """Return True if a non-Mythic boss pull lies entirely in ``[start_ms, end_ms]``."""
+
+        i = bisect_left(self._nm_starts, start_ms)
+        return i < len(self._nm_starts) and self._nm_suffix_min_end[i] <= end_ms
+
+    def has_non_mythic_within_many(self, start_ms: np.ndarray, end_ms: np.ndarray) -> np.ndarray:
+        """Vectorized :meth:`has_non_mythic_within` over arrays of gaps."""
+
+        out = np.zeros(len(start_ms), dtype=bool)
+        if not self._nm_starts:
+            return out
+        i = np.searchsorted(np.asarray(self._nm_starts, dtype=np.int64), start_ms, side="left")
+        inside = i < len(self._nm_starts)
+        suffix_min_end = np.asarray(self._nm_suffix_min_end, dtype=np.int64)
+        out[inside] = suffix_min_end[i[inside]] <= end_ms[inside]
+        return out
+
+    def last_non_mythic_before(self, ms: int) -> Optional[dict]:
+        """Return the non-Mythic boss pull with the latest start before ``ms``.
+
+        Ties on the start time resolve to the first such pull in input
+        order, like ``max`` over the unsorted fights.
+        """
+
+        i = bisect_left(self._nm_starts, ms) - 1
+        if i < 0:
+            return None
+        return self.non_mythic[bisect_left(self._nm_starts, self._nm_starts[i])]
@@ -1,6 +1,8 @@
 from __future__ import annotations
 from typing import List, Optional, Tuple, Dict, Any
 
+from .boss_index import BossIntervalIndex
+
 
 def detect_break(
     all_fights: List[dict],
@@ -10,6 +12,7 @@ def detect_break(
     min_break_min: int = 10,
     max_break_min: int = 30,
     night_start_ms: int = 0,
+    boss_index: Optional[BossIntervalIndex] = None,
 ) -> Tuple[Optional[Tuple[int, int]], Dict[str, Any]]:
     """Identify the raid break window.
 
@@ -18,15 +21,14 @@ def detect_break(
     tuple of ``(start_ms, end_ms)`` or ``None`` if no candidate satisfied the
     criteria. ``meta`` contains the largest candidate gap (in minutes) and a
     list of all candidate gaps whose midpoints fell within the configured
-    window.
+    window. ``boss_index`` supplies the night's boss pulls already sorted.
     """
     if not all_fights:
         return None, {"largest_gap_min": 0, "candidates": []}
-    # Filter to boss pulls only. A valid boss fight has a positive encounter id.
-    fights = [f for f in all_fights if f.get("encounter_id", 0) > 0]
+    # Boss pulls only (positive encounter id), sorted by absolute start time.
+    fights = (boss_index or BossIntervalIndex(all_fights)).bosses
     if not fights:
         return None, {"largest_gap_min": 0, "candidates": []}
-    fights = sorted(fights, key=lambda f: f["fight_abs_start_ms"])  # expects absolute times
 
     best = None
     best_gap = 0.0
@@ -0,0 +1,229 @@
+"""Key/value stores used to cache WCL report bundles and OAuth tokens.
+
+Every backend stores opaque ``bytes`` under string keys with a TTL in
+seconds. ``redis`` is the shared default; ``memory`` keeps entries in the
+current process and ``disk`` persists them under a local directory for
+laptops and single-container deployments without Redis.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, Iterator, List, Optional, Sequence
+
+import redis
+
+if TYPE_CHECKING:  # pragma: no cover
+    from .config_loader import Settings
+
+logger = logging.getLogger(__name__)
+
+
+class CacheBackend:
+    """Interface shared by the cache stores."""
+
+    name = "base"
+
+    def get(self, key: str) -> Optional[bytes]:
+        raise NotImplementedError
+
+    def get_many(self, keys: Sequence[str]) -> List[Optional[bytes]]:
+        return [self.get(key) for key in keys]
+
+    def set(self, key: str, value: bytes | str, ttl: int) -> None:
+        raise NotImplementedError
+
+    def scan(self, prefix: str) -> Iterator[str]:
+        """Yield the live keys starting with ``prefix``."""
+        raise NotImplementedError
+
+    def delete(self, keys: Sequence[str]) -> int:
+        """Delete ``keys`` and return how many existed."""
+        raise NotImplementedError
+
+
+def _as_bytes(value: bytes | str) -> bytes:
+    return value.encode("utf-8") if isinstance(value, str) else value
+
+
+def _as_str(key: bytes | str) -> str:
+    return key.decode("utf-8", "replace") if isinstance(key, bytes) else key
+
+
+class RedisCacheBackend(CacheBackend):
+    name = "redis"
+
+    def __init__(self, client: redis.Redis):
+        self.client = client
+
+    @classmethod
+    def from_url(cls, url: str) -> "RedisCacheBackend":
+        return cls(redis.from_url(url))
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.client.get(key)
+
+    def get_many(self, keys: Sequence[str]) -> List[Optional[bytes]]:
+        if not keys:
+            return []
+        return list(self.client.mget(list(keys)))
+
+    def set(self, key: str, value: bytes | str, ttl: int) -> None:
+        self.client.setex(key, ttl, value)
+
+    def scan(self, prefix: str) -> Iterator[str]:
+        for key in self.client.scan_iter(f"{prefix}*"):
+            yield _as_str(key)
+
+    def delete(self, keys: Sequence[str]) -> int:
+        if not keys:
+            return 0
+        return int(self.client.delete(*keys))
+
+
+class MemoryCacheBackend(CacheBackend):
+    """Process-local store; entries vanish when the process exits."""
+
+    name = "memory"
+
+    def __init__(self):
+        self._entries: Dict[str, tuple[float, bytes]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if time.time() >= expires_at:
+                del self._entries[key]
+                return None
+            return value
+
+    def set(self, key: str, value: bytes | str, ttl: int) -> None:
+        with self._lock:
+            self._entries[key] = (time.time() + ttl, _as_bytes(value))
+
+    def scan(self, prefix: str) -> Iterator[str]:
+        now = time.time()
+        with self._lock:
+            keys = [k for k, (exp, _) in self._entries.items() if k.startswith(prefix) and exp > now]
+        return iter(keys)
+
+    def delete(self, keys: Sequence[str]) -> int:
+        with self._lock:
+            return sum(1 for key in keys if self._entries.pop(key, None) is not None)
+
+
+class DiskCacheBackend(CacheBackend):
+    """Entries stored as files named by the SHA-256 of their key.
+
+    Files are addressed by key, not by content: rewriting a key replaces its
+    file. Each value file holds one JSON metadata line (key and expiry)
+    followed by the raw value, and a ``.key`` sidecar next to it repeats the
+    metadata so :meth:`scan` lists keys without opening values. Writes go to
+    a temporary file in the same directory and are moved into place with
+    :func:`os.replace`, so readers never observe a partially written entry
+    and concurrent writers simply race to the last complete value.
+    """
+
+    name = "disk"
+
+    def __init__(self, root: str | os.PathLike):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, key: str) -> Path:
+        digest = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        return self.root / digest[:2] / digest[2:]
+
+    @staticmethod
+    def _sidecar(path: Path) -> Path:
+        return path.with_suffix(".key")
+
+    @staticmethod
+    def _read(path: Path) -> Optional[tuple[dict, bytes]]:
+        try:
+            with path.open("rb") as f:
+                meta = json.loads(f.readline())
+                return meta, f.read()
+        except (OSError, ValueError):
+            return None
+
+    @staticmethod
+    def _write(path: Path, data: bytes) -> None:
+        fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except BaseException:
+            Path(tmp).unlink(missing_ok=True)
+            raise
+
+    def _unlink(self, path: Path) -> None:
+        path.unlink(missing_ok=True)
+        self._sidecar(path).unlink(missing_ok=True)
+
+    def get(self, key: str) -> Optional[bytes]:
+        path = self._path(key)
+        entry = self._read(path)
+        if entry is None:
+            return None
+        meta, value = entry
+        if meta.get("key") != key:
+            return None
+        if time.time() >= float(meta.get("expires_at") or 0):
+            self._unlink(path)
+            return None
+        return value
+
+    def set(self, key: str, value: bytes | str, ttl: int) -> None:
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        meta = json.dumps({"key": key, "expires_at": time.time() + ttl}).encode("utf-8")
+        self._write(path, meta + b"\n" + _as_bytes(value))
+        # The sidecar lands after the value, so a listed key is readable.
+        self._write(self._sidecar(path), meta)
+
+    def scan(self, prefix: str) -> Iterator[str]:
+        now = time.time()
+        for sidecar in self.root.glob("??/*.key"):
+            try:
+                meta = json.loads(sidecar.read_bytes())
+            except (OSError, ValueError):
+                continue
+            key = meta.get("key") or ""
+            if key.startswith(prefix) and float(meta.get("expires_at") or 0) > now:
+                yield key
+
+    def delete(self, keys: Sequence[str]) -> int:
+        deleted = 0
+        for key in keys:
+            path = self._path(key)
+            if path.exists():
+                self._unlink(path)
+                deleted += 1
+        return deleted
+
+
+def build_cache_backend(s: "Settings") -> CacheBackend:
+    """Create the backend selected by ``cache.backend`` (Redis by default)."""
+
+    cache = getattr(s, "cache", None)
+    kind = getattr(cache, "backend", "redis")
+    if kind == "memory":
+        return MemoryCacheBackend()
+    if kind == "disk":
+        return DiskCacheBackend(getattr(cache, "disk_path", ".cache/pebble"))
+    if kind == "redis":
+        return RedisCacheBackend.from_url(s.redis.url)
+    raise ValueError(f"Unknown cache backend: {kind}")
@@ -1,7 +1,6 @@
 import click
-import json
 import time
-from collections import defaultdict
+from dataclasses import asdict
 from typing import Any, Dict, List, Optional, Sequence, Union
 
 from .config_loader import (
@@ -11,25 +10,35 @@ from .config_loader import (
     load_settings_entry,
 )
 from .logging_setup import setup_logging
-from .mongo_client import get_db, ensure_indexes
+from .mongo_client import find_by_night, get_db, ensure_indexes, publish_nights
 from .ingest import ingest_reports, ingest_roster, _sheet_values_batch
-from .envelope import mythic_envelope, split_pre_post
-from .breaks import detect_break
-from .blocks import build_blocks
-from .bench_calc import bench_minutes_for_night, last_non_mythic_boss_mains
-from .participation import build_mythic_participation
 from .export_sheets import build_replace_values_requests, build_value_update_requests
 from .sheets_client import SheetsClient
 from .week_agg import materialize_rankings, materialize_week_totals
 from .attendance import build_attendance_rows
 from .utils.sheets import parse_tab_cell
-from .utils.time import (
-    ms_to_pt_iso,
-    ms_to_pt_sheets,
-    pt_time_to_ms,
-    sheets_date_str,
-)
+from .utils.time import sheets_date_str
 from .utils.names import NameResolver
+from .night_compute import (
+    BENCH_NIGHT_FIELDS,
+    NOT_ON_ROSTER_COL,
+    NightInputs,
+    NightTimeSettings,
+    compute_nights,
+)
+from .pipeline_context import PipelineContext
+from .pipeline_state import (
+    clear_dirty_nights,
+    inputs_hash,
+    load_empty_nights,
+    load_night_inputs,
+    load_week_totals_state,
+    mark_week_nights,
+    pending_dirty_nights,
+    save_empty_nights,
+    save_night_inputs,
+    save_week_totals_state,
+)
 
 
 def _require_ingest_trigger_range(settings) -> str:
@@ -177,17 +186,156 @@ def sheets(config):
         raise
 
 
-@cli.command("flush-cache", help="Flush cached WCL reports from Redis.")
+@cli.command("flush-cache", help="Flush cached WCL reports from the configured cache.")
 @click.option("--config", default="config.yaml", show_default=True)
 def flush_cache_cmd(config):
     log = setup_logging()
     s = load_settings(config)
+    from .cache_backends import build_cache_backend
     from .wcl_client import flush_cache as _flush
 
-    deleted = _flush(s.redis.url, s.redis.key_prefix)
+    deleted = _flush(build_cache_backend(s), s.redis.key_prefix)
     log.info("cache flushed", extra={"stage": "flush-cache", "keys": deleted})
 
 
+@cli.command("cache-stats", help="Report size and compression of cached WCL reports.")
+@click.option("--config", default="config.yaml", show_default=True)
+def cache_stats_cmd(config):
+    log = setup_logging()
+    s = load_settings(config)
+    from .cache_backends import build_cache_backend
+    from .wcl_client import cache_stats as _cache_stats
+
+    stats = _cache_stats(build_cache_backend(s), s.redis.key_prefix)
+    log.info("cache stats", extra={"stage": "cache-stats", "prefix": s.redis.key_prefix, **stats})
+
+
+@cli.group(help="Run offline benchmarks.")
+def bench():
+    """Run offline benchmarks."""
+    pass
+
+
+@bench.command("ingest", help="Benchmark report ingestion against a local WCL stand-in.")
+@click.option(
+    "--recordings",
+    required=True,
+    type=click.Path(exists=True),
+    help="Directory of <code>.json report bundles (see 'bench record') or one JSON map.",
+)
+@click.option("--iterations", default=2, show_default=True, type=click.IntRange(min=1))
+@click.option("--concurrency", default=4, show_default=True, type=click.IntRange(min=1))
+@click.option("--batch-size", default=1, show_default=True, type=click.IntRange(min=1))
+@click.option("--latency-ms", default=50.0, show_default=True, type=float)
+@click.option("--jitter-ms", default=10.0, show_default=True, type=float)
+@click.option("--error-rate-429", default=0.0, show_default=True, type=click.FloatRange(0, 1))
+@click.option("--error-rate-5xx", default=0.0, show_default=True, type=click.FloatRange(0, 1))
+@click.option("--seed", default=0, show_default=True, type=int)
+@click.option(
+    "--events-presence",
+    is_flag=True,
+    help="Also walk recorded events for presence intervals (needs 'bench record --events').",
+)
+def bench_ingest_cmd(
+    recordings,
+    iterations,
+    concurrency,
+    batch_size,
+    latency_ms,
+    jitter_ms,
+    error_rate_429,
+    error_rate_5xx,
+    seed,
+    events_presence,
+):
+    log = setup_logging()
+    from .bench import bench_ingest
+    from .wcl_standin import StandinOptions, load_recordings
+
+    bundles = load_recordings(recordings)
+    if not bundles:
+        raise click.ClickException(f"No recordings found in {recordings}")
+    if events_presence and not any(bundle.get("events") for bundle in bundles.values()):
+        raise click.ClickException(f"No recorded events in {recordings}; record them with 'bench record --events'")
+    options = StandinOptions(
+        latency_ms=latency_ms,
+        jitter_ms=jitter_ms,
+        error_rate_429=error_rate_429,
+        error_rate_5xx=error_rate_5xx,
+        seed=seed,
+    )
+    res = bench_ingest(
+        bundles,
+        options,
+        concurrency=concurrency,
+        batch_size=batch_size,
+        iterations=iterations,
+        events_presence=events_presence,
+    )
+    log.info("bench ingest complete", extra={"stage": "bench.ingest", **res})
+
+
+@bench.command("blocks", help="Benchmark block building on a synthetic Mythic night.")
+@click.option("--pulls", default=300, show_default=True, type=click.IntRange(min=2))
+@click.option("--mains", default=20, show_default=True, type=click.IntRange(min=1))
+@click.option("--iterations", default=5, show_default=True, type=click.IntRange(min=1))
+@click.option("--seed", default=0, show_default=True, type=int)
+def bench_blocks_cmd(pulls, mains, iterations, seed):
+    log = setup_logging()
+    from .bench import bench_blocks
+
+    res = bench_blocks(pulls=pulls, mains=mains, iterations=iterations, seed=seed)
+    log.info("bench blocks complete", extra={"stage": "bench.blocks", **res})
+
+
+@bench.command("season", help="Benchmark the loop and columnar engines on synthetic seasons.")
+@click.option("--weeks", default=60, show_default=True, type=click.IntRange(min=1))
+@click.option("--nights-per-week", default=2, show_default=True, type=click.IntRange(min=1))
+@click.option("--pulls", default=40, show_default=True, type=click.IntRange(min=2))
+@click.option("--mains", default=20, show_default=True, type=click.IntRange(min=1))
+@click.option("--iterations", default=3, show_default=True, type=click.IntRange(min=1))
+@click.option("--seed", default=0, show_default=True, type=int)
+def bench_season_cmd(weeks, nights_per_week, pulls, mains, iterations, seed):
+    log = setup_logging()
+    from .bench import bench_season
+
+    res = bench_season(
+        weeks=weeks,
+        nights_per_week=nights_per_week,
+        pulls=pulls,
+        mains=mains,
+        iterations=iterations,
+        seed=seed,
+    )
+    log.info("bench season complete", extra={"stage": "bench.season", **res})
+
+
+@bench.command("record", help="Record WCL report bundles for 'bench ingest'.")
+@click.option("--config", default="config.yaml", show_default=True)
+@click.option("--out", "out_dir", required=True, type=click.Path(file_okay=False))
+@click.option("--events", is_flag=True, help="Also record the events of Mythic fights for presence benchmarks.")
+@click.argument("codes", nargs=-1, required=True)
+def bench_record_cmd(config, out_dir, codes, events):
+    log = setup_logging()
+    s = load_settings(config)
+    from .wcl_client import get_shared_client
+    from .wcl_standin import save_recording
+
+    wcl = get_shared_client(s)
+    for code in codes:
+        bundle = dict(wcl.fetch_report_bundle(code))
+        if events:
+            mythic = [f["id"] for f in bundle.get("fights") or [] if int(f.get("difficulty") or 0) == 5]
+            duration = int(bundle.get("endTime") or 0) - int(bundle.get("startTime") or 0)
+            bundle["events"] = (
+                [ev for page in wcl.iter_report_events(code, 0, duration, fight_ids=mythic) for ev in page]
+                if mythic
+                else []
+            )
+        path = save_recording(out_dir, code, bundle)
+        log.info("recorded report bundle", extra={"stage": "bench.record", "code": code, "path": str(path)})
+
+
 @cli.command("ensure-indexes", help="Ensure MongoDB indexes are created.")
 @click.option("--config", default="config.yaml", show_default=True)
 def ensure_indexes_cmd(config):
@@ -358,6 +506,82 @@ def _load_settings_and_pipeline_values(
     return settings, sheet_client, sheet_values
 
 
+_REPORT_FINGERPRINT_FIELDS = (
+    "code",
+    "start_ms",
+    "end_ms",
+    "break_override_start_ms",
+    "break_override_end_ms",
+    "mythic_override_start_ms",
+    "mythic_override_end_ms",
+)
+
+
+def _night_fingerprint(
+    fights_all: List[dict],
+    reports: List[dict],
+    presence: Optional[List[dict]],
+    *,
+    overrides: dict,
+    overrides_unmatched: set,
+    global_hash: str,
+) -> str:
+    """Hash everything the per-night compute reads.
+
+    ``global_hash`` covers the resolver inputs (roster and alt map) and the
+    ``time`` settings; report documents contribute only their times and
+    overrides so bookkeeping fields such as ``ingested_at`` do not count.
+    """
+
+    report_fields = [
+        {k: r.get(k) for k in _REPORT_FINGERPRINT_FIELDS}
+        for r in sorted(reports, key=lambda r: r.get("code") or "")
+    ]
+    fights = sorted(
+        fights_all,
+        key=lambda f: (f.get("fight_abs_start_ms") or 0, f.get("report_code") or "", f.get("id") or 0),
+    )
+    return inputs_hash(
+        {
+            "fights": fights,
+            "reports": report_fields,
+            "presence": presence,
+            "overrides": overrides,
+            "overrides_unmatched": sorted(overrides_unmatched),
+            "global": global_hash,
+        }
+    )
+
+
+def _reuse_night_rows(
+    db,
+    night: str,
+    qa: dict,
+    bench_docs: List[dict],
+    seen_unmatched: set,
+    overrides_unmatched: set,
+) -> tuple[list, list[list]]:
+    """Return the stored Night QA row and bench rows of an unchanged night.
+
+    Unmatched names are only reported on the first night they appear, so the
+    Not on Roster cell is rebuilt against ``seen_unmatched`` (updated in
+    place) and written back when it differs from the stored row.
+    """
+
+    night_unmatched = set(qa.get("unmatched_names") or [])
+    not_on_roster = sorted((night_unmatched - seen_unmatched) | set(overrides_unmatched))
+    seen_unmatched.update(qa.get("resolver_unmatched") or night_unmatched)
+    qa_row = list(qa["sheet_row"])
+    if qa.get("not_on_roster_mains") != not_on_roster:
+        qa_row[NOT_ON_ROSTER_COL] = ", ".join(not_on_roster)
+        db["night_qa"].update_one(
+            {"night_id": night},
+            {"$set": {"not_on_roster_mains": not_on_roster, "sheet_row": qa_row}},
+        )
+    bench_rows = [[night] + [doc.get(k) for k in BENCH_NIGHT_FIELDS] for doc in bench_docs]
+    return qa_row, bench_rows
+
+
 def run_pipeline(
     settings,
     log,
@@ -365,8 +589,16 @@ def run_pipeline(
     *,
     sheet_values: dict[str, list[list[Any]]] | None = None,
     sheet_client: SheetsClient | None = None,
+    full_recompute: bool = False,
+    workers: int = 1,
 ):
-    """Ingest reports, compute nightly tables, and refresh weekly exports."""
+    """Ingest reports, compute nightly tables, and refresh weekly exports.
+
+    Only nights whose inputs changed since the previous run are recomputed;
+    the Night QA and bench rows of the others are read back from Mongo. Pass
+    ``full_recompute=True`` to rebuild every night. With ``workers`` > 1 the
+    nights that are recomputed are spread over that many processes.
+    """
 
     s = settings
     sheet_client = sheet_client or SheetsClient(s.service_account_json)
@@ -411,7 +643,9 @@ def run_pipeline(
         except ValueError:
             pass
 
-    roster_docs = list(db["team_roster"].find({}, {"_id": 0, "main": 1, "active": 1}))
+    # The full roster documents also feed the week and attendance stages.
+    roster_docs = list(db["team_roster"].find({}, {"_id": 0}))
+    context = PipelineContext(team_roster=roster_docs)
     active_mains = [r.get("main") for r in roster_docs if r.get("main") and r.get("active", True) is not False]
     resolver = NameResolver(active_mains, roster_map)
 
@@ -422,6 +656,62 @@ def run_pipeline(
     # Night loop: derive QA + bench
     nights = sorted(set([r["night_id"] for r in db["reports"].find({}, {"night_id": 1, "_id": 0})]))
 
+    # Decide which nights need recomputing. Roster, alt map and time settings
+    # feed every night; availability overrides and ingested reports only
+    # their own.
+    # Per-pull participation rows are only kept in audit mode; toggling it
+    # rebuilds every night so participation_m follows.
+    audit_participation = bool(getattr(getattr(s, "mongo", None), "audit_participation", False))
+    bench_engine = getattr(getattr(s, "compute", None), "bench_engine", "python")
+    engine = getattr(getattr(s, "compute", None), "engine", "loop")
+    publish_mode = getattr(getattr(s, "mongo", None), "publish_mode", "replace")
+    global_hash = inputs_hash(
+        {
+            "roster": sorted(active_mains),
+            "roster_map": roster_map,
+            "time": asdict(NightTimeSettings.from_settings(s)),
+            "audit_participation": audit_participation,
+        }
+    )
+    override_hashes = {
+        night: inputs_hash(
+            {
+                "overrides": overrides_by_night.get(night, {}),
+                "unmatched": sorted(overrides_unmatched.get(night, set())),
+            }
+        )
+        for night in nights
+    }
+    stored_qa = {
+        doc["night_id"]: doc
+        for doc in db["night_qa"].find(
+            {"night_id": {"$in": nights}, "sheet_row": {"$exists": True}}, {"_id": 0}
+        )
+    }
+    empty_qa = load_empty_nights(db)
+    previous_inputs = load_night_inputs(db)
+    pending_nights = pending_dirty_nights(db)
+    if full_recompute or previous_inputs.get("global_hash") != global_hash:
+        dirty_nights = set(nights)
+    else:
+        previous_overrides = previous_inputs.get("overrides") or {}
+        dirty_nights = set(report_res.get("dirty_nights") or []) | pending_nights
+        dirty_nights |= {
+            night
+            for night in nights
+            if (night not in stored_qa and night not in empty_qa)
+            or override_hashes[night] != previous_overrides.get(night)
+        }
+    log.info(
+        "night recompute plan",
+        extra={
+            "stage": "compute",
+            "nights": len(nights),
+            "dirty_nights": sorted(dirty_nights & set(nights)),
+            "full_recompute": full_recompute,
+        },
+    )
+
     night_qa_rows = [
         [
             "Night ID",
@@ -468,334 +758,231 @@ def run_pipeline(
         ]
     ]
 
+    # Load every night that may need work and check it against the memo:
+    # identical inputs produce identical rows, whatever ingest said. Nights
+    # left over are computed (in worker processes when ``workers`` > 1) and
+    # merged back below in night order.
+    # Inputs come from one night-sorted cursor per collection rather than a
+    # query per night.
+    scope = [night for night in nights if night in dirty_nights]
+    fights_by_night = find_by_night(db, "fights_all", scope, {"_id": 0})
+    reports_by_night = find_by_night(
+        db, "reports", scope, {"_id": 0, "night_id": 1, **{k: 1 for k in _REPORT_FINGERPRINT_FIELDS}}
+    )
+    presence_by_night = find_by_night(
+        db,
+        "presence_intervals",
+        [
+            night
+            for night, fights in fights_by_night.items()
+            if any(f.get("is_mythic") and f.get("has_presence") for f in fights)
+        ],
+        {"_id": 0},
+    )
+
+    plan: list[tuple[str, Optional[dict]]] = []
+    to_compute: list[NightInputs] = []
+    clean_nights = memo_hits = 0
+    # Dirty nights that no longer produce anything (no fights or no Mythic
+    # envelope) lose their stored rows so they are not reused later; their
+    # fingerprints are kept so they are not planned again while unchanged.
+    emptied_nights: List[str] = []
+    fingerprints: Dict[str, str] = {}
     for night in nights:
-        fights_all = list(db["fights_all"].find({"night_id": night}, {"_id": 0}))
-        if not fights_all:
+        if night not in dirty_nights:
+            clean_nights += 1
+            if night in stored_qa:
+                plan.append((night, stored_qa[night]))
             continue
-        fights_m = [f for f in fights_all if f.get("is_mythic")]
-
-        night_unmatched_start = set(resolver.not_on_roster)
-
-        reports = list(db["reports"].find({"night_id": night}, {"_id": 0}))
-        report_codes = sorted(r.get("code") for r in reports)
-        report_start_ms = min(r.get("start_ms") for r in reports)
-        report_end_ms = max(r.get("end_ms") for r in reports)
-        night_start_ms = min(f["fight_abs_start_ms"] for f in fights_all)
-        night_end_ms = max(f["fight_abs_end_ms"] for f in fights_all)
-
-        mythic_override_pair = next(
-            (
-                (r.get("mythic_override_start_ms"), r.get("mythic_override_end_ms"))
-                for r in reports
-                if r.get("mythic_override_start_ms") is not None
-                or r.get("mythic_override_end_ms") is not None
-            ),
-            (None, None),
+
+        fights_all = fights_by_night.get(night) or []
+        reports = reports_by_night.get(night, [])
+        presence = presence_by_night.get(night)
+
+        fingerprint = _night_fingerprint(
+            fights_all,
+            reports,
+            presence,
+            overrides=overrides_by_night.get(night, {}),
+            overrides_unmatched=overrides_unmatched.get(night, set()),
+            global_hash=global_hash,
         )
-        mythic_override_start_ms, mythic_override_end_ms = mythic_override_pair
-
-        if mythic_override_start_ms is None:
-            first_boss_fight = min(
-                (
-                    f
-                    for f in fights_all
-                    if int(f.get("encounter_id", 0)) > 0
-                ),
-                key=lambda f: f.get("fight_abs_start_ms", 0),
-                default=None,
+        fingerprints[night] = fingerprint
+        qa = stored_qa.get(night)
+        if not full_recompute and qa and qa.get("fingerprint") == fingerprint:
+            memo_hits += 1
+            plan.append((night, qa))
+            continue
+        if not full_recompute and qa is None and empty_qa.get(night) == fingerprint:
+            memo_hits += 1
+            continue
+        if not fights_all:
+            emptied_nights.append(night)
+            continue
+        plan.append((night, None))
+        to_compute.append(
+            NightInputs(
+                night=night,
+                fights_all=fights_all,
+                reports=reports,
+                presence=presence,
+                overrides=overrides_by_night.get(night, {}),
+                fingerprint=fingerprint,
             )
-            mythic_default_start_pt = getattr(s.time, "mythic_default_start_pt", "") or ""
-            if (
-                first_boss_fight
-                and first_boss_fight.get("is_mythic")
-                and mythic_default_start_pt
-            ):
-                default_mythic_override_start_ms = pt_time_to_ms(
-                    mythic_default_start_pt, report_start_ms
-                )
-                if default_mythic_override_start_ms is not None:
-                    mythic_override_start_ms = default_mythic_override_start_ms
+        )
 
-        env = mythic_envelope(fights_m)
-        if not env:
-            continue
-        auto_env_start, auto_env_end = env
-        env_start, env_end = auto_env_start, auto_env_end
-        mythic_override_used = False
-        start_extension_ms = 0
-        end_extension_ms = 0
-        if mythic_override_start_ms is not None:
-            env_start = mythic_override_start_ms
-            mythic_override_used = True
-            start_extension_ms = max(0, auto_env_start - mythic_override_start_ms)
-        if mythic_override_end_ms is not None:
-            env_end = mythic_override_end_ms
-            mythic_override_used = True
-            end_extension_ms = max(0, mythic_override_end_ms - auto_env_end)
-        env = (env_start, env_end)
-
-        mains_by_report: dict[str, set[str]] = {code: set() for code in report_codes}
-        for f in fights_all:
-            if int(f.get("encounter_id", 0)) <= 0:
-                continue
-            code = f.get("report_code")
-            if code not in mains_by_report:
-                mains_by_report[code] = set()
-            for p in f.get("participants", []) or []:
-                name = p.get("name")
-                if not name:
-                    continue
-                main = resolver.resolve(name)
-                if not main:
-                    continue
-                mains_by_report[code].add(main)
-        report_mains = [len(mains_by_report[c]) for c in report_codes]
-        override_pair = next(
-            (
-                (r.get("break_override_start_ms"), r.get("break_override_end_ms"))
-                for r in reports
-                if r.get("break_override_start_ms") and r.get("break_override_end_ms")
-            ),
-            (None, None),
+    # Names that failed to resolve are reported on the first night they show
+    # up, so each night's unmatched names are merged in night order.
+    seen_unmatched = set(resolver.not_on_roster)
+    compute_started = time.perf_counter()
+    if engine == "columnar":
+        from .season_engine import compute_nights_columnar
+
+        computed = compute_nights_columnar(
+            to_compute,
+            resolver,
+            NightTimeSettings.from_settings(s),
+            audit_participation=audit_participation,
         )
-        override_start_ms, override_end_ms = override_pair
-
-        bw = s.time.break_window
-        window_start_ms = pt_time_to_ms(bw.start_pt, night_start_ms)
-        window_end_ms = pt_time_to_ms(bw.end_pt, night_start_ms)
-        window_start_min = int((window_start_ms - night_start_ms) / 60000)
-        window_end_min = int((window_end_ms - night_start_ms) / 60000)
-        br_auto, gap_meta = detect_break(
-            fights_all,
-            window_start_min=window_start_min,
-            window_end_min=window_end_min,
-            min_break_min=bw.min_gap_minutes,
-            max_break_min=bw.max_gap_minutes,
-            night_start_ms=night_start_ms,
+    else:
+        computed = compute_nights(
+            to_compute,
+            resolver,
+            NightTimeSettings.from_settings(s),
+            workers=workers,
+            audit_participation=audit_participation,
+            bench_engine=bench_engine,
         )
-        br_range = br_auto
-        override_used = mythic_override_used
-        if override_start_ms and override_end_ms:
-            br_range = (override_start_ms, override_end_ms)
-            override_used = True
-
-        post_extension_min_cfg = getattr(s.time, "mythic_post_extension_min", 0.0) or 0.0
-        post_extension_ms = int(round(max(0.0, post_extension_min_cfg) * 60000))
-        effective_extension_ms = post_extension_ms if br_range else 0
-        post_extension_credit_ms = effective_extension_ms + end_extension_ms
-
-        split = split_pre_post(env, br_range, post_extension_ms=effective_extension_ms)
-        break_duration = round((br_range[1] - br_range[0]) / 60000.0, 2) if br_range else ""
-        post_extension_min = round(post_extension_credit_ms / 60000.0, 2)
-        candidate_gaps_db = [
-            {
-                "start": ms_to_pt_iso(c["start_ms"]),
-                "end": ms_to_pt_iso(c["end_ms"]),
-                "gap_min": round(c["gap_min"], 2),
-            }
-            for c in gap_meta.get("candidates", [])
-        ]
-        candidate_gaps_sheet = [
-            {
-                "start": ms_to_pt_sheets(c["start_ms"]),
-                "end": ms_to_pt_sheets(c["end_ms"]),
-                "gap_min": round(c["gap_min"], 2),
-            }
-            for c in gap_meta.get("candidates", [])
-        ]
-        largest_gap = round(gap_meta.get("largest_gap_min", 0.0), 2)
-
-        first_mythic_mains: set[str] = set()
-        last_mythic_mains: set[str] = set()
-        if fights_m:
-            first_mythic_fight = min(
-                fights_m,
-                key=lambda f: (
-                    f.get("fight_abs_start_ms")
-                    if f.get("fight_abs_start_ms") is not None
-                    else f.get("fight_abs_end_ms", 0)
-                ),
-            )
-            last_mythic_fight = max(
-                fights_m,
-                key=lambda f: (
-                    f.get("fight_abs_end_ms")
-                    if f.get("fight_abs_end_ms") is not None
-                    else f.get("fight_abs_start_ms", 0)
-                ),
-            )
+    results = iter(computed)
+    compute_ms = round((time.perf_counter() - compute_started) * 1000, 1)
+    reused_bench = find_by_night(
+        db,
+        "bench_night_totals",
+        [night for night, qa in plan if qa is not None],
+        {"_id": 0},
+        sort=[("main", 1)],
+    )
 
-            for fight, bucket in (
-                (first_mythic_fight, first_mythic_mains),
-                (last_mythic_fight, last_mythic_mains),
-            ):
-                for p in fight.get("participants", []) or []:
-                    name = p.get("name")
-                    if not name:
-                        continue
-                    main = resolver.resolve(name)
-                    if not main:
-                        continue
-                    bucket.add(main)
-
-        mythic_mains: set[str] = set()
-        for f in fights_m:
-            for p in f.get("participants", []) or []:
-                name = p.get("name")
-                if not name:
-                    continue
-                main = resolver.resolve(name)
-                if not main:
-                    continue
-                mythic_mains.add(main)
-        new_unmatched = set(resolver.not_on_roster) - night_unmatched_start
+    # Recomputed nights are published together after the loop, one write (or
+    # staging swap) per collection.
+    written_nights: List[str] = []
+    # participation_m is published even with audit mode off, empty, so rows
+    # of an earlier audit run are removed when the nights are rebuilt.
+    written: Dict[str, List[dict]] = {"participation_m": [], "blocks": [], "bench_night_totals": []}
+    written_qa: List[dict] = []
+    for night, qa in plan:
         override_unmatched = overrides_unmatched.get(night, set())
-        not_on_roster = sorted(new_unmatched | set(override_unmatched))
-        not_on_roster_str = ", ".join(not_on_roster)
+        if qa is not None:
+            qa_row, night_bench_rows = _reuse_night_rows(
+                db, night, qa, reused_bench.get(night, []), seen_unmatched, override_unmatched
+            )
+            night_qa_rows.append(qa_row)
+            bench_rows.extend(night_bench_rows)
+            context.add_night(night, qa, reused_bench.get(night, []))
+            continue
 
-        night_qa_rows.append(
-            [
-                night,
-                ",".join(report_codes),
-                ",".join(str(c) for c in report_mains),
-                not_on_roster_str,
-                ms_to_pt_sheets(report_start_ms),
-                ms_to_pt_sheets(report_end_ms),
-                ms_to_pt_sheets(night_start_ms),
-                ms_to_pt_sheets(night_end_ms),
-                len(fights_m),
-                ms_to_pt_sheets(br_range[0]) if br_range else "",
-                ms_to_pt_sheets(br_range[1]) if br_range else "",
-                ms_to_pt_sheets(override_start_ms) if override_start_ms else "",
-                ms_to_pt_sheets(override_end_ms) if override_end_ms else "",
-                f"{break_duration:.2f}" if break_duration != "" else "",
-                ms_to_pt_sheets(mythic_override_start_ms)
-                if mythic_override_start_ms is not None
-                else "",
-                ms_to_pt_sheets(mythic_override_end_ms)
-                if mythic_override_end_ms is not None
-                else "",
-                ms_to_pt_sheets(env[0]),
-                ms_to_pt_sheets(env[1]),
-                f"{split['pre_ms'] / 60000.0:.2f}",
-                f"{split['post_ms'] / 60000.0:.2f}",
-                f"{post_extension_min:.2f}",
-                f"{bw.start_pt}-{bw.end_pt}",
-                f"{bw.min_gap_minutes}-{bw.max_gap_minutes}",
-                f"{largest_gap:.2f}",
-                json.dumps(candidate_gaps_sheet),
-                "Y" if override_used else "N",
-            ]
+        result = next(results)
+        if result is None:
+            emptied_nights.append(night)
+            continue
+        not_on_roster = sorted(
+            (set(result.unmatched_names) - seen_unmatched) | set(override_unmatched)
         )
-        # Persist Night QA to Mongo (idempotent)
+        seen_unmatched.update(result.resolver_unmatched)
+        qa_row = result.qa_row
+        qa_row[NOT_ON_ROSTER_COL] = ", ".join(not_on_roster)
+        night_qa_rows.append(qa_row)
+        bench_rows.extend(
+            [night] + [doc[k] for k in BENCH_NIGHT_FIELDS] for doc in result.bench_docs
+        )
+
+        written_nights.append(night)
+        if audit_participation:
+            written["participation_m"].extend(result.part_rows)
+        written["blocks"].extend(result.block_docs)
+        written["bench_night_totals"].extend(result.bench_docs)
         qa_doc = {
-            "night_id": night,
-            "reports": report_codes,
-            "report_mains": report_mains,
-            "report_start_ms": report_start_ms,
-            "report_end_ms": report_end_ms,
-            "night_start_ms": night_start_ms,
-            "night_end_ms": night_end_ms,
-            "mythic_fights": len(fights_m),
-            "mythic_start_ms": env[0],
-            "mythic_end_ms": env[1],
-            "break_start_ms": br_range[0] if br_range else None,
-            "break_end_ms": br_range[1] if br_range else None,
-            "break_override_start_ms": override_start_ms,
-            "break_override_end_ms": override_end_ms,
-            "break_duration_min": break_duration if break_duration != "" else None,
-            "mythic_pre_min": round(split["pre_ms"] / 60000.0, 2),
-            "mythic_post_min": round(split["post_ms"] / 60000.0, 2),
-            "mythic_post_extension_min": post_extension_min,
-            "mythic_override_start_ms": mythic_override_start_ms,
-            "mythic_override_end_ms": mythic_override_end_ms,
-            "gap_window": (bw.start_pt, bw.end_pt),
-            "min_max_break": (bw.min_gap_minutes, bw.max_gap_minutes),
-            "largest_gap_min": largest_gap,
-            "gap_candidates": candidate_gaps_db,
-            "override_used": override_used,
+            **result.qa_doc,
             "not_on_roster_mains": not_on_roster,
+            "resolver_unmatched": result.resolver_unmatched,
+            "sheet_row": qa_row,
         }
-        db["night_qa"].update_one({"night_id": night}, {"$set": qa_doc}, upsert=True)
-
-        # Participation stage: build per-fight rows and persist
-        part_rows = build_mythic_participation(fights_m, resolver=resolver)
-        db["participation_m"].delete_many({"night_id": night})
-        if part_rows:
-            db["participation_m"].insert_many(part_rows)
-
-        # Blocks stage
-        blocks = build_blocks(part_rows, break_range=br_range, fights_all=fights_all)
-
-        seq = defaultdict(int)
-        block_docs = []
-        for b in blocks:
-            seq_key = (b["night_id"], b["main"], b["half"])
-            seq[seq_key] += 1
-            block_docs.append({**b, "block_seq": seq[seq_key]})
-
-        db["blocks"].delete_many({"night_id": night})
-        if block_docs:
-            db["blocks"].insert_many(block_docs)
-
-        # Determine participants from the last non-Mythic boss fight before Mythic start
-        last_nm_mains = last_non_mythic_boss_mains(fights_all, env[0], resolver=resolver)
-
-        bench = bench_minutes_for_night(
-            blocks,
-            split["pre_ms"],
-            split["post_ms"],
-            overrides=overrides_by_night.get(night, {}),
-            last_fight_mains=last_nm_mains,
-            roster_map=None,
-            pre_extension_ms=start_extension_ms,
-            pre_extension_mains=first_mythic_mains,
-            post_extension_ms=post_extension_credit_ms,
-            post_extension_mains=last_mythic_mains,
-        )
-
-        # Persist bench_night_totals for this night
-        bench_docs = []
-        for row in bench:
-            bench_rows.append(
-                [
-                    night,
-                    row["main"],
-                    row["played_pre_min"],
-                    row["played_post_min"],
-                    row["played_total_min"],
-                    row["bench_pre_min"],
-                    row["bench_post_min"],
-                    row["bench_total_min"],
-                    row["avail_pre"],
-                    row["avail_post"],
-                    row["status_source"],
-                ]
+        written_qa.append(qa_doc)
+        context.add_night(night, qa_doc, result.bench_docs)
+
+    if written_nights or emptied_nights:
+        mark_week_nights(db, written_nights + emptied_nights)
+        for name, docs in written.items():
+            publish_nights(
+                db, name, written_nights + emptied_nights, docs, mode=publish_mode, total_nights=len(nights)
             )
-            doc = {
-                "night_id": night,
-                "main": row["main"],
-                "played_pre_min": row["played_pre_min"],
-                "played_post_min": row["played_post_min"],
-                "played_total_min": row["played_total_min"],
-                "bench_pre_min": row["bench_pre_min"],
-                "bench_post_min": row["bench_post_min"],
-                "bench_total_min": row["bench_total_min"],
-                "avail_pre": row["avail_pre"],
-                "avail_post": row["avail_post"],
-                "status_source": row["status_source"],
-            }
-            bench_docs.append(doc)
-
-        db["bench_night_totals"].delete_many({"night_id": night})
-        if bench_docs:
-            db["bench_night_totals"].insert_many(bench_docs)
-
-    # Refresh weekly aggregates so Mongo mirrors the latest nightly totals
-    from .week_agg import materialize_rankings, materialize_week_totals
+        # Night QA is written last so an interrupted run recomputes its nights.
+        for qa_doc in written_qa:
+            db["night_qa"].update_one({"night_id": qa_doc["night_id"]}, {"$set": qa_doc}, upsert=True)
+        if emptied_nights:
+            db["night_qa"].delete_many({"night_id": {"$in": emptied_nights}})
+        save_empty_nights(
+            db, {night: fingerprints[night] for night in emptied_nights}, cleared=written_nights
+        )
 
-    weeks_written, week_total_docs = materialize_week_totals(db, include_docs=True)
-    ranks_written, ranking_docs = materialize_rankings(db, include_docs=True)
+    resolver.not_on_roster = seen_unmatched
+    memo_misses = len(to_compute)
+    reused = clean_nights + memo_hits
+    log.info(
+        "night memo",
+        extra={
+            "stage": "compute",
+            "clean_nights": clean_nights,
+            "memo_hits": memo_hits,
+            "memo_misses": memo_misses,
+            "hit_rate": round(reused / (reused + memo_misses), 3) if reused + memo_misses else None,
+            "workers": workers,
+            "engine": engine,
+            "compute_ms": compute_ms,
+        },
+    )
+    clear_dirty_nights(db, dirty_nights | pending_nights)
+    save_night_inputs(db, global_hash=global_hash, overrides=override_hashes)
+
+    # Refresh weekly aggregates so Mongo mirrors the latest nightly totals.
+    # The night loop's documents are handed over in memory; only nights it
+    # did not hold are read back.
+    context.load_missing_nights(db)
+    # Stored week totals are merged only for the weeks of nights whose bench
+    # totals changed since the last week stage; a roster edit (join/leave
+    # nights pad the weeks) or a full recompute rewrites every week.
+    roster_hash = inputs_hash(
+        {
+            r["main"]: [r.get("active", True), r.get("join_night"), r.get("leave_night")]
+            for r in roster_docs
+            if r.get("main")
+        }
+    )
+    week_state = load_week_totals_state(db)
+    pending_week_nights = sorted(week_state.get("nights") or [])
+    changed_nights = None
+    if not full_recompute and week_state.get("roster_hash") == roster_hash:
+        changed_nights = pending_week_nights
+    attendance_rows = None
+    if engine == "columnar":
+        from .season_engine import materialize_season_frame
+
+        week_total_docs, ranking_docs, attendance_rows = materialize_season_frame(
+            db, context, publish_mode=publish_mode, changed_nights=changed_nights
+        )
+        weeks_written, ranks_written = len(week_total_docs), len(ranking_docs)
+    else:
+        weeks_written, week_total_docs = materialize_week_totals(
+            db,
+            include_docs=True,
+            context=context,
+            publish_mode=publish_mode,
+            changed_nights=changed_nights,
+        )
+        ranks_written, ranking_docs = materialize_rankings(
+            db, include_docs=True, context=context, publish_mode=publish_mode
+        )
+    save_week_totals_state(db, roster_hash=roster_hash, refreshed=pending_week_nights)
 
     log.info(
         "weekly aggregates refreshed",
@@ -803,6 +990,7 @@ def run_pipeline(
             "stage": "compute.week",
             "weeks": weeks_written,
             "ranks": ranks_written,
+            "week_merge_nights": None if changed_nights is None else len(changed_nights),
         },
     )
 
@@ -875,7 +1063,8 @@ def run_pipeline(
         start_cell=settings.sheets.starts.bench_week_totals,
     )
 
-    attendance_rows = build_attendance_rows(db)
+    if attendance_rows is None:
+        attendance_rows = build_attendance_rows(db, context)
     attendance_existing_header_rows = sheet_values.get("attendance_header", [])
     attendance_existing_header = (
         attendance_existing_header_rows[0]
@@ -953,6 +1142,41 @@ def run_pipeline(
     )
 
 
+@cli.command(help="Run ingest, compute and week export once, ignoring the trigger.")
+@click.option("--config", default="config.yaml", show_default=True)
+@click.option(
+    "--force-full-reingest",
+    is_flag=True,
+    default=False,
+    help="Force ingest of all reports even if they were previously ingested.",
+)
+@click.option(
+    "--full-recompute",
+    is_flag=True,
+    default=False,
+    help="Recompute every night instead of only nights whose inputs changed.",
+)
+@click.option(
+    "--workers",
+    default=1,
+    show_default=True,
+    type=click.IntRange(1, None),
+    help="Processes used to compute nights. 1 computes them in this process.",
+)
+def compute(config, force_full_reingest, full_recompute, workers):
+    log = setup_logging()
+    settings, sheet_client, sheet_values = _load_settings_and_pipeline_values(config)
+    run_pipeline(
+        settings,
+        log,
+        force_full_reingest=force_full_reingest,
+        sheet_values=sheet_values,
+        sheet_client=sheet_client,
+        full_recompute=full_recompute,
+        workers=workers,
+    )
+
+
 @cli.command()
 @click.option("--config", default="config.yaml", show_default=True)
 @click.option(
@@ -995,6 +1219,20 @@ def run_pipeline(
     show_default=True,
     help="Force ingest of all reports even if they were previously ingested.",
 )
+@click.option(
+    "--full-recompute",
+    is_flag=True,
+    default=False,
+    show_default=True,
+    help="Recompute every night instead of only nights whose inputs changed.",
+)
+@click.option(
+    "--workers",
+    default=1,
+    show_default=True,
+    type=click.IntRange(1, None),
+    help="Processes used to compute nights. 1 computes them in the loop process.",
+)
 def loop(
     config,
     max_errors,
@@ -1002,6 +1240,8 @@ def loop(
     max_iterations,
     ignore_trigger_state,
     force_full_reingest,
+    full_recompute,
+    workers,
 ):
     """Continuously ingest and compute outputs for the configured spreadsheet."""
 
@@ -1074,6 +1314,8 @@ def loop(
                         force_full_reingest=force_full_reingest,
                         sheet_values=sheet_values,
                         sheet_client=sheet_client,
+                        full_recompute=full_recompute,
+                        workers=workers,
                     )
                     consecutive_errors = 0
             except click.ClickException:
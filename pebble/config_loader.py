@@ -4,6 +4,7 @@ from copy import deepcopy
 from pathlib import Path
 import logging
 import os
+from typing import Literal
 
 from dotenv import load_dotenv
 from pydantic import BaseModel, Field
@@ -64,6 +65,10 @@ class SheetsConfig(BaseModel):
 class MongoConfig(BaseModel):
     uri: str
     db: str = Field(default="pebble")
+    write_batch_size: int = Field(default=500, ge=1)
+    write_buffer_bytes: int = Field(default=8 * 1024 * 1024, ge=1)
+    audit_participation: bool = Field(default=False)
+    publish_mode: Literal["replace", "swap"] = Field(default="replace")
 
 
 class WCLConfig(BaseModel):
@@ -71,11 +76,22 @@ class WCLConfig(BaseModel):
     client_secret: str
     base_url: str = Field(default="https://www.warcraftlogs.com/api/v2/client")
     token_url: str = Field(default="https://www.warcraftlogs.com/oauth/token")
+    max_concurrency: int = Field(default=4, ge=1)
+    batch_size: int = Field(default=1, ge=1)
+    share_token: bool = Field(default=False)
+    rate_limit_reserve_fraction: float = Field(default=0.2, ge=0.0, le=1.0)
+    rate_limit_refresh_seconds: int = Field(default=60, ge=0)
+    incremental_live_reports: bool = Field(default=False)
+    memory_cache_entries: int = Field(default=128, ge=0)
+    memory_cache_seconds: int = Field(default=900, ge=0)
+    events_presence: bool = Field(default=False)
+    presence_gap_seconds: int = Field(default=60, ge=1)
 
 
 class RedisConfig(BaseModel):
     url: str = Field(default="redis://localhost:6379/0")
     key_prefix: str = Field(default="pebble:wcl:")
+    codec: Literal["json", "zlib"] = Field(default="zlib")
 
 
 class BreakWindowConfig(BaseModel):
@@ -92,12 +108,25 @@ class TimeConfig(BaseModel):
     mythic_default_start_pt: str = Field(default="")
 
 
+class CacheConfig(BaseModel):
+    backend: Literal["redis", "memory", "disk"] = Field(default="redis")
+    disk_path: str = Field(default=".cache/pebble")
+    stale_ttl_seconds: int = Field(default=3600, ge=0)
+
+
+class ComputeConfig(BaseModel):
+    engine: Literal["loop", "columnar"] = Field(default="loop")
+    bench_engine: Literal["python", "numpy"] = Field(default="python")
+
+
 class Settings(BaseModel):
     sheets: SheetsConfig
     mongo: MongoConfig
     wcl: WCLConfig
     redis: RedisConfig = Field(default_factory=RedisConfig)
+    cache: CacheConfig = Field(default_factory=CacheConfig)
     time: TimeConfig = Field(default_factory=TimeConfig)
+    compute: ComputeConfig = Field(default_factory=ComputeConfig)
     service_account_json: str = Field(default="service-account.json")
 
 
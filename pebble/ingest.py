@@ -1,16 +1,27 @@
 from __future__ import annotations
-from typing import Any, Dict, List, Optional, Sequence, Tuple
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from datetime import datetime
-from pymongo import UpdateOne
 import hashlib
+import json
 import re
 import string
 import logging
+import time
 from .sheets_client import SheetsClient
 from .config_loader import Settings, load_settings
-from .mongo_client import get_db
-from .wcl_client import WCLClient
+from .mongo_client import BulkWriter, get_db
+from .pipeline_state import mark_dirty_nights
+from .presence import ingest_report_presence
+from .wcl_client import (
+    PRIORITY_LIVE,
+    PRIORITY_LOW,
+    WCLClient,
+    _FRESH_MS,
+    get_shared_client,
+)
 from .utils.time import (
     night_id_from_ms,
     ms_to_pt_iso,
@@ -59,6 +70,18 @@ REPORT_HEADERS = {
 ABS_MS_THRESHOLD = 10**12  # heuristic: anything below this is treated as relative ms
 
 
+def bundle_digest(bundle: dict) -> str:
+    """Return a content digest of the fights and actors in a report bundle."""
+
+    payload = {
+        "startTime": bundle.get("startTime"),
+        "fights": bundle.get("fights") or [],
+        "actors": (bundle.get("masterData") or {}).get("actors") or [],
+    }
+    raw = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
 def _report_inputs_hash(
     notes: str,
     break_start: str,
@@ -145,6 +168,151 @@ def _sheet_values_batch(
     return values_by_key
 
 
+@dataclass
+class BundleFetch:
+    """Outcome of fetching a single report bundle from WCL."""
+
+    code: str
+    bundle: Optional[dict] = None
+    error: Optional[Exception] = None
+    elapsed_ms: int = 0
+    incremental: bool = False
+
+
+def _fetch_one_bundle(wcl: WCLClient, code: str, since_fight_id: Optional[int] = None) -> BundleFetch:
+    incremental = since_fight_id is not None
+    started = time.monotonic()
+    try:
+        bundle = wcl.fetch_report_fights_since(code, since_fight_id) if incremental else None
+        if bundle is None:
+            # No report on the first incremental page: read the full bundle,
+            # which reports a missing report the same way as a first fetch.
+            incremental = False
+            bundle = wcl.fetch_report_bundle(code)
+    except Exception as exc:
+        elapsed_ms = int((time.monotonic() - started) * 1000)
+        logger.warning(
+            "Failed to fetch WCL report bundle",
+            extra={"code": code, "elapsed_ms": elapsed_ms},
+            exc_info=True,
+        )
+        return BundleFetch(code=code, error=exc, elapsed_ms=elapsed_ms, incremental=incremental)
+    elapsed_ms = int((time.monotonic() - started) * 1000)
+    logger.info(
+        "Fetched WCL report bundle",
+        extra={"code": code, "elapsed_ms": elapsed_ms, "incremental": incremental},
+    )
+    return BundleFetch(code=code, bundle=bundle, elapsed_ms=elapsed_ms, incremental=incremental)
+
+
+def _fetch_bundle_batch(wcl: WCLClient, codes: Sequence[str]) -> List[BundleFetch]:
+    if len(codes) == 1:
+        return [_fetch_one_bundle(wcl, codes[0])]
+    started = time.monotonic()
+    try:
+        bundles = wcl.fetch_report_bundles(codes)
+    except Exception:
+        # One bad code fails the whole aliased query; retry individually so
+        # only the offending reports are reported as failures.
+        logger.warning(
+            "Failed to fetch WCL report bundle batch; retrying individually",
+            extra={"codes": list(codes)},
+            exc_info=True,
+        )
+        return [_fetch_one_bundle(wcl, code) for code in codes]
+    elapsed_ms = int((time.monotonic() - started) * 1000)
+    logger.info(
+        "Fetched WCL report bundle batch",
+        extra={"codes": list(codes), "elapsed_ms": elapsed_ms},
+    )
+    return [BundleFetch(code=code, bundle=bundles[code], elapsed_ms=elapsed_ms) for code in codes]
+
+
+def _fetch_report_bundles(
+    wcl: WCLClient,
+    codes: Sequence[str],
+    *,
+    max_workers: int = 1,
+    batch_size: int = 1,
+    since: Optional[Dict[str, int]] = None,
+) -> Dict[str, BundleFetch]:
+    """Fetch report bundles for ``codes`` with at most ``max_workers`` in flight.
+
+    Codes are grouped into batches of ``batch_size`` reports; single-report
+    batches go through :meth:`WCLClient.fetch_report_bundle` and larger ones
+    through :meth:`WCLClient.fetch_report_bundles`, so the client's retry
+    policy and cache apply either way. Codes listed in ``since`` (code → first
+    fight id) are fetched incrementally and never batched. Failures are
+    captured on the returned :class:`BundleFetch` rather than raised so callers
+    can decide how to report them. The mapping preserves the order of
+    ``codes``.
+    """
+
+    unique_codes = list(dict.fromkeys(codes))
+    if not unique_codes:
+        return {}
+
+    since = since or {}
+    full_codes = [code for code in unique_codes if code not in since]
+    size = max(1, int(batch_size or 1))
+    jobs: List[Callable[[], List[BundleFetch]]] = [
+        (lambda batch=full_codes[i : i + size]: _fetch_bundle_batch(wcl, batch))
+        for i in range(0, len(full_codes), size)
+    ]
+    jobs.extend(
+        (lambda code=code: [_fetch_one_bundle(wcl, code, since[code])])
+        for code in unique_codes
+        if code in since
+    )
+    workers = max(1, min(int(max_workers or 1), len(jobs)))
+    if workers == 1:
+        results = [job() for job in jobs]
+    else:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="wcl-fetch") as pool:
+            results = list(pool.map(lambda job: job(), jobs))
+    by_code = {res.code: res for batch in results for res in batch}
+    return {code: by_code[code] for code in unique_codes}
+
+
+def _cache_counter_delta(
+    before: Dict[str, Dict[str, int]], after: Dict[str, Dict[str, int]]
+) -> Dict[str, Dict[str, int]]:
+    """Per-tier cache hits/misses accumulated between two counter snapshots."""
+
+    return {
+        tier: {
+            key: count - before.get(tier, {}).get(key, 0) for key, count in counts.items()
+        }
+        for tier, counts in after.items()
+    }
+
+
+def _actor_doc(actor: dict) -> dict:
+    return {
+        "actor_id": int(actor.get("id")),
+        "name": (f"{actor.get('name')}-{actor.get('server')}" if actor.get("server") else actor.get("name")),
+        "type": actor.get("type"),
+        "subType": actor.get("subType"),
+        "server": actor.get("server"),
+    }
+
+
+def _fetch_priority(rep: dict, existing: Optional[dict], now_ms: int) -> str:
+    """Classify a report fetch as live (raid night) or low priority.
+
+    Rows marked in-progress, reports never ingested before and reports that
+    started within the fresh window are live; everything else (old reports
+    being reingested) can wait for spare rate-limit budget.
+    """
+
+    if rep.get("status") in ("in-progress", "in progress"):
+        return PRIORITY_LIVE
+    start_ms = int((existing or {}).get("start_ms") or 0)
+    if not start_ms or now_ms - start_ms < _FRESH_MS:
+        return PRIORITY_LIVE
+    return PRIORITY_LOW
+
+
 def _normalize_fight_times(report_start_ms: int, fight_start: int, fight_end: int) -> tuple[int, int, int, int]:
     """Return (rel_start, rel_end, abs_start, abs_end) in ms.
     WCL GraphQL fights are *usually* relative to report start; use a robust heuristic.
@@ -381,9 +549,11 @@ def ingest_reports(
     rows: Sequence[Sequence[Any]] | None = None,
     client: SheetsClient,
     force_full_reingest: bool = False,
+    db=None,
 ) -> dict:
     s = s or load_settings()
-    db = get_db(s)
+    if db is None:
+        db = get_db(s)
 
     start = s.sheets.starts.reports
     sheet_client = client
@@ -449,6 +619,7 @@ def ingest_reports(
             {
                 "row": r_index,
                 "code": code,
+                "status": status,
                 "notes": notes,
                 "break_override_start": break_start,
                 "break_override_end": break_end,
@@ -468,44 +639,216 @@ def ingest_reports(
     if code_set:
         cursor = db["reports"].find(
             {"code": {"$in": list(code_set)}},
-            {"code": 1, "inputs_hash": 1, "ingested_at": 1},
+            {
+                "code": 1,
+                "inputs_hash": 1,
+                "ingested_at": 1,
+                "start_ms": 1,
+                "last_fight_id": 1,
+                "bundle_digest": 1,
+            },
         )
         existing_reports = {doc["code"]: doc for doc in cursor}
 
-    wcl = WCLClient(
-        s.wcl.client_id,
-        s.wcl.client_secret,
-        base_url=s.wcl.base_url,
-        token_url=s.wcl.token_url,
-        redis_url=s.redis.url,
-        cache_prefix=s.redis.key_prefix,
+    wcl = get_shared_client(s)
+    cache_before = wcl.cache_counters()
+
+    started_ms = int(time.time() * 1000)
+    incremental_enabled = bool(getattr(s.wcl, "incremental_live_reports", False)) and not force_full_reingest
+    ingested_codes: set[str] = set()
+
+    def _incremental_since(rep: dict) -> Optional[int]:
+        """Return the first fight id not yet seen for an already-ingested live report."""
+
+        if not incremental_enabled:
+            return None
+        existing = existing_reports.get(rep["code"])
+        if not existing or not existing.get("ingested_at"):
+            return None
+        last_fight_id = existing.get("last_fight_id")
+        start_ms = int(existing.get("start_ms") or 0)
+        if not last_fight_id or not start_ms or started_ms - start_ms >= _FRESH_MS:
+            return None
+        return int(last_fight_id) + 1
+
+    def _is_unchanged(rep: dict) -> bool:
+        existing = existing_reports.get(rep["code"])
+        if not (
+            existing
+            and existing.get("ingested_at")
+            and existing.get("inputs_hash")
+            and existing.get("inputs_hash") == rep.get("inputs_hash")
+        ):
+            return False
+        if rep["code"] in ingested_codes:
+            return True
+        # Live reports keep being polled for new pulls even when the sheet
+        # inputs did not change.
+        return not force_full_reingest and _incremental_since(rep) is None
+
+    # Live reports are fetched first; low-priority ones wait for spare budget.
+    budget = wcl.refresh_rate_limit()
+    live_codes: List[str] = []
+    low_codes: List[str] = []
+    since: Dict[str, int] = {}
+    for rep in targets:
+        if _is_unchanged(rep):
+            continue
+        priority = _fetch_priority(rep, existing_reports.get(rep["code"]), started_ms)
+        (live_codes if priority == PRIORITY_LIVE else low_codes).append(rep["code"])
+        resume_from = _incremental_since(rep)
+        if resume_from is not None:
+            since[rep["code"]] = resume_from
+
+    # Resolve every cacheable code in one round-trip so only misses reach WCL
+    # (and only misses count against the rate-limit budget).
+    fetched: Dict[str, BundleFetch] = {}
+    cacheable = [code for code in dict.fromkeys(live_codes + low_codes) if code not in since]
+    if cacheable:
+        cached = wcl.cached_report_bundles(cacheable)
+        fetched.update(
+            (code, BundleFetch(code=code, bundle=bundle)) for code, bundle in cached.items()
+        )
+        logger.info(
+            "WCL report cache lookup",
+            extra={
+                "hits": len(cached),
+                "misses": len(cacheable) - len(cached),
+                "hit_codes": sorted(cached),
+            },
+        )
+        live_codes = [code for code in live_codes if code not in fetched]
+        low_codes = [code for code in low_codes if code not in fetched]
+
+    deferred_codes: set[str] = set()
+    if low_codes and not budget.allows(PRIORITY_LOW):
+        deferred_codes = set(low_codes) - set(live_codes)
+        budget.deferred += len(deferred_codes)
+        logger.warning(
+            "Deferring low-priority WCL fetches to preserve rate-limit budget",
+            extra={"codes": sorted(deferred_codes), **budget.snapshot()},
+        )
+        low_codes = []
+    logger.info("WCL rate-limit budget", extra=budget.snapshot())
+
+    # Network fetches run concurrently; everything below stays in sheet-row order.
+    fetch_codes = live_codes + low_codes
+    fetched.update(
+        _fetch_report_bundles(
+            wcl,
+            fetch_codes,
+            max_workers=getattr(s.wcl, "max_concurrency", 1),
+            batch_size=getattr(s.wcl, "batch_size", 1),
+            since={code: first for code, first in since.items() if code in fetch_codes},
+        )
     )
 
+    # Upserts of every report are buffered and flushed per collection in
+    # unordered batches at the end of the iteration (or earlier once the
+    # buffer reaches ``write_buffer_bytes``). Each operation is tagged with
+    # its report code, so a failed write only rolls back that report.
+    writer = BulkWriter(
+        db,
+        batch_size=getattr(s.mongo, "write_batch_size", 500),
+        max_bytes=getattr(s.mongo, "write_buffer_bytes", 8 * 1024 * 1024),
+    )
     total_fights = 0
+    unchanged_bundles = 0
+    presence_intervals = 0
+    events_presence = bool(getattr(s.wcl, "events_presence", False))
     processed_reports = 0
+    dirty_nights: set[str] = set()
     skipped_reports = 0
+    deferred_reports = 0
+    incremental_reports = 0
+    failed_reports = 0
+    # code -> (first and end index of its sheet updates, stored report doc,
+    # fights written) for rolling back reports whose writes fail.
+    written: Dict[str, tuple[int, int, Optional[dict], int]] = {}
     for rep in targets:
         code = rep["code"]
-        existing = existing_reports.get(code)
-        if (
-            not force_full_reingest
-            and existing
-            and existing.get("ingested_at")
-            and existing.get("inputs_hash")
-            and existing.get("inputs_hash") == rep.get("inputs_hash")
-        ):
+        if _is_unchanged(rep):
             skipped_reports += 1
             continue
-        try:
-            bundle = wcl.fetch_report_bundle(code)
-        except Exception:
-            logger.warning("Failed to fetch WCL report bundle", extra={"code": code}, exc_info=True)
+        if code in deferred_codes:
+            deferred_reports += 1
+            continue
+        result = fetched.get(code)
+        bundle = result.bundle if result else None
+        if bundle is None:
             if status_idx is not None:
                 col_letter = _col_letter(status_idx)
                 rng = f"{s.sheets.tabs.reports}!{col_letter}{rep['row']}"
                 updates.append({"range": rng, "values": [["Bad report link"]]})
             continue
+
+        sheet_mark = len(updates)
+        stored_report = existing_reports.get(code)
+
+        # actors (players) per report — small, useful for audits; dedup by (report_code, actor_id)
+        fights = bundle.get("fights", []) or []
+        if result.incremental:
+            # Only pulls past the stored last fight are new; a live report
+            # with none of them leaves its night clean.
+            first_new = since[code]
+            fights = [f for f in fights if int(f.get("id") or 0) >= first_new]
+            # Only the new pulls were fetched: resolve players from the actors
+            # stored on earlier passes and ask WCL for masterData only when an
+            # unknown player id appears.
+            actor_map = {
+                int(a["actor_id"]): {k: a.get(k) for k in ("actor_id", "name", "type", "subType", "server")}
+                for a in db["actors"].find({"report_code": code}, {"_id": 0})
+            }
+            seen_ids = {int(pid) for f in fights for pid in (f.get("friendlyPlayers") or [])}
+            new_actors: Dict[int, dict] = {}
+            if seen_ids - set(actor_map):
+                try:
+                    actors = wcl.fetch_report_actors(code)
+                except Exception:
+                    logger.warning(
+                        "Failed to fetch WCL report actors; retrying next iteration",
+                        extra={"code": code},
+                        exc_info=True,
+                    )
+                    continue
+                for a in actors:
+                    doc = _actor_doc(a)
+                    if doc["actor_id"] not in actor_map:
+                        new_actors[doc["actor_id"]] = doc
+                actor_map.update(new_actors)
+            incremental_reports += 1
+        else:
+            actors = (bundle.get("masterData") or {}).get("actors") or []
+            actor_map = {int(a.get("id")): _actor_doc(a) for a in actors}
+            new_actors = actor_map
+        # A full bundle identical to the one stored last time (e.g. only the
+        # Notes or override cells changed) needs no actor or fight writes.
+        digest = None if result.incremental else bundle_digest(bundle)
+        bundle_unchanged = digest is not None and digest == (existing_reports.get(code) or {}).get(
+            "bundle_digest"
+        )
+        if bundle_unchanged:
+            unchanged_bundles += 1
+            new_actors = {}
+            fights = []
+        # Presence walks page through every Mythic fight's events, so a
+        # low-priority report waits for spare budget like its bundle fetch
+        # would. The bundle is cached, so the retry costs no WCL points.
+        if (
+            events_presence
+            and any(int(f.get("difficulty") or 0) == 5 for f in fights)
+            and _fetch_priority(rep, stored_report, started_ms) != PRIORITY_LIVE
+            and not budget.allows(PRIORITY_LOW)
+        ):
+            budget.deferred += 1
+            deferred_reports += 1
+            logger.warning(
+                "Deferring WCL presence walk to preserve rate-limit budget",
+                extra={"code": code, **budget.snapshot()},
+            )
+            continue
         processed_reports += 1
+        ingested_codes.add(code)
 
         # reports upsert
         report_start_ms = int(bundle.get("startTime"))
@@ -544,11 +887,29 @@ def ingest_reports(
             "last_checked_pt": now_iso,
             "inputs_hash": rep.get("inputs_hash"),
         }
-        db["reports"].update_one({"code": code}, {"$set": rep_doc}, upsert=True)
+        if digest is not None:
+            rep_doc["bundle_digest"] = digest
+        # A night needs recomputing when fights were written for it or the
+        # report's override cells changed.
+        previous = existing_reports.get(code) or {}
+        if fights or previous.get("inputs_hash") != rep.get("inputs_hash") or not previous.get("ingested_at"):
+            dirty_nights.add(night_id)
+        if fights:
+            # Remember where this report ends so live reports can be resumed
+            # incrementally on the next pass.
+            last_fight = max(fights, key=lambda f: int(f.get("id") or 0))
+            rep_doc["last_fight_id"] = int(last_fight.get("id") or 0)
+            rep_doc["last_fight_end_ms"] = _normalize_fight_times(
+                report_start_ms, last_fight.get("startTime"), last_fight.get("endTime")
+            )[3]
+        writer.update_one("reports", {"code": code}, {"$set": rep_doc}, upsert=True, tag=code)
         existing_reports[code] = {
             "code": code,
             "ingested_at": now_dt,
             "inputs_hash": rep.get("inputs_hash"),
+            "start_ms": report_start_ms,
+            "last_fight_id": rep_doc.get("last_fight_id", (existing_reports.get(code) or {}).get("last_fight_id")),
+            "bundle_digest": rep_doc.get("bundle_digest", (existing_reports.get(code) or {}).get("bundle_digest")),
         }
 
         def _update(idx: int | None, value: str):
@@ -564,31 +925,39 @@ def ingest_reports(
         _update(report_end_idx, end_sheet)
         _update(created_by_idx, (bundle.get("owner") or {}).get("name", ""))
 
-        # actors (players) per report — small, useful for audits; dedup by (report_code, actor_id)
-        actors = (bundle.get("masterData") or {}).get("actors") or []
-        actor_map = {
-            int(a.get("id")): {
-                "actor_id": int(a.get("id")),
-                "name": (f"{a.get('name')}-{a.get('server')}" if a.get("server") else a.get("name")),
-                "type": a.get("type"),
-                "subType": a.get("subType"),
-                "server": a.get("server"),
-            }
-            for a in actors
-        }
-        if actor_map:
-            ops = []
-            for aid, a in actor_map.items():
-                key = {"report_code": code, "actor_id": aid}
-                ops.append(UpdateOne(key, {"$set": {**key, **a}}, upsert=True))
-            if ops:
-                db["actors"].bulk_write(ops, ordered=False)
+        for aid, a in (new_actors or {}).items():
+            key = {"report_code": code, "actor_id": aid}
+            writer.update_one("actors", key, {"$set": {**key, **a}}, upsert=True, tag=code)
 
         # fights (single unified collection persisted to ``fights_all``)
-        fights = bundle.get("fights", []) or []
-        fops = []
+        normalized = []
         for f in fights:
             rel_s, rel_e, abs_s, abs_e = _normalize_fight_times(report_start_ms, f.get("startTime"), f.get("endTime"))
+            normalized.append((f, rel_s, rel_e, abs_s, abs_e, canonical_fight_key(f, abs_s, abs_e)))
+
+        presence_ids: set[int] = set()
+        if events_presence:
+            presence_fights = [
+                {"id": int(f.get("id")), "key": key, "rel_start_ms": rel_s, "rel_end_ms": rel_e}
+                for f, rel_s, rel_e, _, _, key in normalized
+                if int(f.get("difficulty") or 0) == 5
+            ]
+            if presence_fights:
+                per_fight = ingest_report_presence(
+                    wcl,
+                    db,
+                    code=code,
+                    report_start_ms=report_start_ms,
+                    night_id=night_id,
+                    fights=presence_fights,
+                    actor_map=actor_map,
+                    gap_ms=getattr(s.wcl, "presence_gap_seconds", 60) * 1000,
+                    max_workers=getattr(s.wcl, "max_concurrency", 1),
+                )
+                presence_ids = set(per_fight)
+                presence_intervals += sum(per_fight.values())
+
+        for f, rel_s, rel_e, abs_s, abs_e, key in normalized:
             participants = []
             for pid in f.get("friendlyPlayers") or []:
                 a = actor_map.get(int(pid))
@@ -605,7 +974,6 @@ def ingest_reports(
                     }
                 )
 
-            key = canonical_fight_key(f, abs_s, abs_e)
             base = {
                 **key,
                 "report_code": code,
@@ -627,23 +995,58 @@ def ingest_reports(
             # Use $setOnInsert so the first observed report for a given fight
             # establishes the document; subsequent overlapping reports only add
             # participants but do not clobber the original report metadata.
-            fops.append(
-                UpdateOne(
-                    key,
-                    {
-                        "$setOnInsert": base,
-                        "$addToSet": {"participants": {"$each": participants}},
-                    },
-                    upsert=True,
-                )
-            )
-        if fops:
-            db["fights_all"].bulk_write(fops, ordered=False)
+            update = {
+                "$setOnInsert": base,
+                "$addToSet": {"participants": {"$each": participants}},
+            }
+            if int(f.get("id")) in presence_ids:
+                update["$set"] = {"has_presence": True}
+            writer.update_one("fights_all", key, update, upsert=True, tag=code)
+
+        written[code] = (sheet_mark, len(updates), stored_report, len(fights))
         total_fights += len(fights)
 
+    writer.flush()
+    dropped_updates: set[int] = set()
+    for code in sorted(writer.failed_tags):
+        sheet_start, sheet_end, stored_report, fight_count = written[code]
+        logger.warning("Failed to write WCL report; retrying next iteration", extra={"code": code})
+        # Keep the sheet untouched and clear ingested_at and the bundle
+        # digest so the next iteration fetches and writes the report again.
+        # Its night stays dirty since some writes may have landed.
+        dropped_updates.update(range(sheet_start, sheet_end))
+        db["reports"].update_one({"code": code}, {"$unset": {"ingested_at": "", "bundle_digest": ""}})
+        if stored_report is None:
+            existing_reports.pop(code, None)
+        else:
+            existing_reports[code] = stored_report
+        ingested_codes.discard(code)
+        processed_reports -= 1
+        failed_reports += 1
+        total_fights -= fight_count
+    if dropped_updates:
+        updates[:] = [u for i, u in enumerate(updates) if i not in dropped_updates]
+
+    writes = writer.counts()
+    logger.info("Flushed ingest writes", extra={"writes": writes})
+    mark_dirty_nights(db, dirty_nights)
+
+    cache = _cache_counter_delta(cache_before, wcl.cache_counters())
+    logger.info("WCL report cache", extra={"cache": cache})
+
     return {
         "reports": processed_reports,
         "skipped_reports": skipped_reports,
+        "deferred_reports": deferred_reports,
+        "failed_reports": failed_reports,
+        "incremental_reports": incremental_reports,
         "fights": total_fights,
+        "dirty_nights": sorted(dirty_nights),
+        "unchanged_bundles": unchanged_bundles,
+        "presence_intervals": presence_intervals,
+        "writes": writes,
+        "fetch_ms": {code: res.elapsed_ms for code, res in fetched.items()},
+        "rate_limit": budget.snapshot(),
+        "cache": cache,
         "sheet_updates": updates,
     }
@@ -1,8 +1,15 @@
 from __future__ import annotations
-from pymongo import MongoClient, ASCENDING, monitoring
+from collections import defaultdict
+from itertools import groupby
+from typing import Any, Dict, Iterable, List, Optional
+from pymongo import MongoClient, ASCENDING, UpdateOne, monitoring
+from pymongo.errors import BulkWriteError
+import bson
 import logging
 from .config_loader import Settings
 
+logger = logging.getLogger(__name__)
+
 
 class MongoCommandLogger(monitoring.CommandListener):
     """Emit logs for MongoDB commands via PyMongo's monitoring API."""
@@ -61,6 +68,214 @@ def get_db(s: Settings):
     return get_client(s)[s.mongo.db]
 
 
+class BulkWriter:
+    """Unit-of-work buffer for ``UpdateOne`` operations.
+
+    Operations are queued per collection and written with unordered
+    ``bulk_write`` calls of at most ``batch_size`` operations, either when
+    :meth:`flush` is called or once the queued operations exceed
+    ``max_bytes`` of BSON. Result counts are accumulated per collection.
+    Operations on the same collection must not depend on each other's order.
+
+    Each operation may carry a ``tag`` (e.g. the report it belongs to). A
+    batch that fails with :class:`BulkWriteError` does not stop the flush;
+    the tags of its failed operations are collected in :attr:`failed_tags`.
+    Failures of untagged operations are re-raised.
+    """
+
+    def __init__(self, db, *, batch_size: int = 500, max_bytes: int = 8 * 1024 * 1024):
+        self.db = db
+        self.batch_size = max(1, int(batch_size))
+        self.max_bytes = max(1, int(max_bytes))
+        self._pending: Dict[str, List[tuple[UpdateOne, Any]]] = defaultdict(list)
+        self._pending_bytes = 0
+        self._counts: Dict[str, Dict[str, int]] = {}
+        self.failed_tags: set = set()
+
+    def update_one(
+        self, collection: str, filter: dict, update: dict, *, upsert: bool = False, tag: Any = None
+    ) -> None:
+        self._pending[collection].append((UpdateOne(filter, update, upsert=upsert), tag))
+        self._pending_bytes += len(bson.encode(filter)) + len(bson.encode(update))
+        if self._pending_bytes >= self.max_bytes:
+            self.flush()
+
+    def flush(self, collection: Optional[str] = None) -> None:
+        names = [collection] if collection is not None else list(self._pending)
+        for name in names:
+            ops = self._pending.pop(name, [])
+            counts = self._counts.setdefault(
+                name, {"ops": 0, "batches": 0, "matched": 0, "modified": 0, "upserted": 0}
+            )
+            for i in range(0, len(ops), self.batch_size):
+                batch = ops[i : i + self.batch_size]
+                counts["ops"] += len(batch)
+                counts["batches"] += 1
+                try:
+                    res = self.db[name].bulk_write([op for op, _ in batch], ordered=False)
+                except BulkWriteError as exc:
+                    details = exc.details or {}
+                    tags = [batch[err["index"]][1] for err in details.get("writeErrors") or []]
+                    if not tags or any(tag is None for tag in tags):
+                        raise
+                    self.failed_tags.update(tags)
+                    counts["matched"] += int(details.get("nMatched") or 0)
+                    counts["modified"] += int(details.get("nModified") or 0)
+                    counts["upserted"] += int(details.get("nUpserted") or 0)
+                    continue
+                counts["matched"] += res.matched_count
+                counts["modified"] += res.modified_count
+                counts["upserted"] += res.upserted_count
+        if not self._pending:
+            self._pending_bytes = 0
+
+    @property
+    def pending(self) -> int:
+        return sum(len(ops) for ops in self._pending.values())
+
+    def counts(self) -> Dict[str, Dict[str, int]]:
+        return {name: dict(c) for name, c in self._counts.items()}
+
+
+def find_by_night(
+    db,
+    collection: str,
+    nights: Iterable[str],
+    projection: Optional[dict] = None,
+    *,
+    sort: Optional[List[tuple]] = None,
+) -> Dict[str, List[dict]]:
+    """Load the documents of ``nights`` with one night-sorted cursor.
+
+    Returns the documents grouped by ``night_id``; nights without documents
+    are absent. The cursor sorts on ``night_id`` alone so the collection's
+    ``night_id`` index serves it; within a night documents come back in index
+    order unless ``sort`` is given, which must follow ``night_id`` in one of
+    the collection's compound indexes. ``projection`` must keep ``night_id``.
+    """
+
+    nights = sorted(set(nights))
+    if not nights:
+        return {}
+    cursor = (
+        db[collection]
+        .find({"night_id": {"$in": nights}}, projection)
+        .sort([("night_id", ASCENDING)] + list(sort or []))
+    )
+    return {night: list(docs) for night, docs in groupby(cursor, key=lambda d: d["night_id"])}
+
+
+# Indexes of the collections the pipeline rebuilds from other collections;
+# publishing into a staging collection creates them before the swap.
+DERIVED_INDEXES: Dict[str, List[tuple]] = {
+    "participation_m": [
+        (
+            [
+                ("night_id", ASCENDING),
+                ("report_code", ASCENDING),
+                ("fight_id", ASCENDING),
+                ("main", ASCENDING),
+            ],
+            {"unique": True},
+        ),
+        ([("night_id", ASCENDING)], {}),
+    ],
+    "blocks": [
+        (
+            [
+                ("night_id", ASCENDING),
+                ("main", ASCENDING),
+                ("half", ASCENDING),
+                ("block_seq", ASCENDING),
+            ],
+            {"unique": True},
+        ),
+        ([("night_id", ASCENDING)], {}),
+    ],
+    "bench_night_totals": [([("night_id", ASCENDING), ("main", ASCENDING)], {"unique": True})],
+    "bench_week_totals": [([("game_week", ASCENDING), ("main", ASCENDING)], {"unique": True})],
+    "bench_rankings": [([("main", ASCENDING)], {"unique": True})],
+}
+
+STAGING_SUFFIX = "__staging"
+# A swap of a per-night collection copies every other night through $out;
+# below this share of the nights an in-place per-night replace is cheaper.
+SWAP_MIN_NIGHT_FRACTION = 0.5
+
+
+def _create_derived_indexes(coll, name: str) -> None:
+    for keys, options in DERIVED_INDEXES[name]:
+        coll.create_index(keys, **options)
+
+
+def _staging(db, collection: str):
+    staging = db[collection + STAGING_SUFFIX]
+    staging.drop()
+    _create_derived_indexes(staging, collection)
+    return staging
+
+
+def publish_collection(db, collection: str, docs: List[dict], *, mode: str = "replace") -> int:
+    """Replace every document of ``collection`` with ``docs``.
+
+    ``mode="replace"`` deletes and re-inserts in place, so readers see the
+    collection empty or half written while it runs. ``mode="swap"`` writes
+    into ``<collection>__staging`` with the indexes already built and renames
+    it over ``collection``; readers see the old documents until the rename
+    and the new ones after it.
+    """
+
+    if mode == "swap":
+        staging = _staging(db, collection)
+        if docs:
+            staging.insert_many(docs)
+        staging.rename(collection, dropTarget=True)
+    else:
+        db[collection].delete_many({})
+        if docs:
+            db[collection].insert_many(docs)
+    return len(docs)
+
+
+def publish_nights(
+    db,
+    collection: str,
+    nights: Iterable[str],
+    docs: List[dict],
+    *,
+    mode: str = "replace",
+    total_nights: Optional[int] = None,
+) -> int:
+    """Replace the documents of ``nights`` in ``collection`` with ``docs``.
+
+    Same modes as :func:`publish_collection`. In ``swap`` mode the documents
+    of every other night are copied into the staging collection server-side
+    with ``$out`` before ``docs`` are added, which costs a pass over the
+    whole collection. Given ``total_nights``, the swap is only used when
+    ``nights`` cover at least :data:`SWAP_MIN_NIGHT_FRACTION` of them; fewer
+    nights are replaced in place.
+    """
+
+    nights = sorted(set(nights))
+    if mode == "swap" and total_nights:
+        if len(nights) < SWAP_MIN_NIGHT_FRACTION * total_nights:
+            mode = "replace"
+    if mode == "swap":
+        staging = _staging(db, collection)
+        # $out keeps the indexes of the collection it replaces.
+        db[collection].aggregate(
+            [{"$match": {"night_id": {"$nin": nights}}}, {"$out": staging.name}]
+        )
+        if docs:
+            staging.insert_many(docs)
+        staging.rename(collection, dropTarget=True)
+    else:
+        db[collection].delete_many({"night_id": {"$in": nights}})
+        if docs:
+            db[collection].insert_many(docs)
+    return len(docs)
+
+
 def ensure_indexes(db) -> None:
     # reports (one per WCL report)
     db["reports"].create_index([("code", ASCENDING)], unique=True)
@@ -83,36 +298,21 @@ def ensure_indexes(db) -> None:
     db["fights_all"].create_index([("is_mythic", ASCENDING), ("night_id", ASCENDING)])
 
     # participation rows per Mythic fight
-    db["participation_m"].create_index(
-        [
-            ("night_id", ASCENDING),
-            ("report_code", ASCENDING),
-            ("fight_id", ASCENDING),
-            ("main", ASCENDING),
-        ],
-        unique=True,
-    )
-    db["participation_m"].create_index([("night_id", ASCENDING)])
+    _create_derived_indexes(db["participation_m"], "participation_m")
+
+    # per-player presence intervals derived from WCL events (optional)
+    db["presence_intervals"].create_index([("night_id", ASCENDING)])
+    db["presence_intervals"].create_index([("report_code", ASCENDING), ("fight_id", ASCENDING)])
 
     # contiguous blocks of participation
-    db["blocks"].create_index(
-        [
-            ("night_id", ASCENDING),
-            ("main", ASCENDING),
-            ("half", ASCENDING),
-            ("block_seq", ASCENDING),
-        ],
-        unique=True,
-    )
-    db["blocks"].create_index([("night_id", ASCENDING)])
+    _create_derived_indexes(db["blocks"], "blocks")
 
     # optional actor cache per report (kept small; useful for audits)
     db["actors"].create_index([("report_code", ASCENDING), ("actor_id", ASCENDING)], unique=True)
 
     # results
     db["night_qa"].create_index([("night_id", ASCENDING)], unique=True)
-    db["bench_night_totals"].create_index([("night_id", ASCENDING), ("main", ASCENDING)], unique=True)
-    db["bench_week_totals"].create_index([("game_week", ASCENDING), ("main", ASCENDING)], unique=True)
-    db["bench_rankings"].create_index([("main", ASCENDING)], unique=True)
+    for name in ("bench_night_totals", "bench_week_totals", "bench_rankings"):
+        _create_derived_indexes(db[name], name)
     db["team_roster"].create_index([("main", ASCENDING)], unique=True)
     db["service_log"].create_index([("ts", ASCENDING)])
@@ -0,0 +1,504 @@
+"""Per-night compute: Night QA, Mythic participation, blocks and bench minutes.
+
+:func:`compute_night` works only on its arguments — the night's fights,
+reports, presence intervals and availability overrides loaded by the caller
+— so nights can be computed in worker processes. :func:`compute_nights`
+runs them serially or over a :class:`~concurrent.futures.ProcessPoolExecutor`
+and returns results in input order. Persisting the results and merging the
+resolver's unmatched names across nights is left to the caller so the
+output does not depend on the number of workers. :func:`prepare_night` and
+:func:`finish_night` are the halves of :func:`compute_night` around the
+blocks and bench stages, which :mod:`pebble.season_engine` batches across
+nights.
+"""
+
+from __future__ import annotations
+
+import json
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence
+
+from .bench_calc import bench_minutes_for_night, last_non_mythic_boss_mains
+from .bench_calc_numpy import BenchNight, bench_minutes_for_night_numpy
+from .blocks import build_blocks, build_blocks_from_spans
+from .boss_index import BossIntervalIndex
+from .breaks import detect_break
+from .envelope import mythic_envelope, split_pre_post
+from .participation import build_mythic_participation, mythic_fight_spans
+from .utils.names import NameResolver
+from .utils.time import ms_to_pt_iso, ms_to_pt_sheets, pt_time_to_ms
+
+BENCH_NIGHT_FIELDS = (
+    "main",
+    "played_pre_min",
+    "played_post_min",
+    "played_total_min",
+    "bench_pre_min",
+    "bench_post_min",
+    "bench_total_min",
+    "avail_pre",
+    "avail_post",
+    "status_source",
+)
+
+# Position of the "Not on Roster" cell in a Night QA row.
+NOT_ON_ROSTER_COL = 3
+
+
+@dataclass(frozen=True)
+class NightTimeSettings:
+    """The ``time`` settings read by the night stage, in picklable form."""
+
+    break_start_pt: str
+    break_end_pt: str
+    min_gap_minutes: float
+    max_gap_minutes: float
+    mythic_post_extension_min: float = 0.0
+    mythic_default_start_pt: str = ""
+
+    @classmethod
+    def from_settings(cls, s) -> "NightTimeSettings":
+        bw = s.time.break_window
+        return cls(
+            break_start_pt=bw.start_pt,
+            break_end_pt=bw.end_pt,
+            min_gap_minutes=bw.min_gap_minutes,
+            max_gap_minutes=bw.max_gap_minutes,
+            mythic_post_extension_min=getattr(s.time, "mythic_post_extension_min", 0.0) or 0.0,
+            mythic_default_start_pt=getattr(s.time, "mythic_default_start_pt", "") or "",
+        )
+
+
+@dataclass
+class NightInputs:
+    night: str
+    fights_all: List[dict]
+    reports: List[dict]
+    presence: Optional[List[dict]] = None
+    overrides: Dict[str, dict] = field(default_factory=dict)
+    fingerprint: Optional[str] = None
+
+
+@dataclass
+class NightResult:
+    """Rows and documents produced for one night.
+
+    ``qa_row`` leaves the Not on Roster cell empty: which unmatched names are
+    new depends on the nights before it, so the caller fills it in from
+    ``unmatched_names`` (names seen while building Night QA) and folds
+    ``resolver_unmatched`` (every name seen for the night) into its running
+    set.
+    """
+
+    night: str
+    qa_row: list
+    qa_doc: dict
+    part_rows: List[dict]
+    block_docs: List[dict]
+    bench_docs: List[dict]
+    unmatched_names: List[str]
+    resolver_unmatched: List[str]
+
+
+@dataclass
+class NightPlan:
+    """A night's QA plus what its blocks and bench rows are built from.
+
+    ``player_spans`` holds ``(main, night_id, spans)`` per player per Mythic
+    fight in fight order (see :func:`pebble.blocks.build_blocks_from_spans`);
+    ``bench`` carries the bench arguments with ``blocks`` left empty.
+    """
+
+    night: str
+    qa_row: list
+    qa_doc: dict
+    unmatched_names: List[str]
+    resolver_unmatched: List[str]
+    fights_m: List[dict]
+    presence: Optional[List[dict]]
+    player_spans: List[tuple]
+    break_range: Optional[tuple]
+    boss_index: BossIntervalIndex
+    bench: BenchNight
+
+
+def _resolve_into(resolver: NameResolver, participants, bucket: set) -> None:
+    for p in participants or []:
+        name = p.get("name")
+        if not name:
+            continue
+        main = resolver.resolve(name)
+        if not main:
+            continue
+        bucket.add(main)
+
+
+def prepare_night(
+    inputs: NightInputs, resolver: NameResolver, time_settings: NightTimeSettings
+) -> Optional[NightPlan]:
+    """Build a night's QA and bench inputs; ``None`` without a Mythic envelope.
+
+    ``resolver.not_on_roster`` is reset so the names it collects belong to
+    this night only.
+    """
+
+    night = inputs.night
+    fights_all = inputs.fights_all
+    reports = inputs.reports
+    if not fights_all or not reports:
+        return None
+    resolver.not_on_roster = set()
+    fights_m = [f for f in fights_all if f.get("is_mythic")]
+
+    report_codes = sorted(r.get("code") for r in reports)
+    report_start_ms = min(r.get("start_ms") for r in reports)
+    report_end_ms = max(r.get("end_ms") for r in reports)
+    night_start_ms = min(f["fight_abs_start_ms"] for f in fights_all)
+    night_end_ms = max(f["fight_abs_end_ms"] for f in fights_all)
+    # One sorted index of the night's boss pulls serves the default Mythic
+    # start, break detection, block splitting and the last non-Mythic boss.
+    boss_index = BossIntervalIndex(fights_all)
+
+    mythic_override_start_ms, mythic_override_end_ms = next(
+        (
+            (r.get("mythic_override_start_ms"), r.get("mythic_override_end_ms"))
+            for r in reports
+            if r.get("mythic_override_start_ms") is not None
+            or r.get("mythic_override_end_ms") is not None
+        ),
+        (None, None),
+    )
+
+    if mythic_override_start_ms is None:
+        first_boss_fight = boss_index.bosses[0] if boss_index.bosses else None
+        mythic_default_start_pt = time_settings.mythic_default_start_pt
+        if first_boss_fight and first_boss_fight.get("is_mythic") and mythic_default_start_pt:
+            default_mythic_override_start_ms = pt_time_to_ms(mythic_default_start_pt, report_start_ms)
+            if default_mythic_override_start_ms is not None:
+                mythic_override_start_ms = default_mythic_override_start_ms
+
+    env = mythic_envelope(fights_m)
+    if not env:
+        return None
+    auto_env_start, auto_env_end = env
+    env_start, env_end = auto_env_start, auto_env_end
+    mythic_override_used = False
+    start_extension_ms = 0
+    end_extension_ms = 0
+    if mythic_override_start_ms is not None:
+        env_start = mythic_override_start_ms
+        mythic_override_used = True
+        start_extension_ms = max(0, auto_env_start - mythic_override_start_ms)
+    if mythic_override_end_ms is not None:
+        env_end = mythic_override_end_ms
+        mythic_override_used = True
+        end_extension_ms = max(0, mythic_override_end_ms - auto_env_end)
+    env = (env_start, env_end)
+
+    mains_by_report: Dict[str, set[str]] = {code: set() for code in report_codes}
+    for f in fights_all:
+        if int(f.get("encounter_id", 0)) <= 0:
+            continue
+        _resolve_into(resolver, f.get("participants"), mains_by_report.setdefault(f.get("report_code"), set()))
+    report_mains = [len(mains_by_report[c]) for c in report_codes]
+    override_start_ms, override_end_ms = next(
+        (
+            (r.get("break_override_start_ms"), r.get("break_override_end_ms"))
+            for r in reports
+            if r.get("break_override_start_ms") and r.get("break_override_end_ms")
+        ),
+        (None, None),
+    )
+
+    ts = time_settings
+    window_start_ms = pt_time_to_ms(ts.break_start_pt, night_start_ms)
+    window_end_ms = pt_time_to_ms(ts.break_end_pt, night_start_ms)
+    br_auto, gap_meta = detect_break(
+        fights_all,
+        window_start_min=int((window_start_ms - night_start_ms) / 60000),
+        window_end_min=int((window_end_ms - night_start_ms) / 60000),
+        min_break_min=ts.min_gap_minutes,
+        max_break_min=ts.max_gap_minutes,
+        night_start_ms=night_start_ms,
+        boss_index=boss_index,
+    )
+    br_range = br_auto
+    override_used = mythic_override_used
+    if override_start_ms and override_end_ms:
+        br_range = (override_start_ms, override_end_ms)
+        override_used = True
+
+    post_extension_ms = int(round(max(0.0, ts.mythic_post_extension_min) * 60000))
+    effective_extension_ms = post_extension_ms if br_range else 0
+    post_extension_credit_ms = effective_extension_ms + end_extension_ms
+
+    split = split_pre_post(env, br_range, post_extension_ms=effective_extension_ms)
+    break_duration = round((br_range[1] - br_range[0]) / 60000.0, 2) if br_range else ""
+    post_extension_min = round(post_extension_credit_ms / 60000.0, 2)
+    candidates = gap_meta.get("candidates", [])
+    candidate_gaps_db = [
+        {"start": ms_to_pt_iso(c["start_ms"]), "end": ms_to_pt_iso(c["end_ms"]), "gap_min": round(c["gap_min"], 2)}
+        for c in candidates
+    ]
+    candidate_gaps_sheet = [
+        {
+            "start": ms_to_pt_sheets(c["start_ms"]),
+            "end": ms_to_pt_sheets(c["end_ms"]),
+            "gap_min": round(c["gap_min"], 2),
+        }
+        for c in candidates
+    ]
+    largest_gap = round(gap_meta.get("largest_gap_min", 0.0), 2)
+
+    first_mythic_mains: set[str] = set()
+    last_mythic_mains: set[str] = set()
+    if fights_m:
+        first_mythic_fight = min(
+            fights_m,
+            key=lambda f: (
+                f.get("fight_abs_start_ms")
+                if f.get("fight_abs_start_ms") is not None
+                else f.get("fight_abs_end_ms", 0)
+            ),
+        )
+        last_mythic_fight = max(
+            fights_m,
+            key=lambda f: (
+                f.get("fight_abs_end_ms")
+                if f.get("fight_abs_end_ms") is not None
+                else f.get("fight_abs_start_ms", 0)
+            ),
+        )
+        _resolve_into(resolver, first_mythic_fight.get("participants"), first_mythic_mains)
+        _resolve_into(resolver, last_mythic_fight.get("participants"), last_mythic_mains)
+
+    mythic_mains: set[str] = set()
+    for f in fights_m:
+        _resolve_into(resolver, f.get("participants"), mythic_mains)
+    unmatched_names = sorted(resolver.not_on_roster)
+
+    qa_row = [
+        night,
+        ",".join(report_codes),
+        ",".join(str(c) for c in report_mains),
+        "",  # Not on Roster, filled in by the caller
+        ms_to_pt_sheets(report_start_ms),
+        ms_to_pt_sheets(report_end_ms),
+        ms_to_pt_sheets(night_start_ms),
+        ms_to_pt_sheets(night_end_ms),
+        len(fights_m),
+        ms_to_pt_sheets(br_range[0]) if br_range else "",
+        ms_to_pt_sheets(br_range[1]) if br_range else "",
+        ms_to_pt_sheets(override_start_ms) if override_start_ms else "",
+        ms_to_pt_sheets(override_end_ms) if override_end_ms else "",
+        f"{break_duration:.2f}" if break_duration != "" else "",
+        ms_to_pt_sheets(mythic_override_start_ms) if mythic_override_start_ms is not None else "",
+        ms_to_pt_sheets(mythic_override_end_ms) if mythic_override_end_ms is not None else "",
+        ms_to_pt_sheets(env[0]),
+        ms_to_pt_sheets(env[1]),
+        f"{split['pre_ms'] / 60000.0:.2f}",
+        f"{split['post_ms'] / 60000.0:.2f}",
+        f"{post_extension_min:.2f}",
+        f"{ts.break_start_pt}-{ts.break_end_pt}",
+        f"{ts.min_gap_minutes}-{ts.max_gap_minutes}",
+        f"{largest_gap:.2f}",
+        json.dumps(candidate_gaps_sheet),
+        "Y" if override_used else "N",
+    ]
+    qa_doc = {
+        "night_id": night,
+        "reports": report_codes,
+        "report_mains": report_mains,
+        "report_start_ms": report_start_ms,
+        "report_end_ms": report_end_ms,
+        "night_start_ms": night_start_ms,
+        "night_end_ms": night_end_ms,
+        "mythic_fights": len(fights_m),
+        "mythic_start_ms": env[0],
+        "mythic_end_ms": env[1],
+        "break_start_ms": br_range[0] if br_range else None,
+        "break_end_ms": br_range[1] if br_range else None,
+        "break_override_start_ms": override_start_ms,
+        "break_override_end_ms": override_end_ms,
+        "break_duration_min": break_duration if break_duration != "" else None,
+        "mythic_pre_min": round(split["pre_ms"] / 60000.0, 2),
+        "mythic_post_min": round(split["post_ms"] / 60000.0, 2),
+        "mythic_post_extension_min": post_extension_min,
+        "mythic_override_start_ms": mythic_override_start_ms,
+        "mythic_override_end_ms": mythic_override_end_ms,
+        "gap_window": (ts.break_start_pt, ts.break_end_pt),
+        "min_max_break": (ts.min_gap_minutes, ts.max_gap_minutes),
+        "largest_gap_min": largest_gap,
+        "gap_candidates": candidate_gaps_db,
+        "override_used": override_used,
+        "unmatched_names": unmatched_names,
+        "fingerprint": inputs.fingerprint,
+    }
+
+    # Resolve every player span and the last non-Mythic boss mains now, so
+    # the names the resolver collects for this night are complete.
+    player_spans = [
+        (main, f.get("night_id"), spans)
+        for f, main, spans, _ in mythic_fight_spans(fights_m, resolver, inputs.presence)
+    ]
+    last_nm_mains = last_non_mythic_boss_mains(
+        fights_all, env[0], resolver=resolver, boss_index=boss_index
+    )
+
+    return NightPlan(
+        night=night,
+        qa_row=qa_row,
+        qa_doc=qa_doc,
+        unmatched_names=unmatched_names,
+        resolver_unmatched=sorted(resolver.not_on_roster),
+        fights_m=fights_m,
+        presence=inputs.presence,
+        player_spans=player_spans,
+        break_range=br_range,
+        boss_index=boss_index,
+        bench=BenchNight(
+            blocks=[],
+            pre_ms=split["pre_ms"],
+            post_ms=split["post_ms"],
+            overrides=inputs.overrides,
+            last_fight_mains=last_nm_mains,
+            pre_extension_ms=start_extension_ms,
+            pre_extension_mains=first_mythic_mains,
+            post_extension_ms=post_extension_credit_ms,
+            post_extension_mains=last_mythic_mains,
+        ),
+    )
+
+
+def finish_night(
+    plan: NightPlan, blocks: List[dict], bench: List[dict], part_rows: Optional[List[dict]] = None
+) -> NightResult:
+    """Number ``blocks`` and shape ``bench`` rows into the night's result."""
+
+    seq: Dict[tuple, int] = defaultdict(int)
+    block_docs = []
+    for b in blocks:
+        seq_key = (b["night_id"], b["main"], b["half"])
+        seq[seq_key] += 1
+        block_docs.append({**b, "block_seq": seq[seq_key]})
+    night = plan.night
+    bench_docs = [{"night_id": night, **{k: row[k] for k in BENCH_NIGHT_FIELDS}} for row in bench]
+    return NightResult(
+        night=night,
+        qa_row=plan.qa_row,
+        qa_doc=plan.qa_doc,
+        part_rows=part_rows or [],
+        block_docs=block_docs,
+        bench_docs=bench_docs,
+        unmatched_names=plan.unmatched_names,
+        resolver_unmatched=plan.resolver_unmatched,
+    )
+
+
+def compute_night(
+    inputs: NightInputs,
+    resolver: NameResolver,
+    time_settings: NightTimeSettings,
+    *,
+    audit_participation: bool = False,
+    bench_engine: str = "python",
+) -> Optional[NightResult]:
+    """Compute one night; returns ``None`` when it has no Mythic envelope.
+
+    Blocks come straight from the Mythic fights; the per-pull participation
+    rows are only built, as ``part_rows``, with ``audit_participation``.
+    ``bench_engine`` picks the scalar (``"python"``) or vectorized
+    (``"numpy"``) bench calculation; both return the same rows.
+    """
+
+    plan = prepare_night(inputs, resolver, time_settings)
+    if plan is None:
+        return None
+
+    if audit_participation:
+        part_rows = build_mythic_participation(plan.fights_m, resolver=resolver, presence=plan.presence)
+        blocks = build_blocks(part_rows, break_range=plan.break_range, boss_index=plan.boss_index)
+    else:
+        part_rows = []
+        blocks = build_blocks_from_spans(
+            plan.player_spans, break_range=plan.break_range, boss_index=plan.boss_index
+        )
+
+    b = plan.bench
+    bench_fn = bench_minutes_for_night_numpy if bench_engine == "numpy" else bench_minutes_for_night
+    bench = bench_fn(
+        blocks,
+        b.pre_ms,
+        b.post_ms,
+        overrides=b.overrides,
+        last_fight_mains=b.last_fight_mains,
+        roster_map=None,
+        pre_extension_ms=b.pre_extension_ms,
+        pre_extension_mains=b.pre_extension_mains,
+        post_extension_ms=b.post_extension_ms,
+        post_extension_mains=b.post_extension_mains,
+    )
+    return finish_night(plan, blocks, bench, part_rows)
+
+
+# Worker processes receive the resolver and time settings once, through the
+# pool initializer, instead of with every night.
+_worker_state: Dict[str, object] = {}
+
+
+def _init_worker(
+    resolver: NameResolver,
+    time_settings: NightTimeSettings,
+    audit_participation: bool,
+    bench_engine: str,
+) -> None:
+    _worker_state["resolver"] = resolver
+    _worker_state["time_settings"] = time_settings
+    _worker_state["audit_participation"] = audit_participation
+    _worker_state["bench_engine"] = bench_engine
+
+
+def _compute_in_worker(inputs: NightInputs) -> Optional[NightResult]:
+    return compute_night(
+        inputs,
+        _worker_state["resolver"],
+        _worker_state["time_settings"],
+        audit_participation=_worker_state["audit_participation"],
+        bench_engine=_worker_state["bench_engine"],
+    )
+
+
+def compute_nights(
+    inputs: Sequence[NightInputs],
+    resolver: NameResolver,
+    time_settings: NightTimeSettings,
+    *,
+    workers: int = 1,
+    audit_participation: bool = False,
+    bench_engine: str = "python",
+) -> List[Optional[NightResult]]:
+    """Compute ``inputs`` and return the results in the same order.
+
+    With ``workers`` > 1 and more than one night, nights are spread over a
+    process pool; otherwise they run in this process.
+    """
+
+    if workers <= 1 or len(inputs) < 2:
+        return [
+            compute_night(
+                item,
+                resolver,
+                time_settings,
+                audit_participation=audit_participation,
+                bench_engine=bench_engine,
+            )
+            for item in inputs
+        ]
+    with ProcessPoolExecutor(
+        max_workers=min(workers, len(inputs)),
+        initializer=_init_worker,
+        initargs=(resolver, time_settings, audit_participation, bench_engine),
+    ) as pool:
+        return list(pool.map(_compute_in_worker, inputs))
@@ -1,28 +1,51 @@
 from __future__ import annotations
-from typing import List, Optional
+from collections import defaultdict
+from typing import Dict, Iterator, List, Optional, Tuple
 
 from .utils.time import ms_to_pt_iso
 from .utils.names import NameResolver
 
 
-# TODO: V1 keeps participation simple (boss pulls only). Trash bridging handled in blocks.
-# A later iteration can integrate WCL tables/events to derive exact attendance.
+# Participation covers boss pulls only; trash bridging is handled in blocks.
+# Fights flagged ``has_presence`` use event-derived intervals (see presence.py);
+# the rest fall back to the fight's ``participants`` list.
 
+_FIGHT_KEY_FIELDS = ("encounter_id", "difficulty", "start_rounded_ms", "end_rounded_ms")
 
-def build_mythic_participation(
+
+def _fight_key(doc: dict) -> tuple:
+    return tuple(doc.get(k) for k in _FIGHT_KEY_FIELDS)
+
+
+def mythic_fight_spans(
     fights_mythic: List[dict],
     resolver: Optional[NameResolver] = None,
-) -> List[dict]:
-    """Return rows of per‑player participation for Mythic fights.
+    presence: Optional[List[dict]] = None,
+) -> Iterator[Tuple[dict, str, List[Tuple[int, int]], bool]]:
+    """Yield ``(fight, main, spans, from_presence)`` per player per Mythic fight.
 
-    Each fight is expected to include absolute start/end times and a
-    ``participants`` list containing player dictionaries with at least a
-    ``name`` field formatted as ``Name-Realm``.  The returned rows use
-    natural keys so callers can upsert them idempotently.
+    ``spans`` is the fight's start/end for participant-list fights, or the
+    player's sorted presence intervals for fights flagged ``has_presence``.
+    Shared by :func:`build_mythic_participation` and
+    :func:`pebble.blocks.build_blocks_from_fights` so both see the same players.
     """
 
-    rows: List[dict] = []
+    by_fight: Dict[tuple, Dict[str, List[tuple]]] = defaultdict(lambda: defaultdict(list))
+    for iv in presence or []:
+        name = iv.get("name")
+        if not name:
+            continue
+        main = resolver.resolve(name) if resolver else name
+        if resolver and not main:
+            continue
+        by_fight[_fight_key(iv)][main].append((iv["start_ms"], iv["end_ms"]))
+
     for f in fights_mythic:
+        if f.get("has_presence") and presence is not None:
+            for main, ivs in by_fight.get(_fight_key(f), {}).items():
+                yield f, main, sorted(ivs), True
+            continue
+        span = [(f.get("fight_abs_start_ms"), f.get("fight_abs_end_ms"))]
         for p in f.get("participants", []):
             name = p.get("name")
             if not name:
@@ -30,16 +53,41 @@ def build_mythic_participation(
             main = resolver.resolve(name) if resolver else name
             if resolver and not main:
                 continue
-            rows.append(
-                {
-                    "main": main,
-                    "report_code": f.get("report_code"),
-                    "fight_id": f.get("id"),
-                    "start_ms": f.get("fight_abs_start_ms"),
-                    "end_ms": f.get("fight_abs_end_ms"),
-                    "start_pt": ms_to_pt_iso(f.get("fight_abs_start_ms")),
-                    "end_pt": ms_to_pt_iso(f.get("fight_abs_end_ms")),
-                    "night_id": f.get("night_id"),
-                }
-            )
+            yield f, main, span, False
+
+
+def build_mythic_participation(
+    fights_mythic: List[dict],
+    resolver: Optional[NameResolver] = None,
+    presence: Optional[List[dict]] = None,
+) -> List[dict]:
+    """Return rows of per‑player participation for Mythic fights.
+
+    Each fight is expected to include absolute start/end times and a
+    ``participants`` list containing player dictionaries with at least a
+    ``name`` field formatted as ``Name-Realm``.  The returned rows use
+    natural keys so callers can upsert them idempotently.
+
+    ``presence`` holds ``presence_intervals`` documents. For fights flagged
+    ``has_presence`` the row spans the player's first to last interval and
+    carries the individual ``intervals`` for :func:`build_blocks`.
+    """
+
+    rows: List[dict] = []
+    for f, main, spans, from_presence in mythic_fight_spans(fights_mythic, resolver, presence):
+        start_ms = spans[0][0]
+        end_ms = max(e for _, e in spans) if from_presence else spans[0][1]
+        row = {
+            "main": main,
+            "report_code": f.get("report_code"),
+            "fight_id": f.get("id"),
+            "start_ms": start_ms,
+            "end_ms": end_ms,
+            "start_pt": ms_to_pt_iso(start_ms),
+            "end_pt": ms_to_pt_iso(end_ms),
+            "night_id": f.get("night_id"),
+        }
+        if from_presence:
+            row["intervals"] = [[s, e] for s, e in spans]
+        rows.append(row)
     return rows
@@ -0,0 +1,56 @@
+"""Documents handed from the night stage to the week and attendance stages.
+
+``run_pipeline`` already holds every night's Night QA and bench documents
+after the night loop: recomputed nights from this iteration, reused nights
+from the per-night reads it does anyway. :class:`PipelineContext` carries
+them, with the team roster, to :mod:`pebble.week_agg`,
+:mod:`pebble.attendance` and :mod:`pebble.season_engine`, so those stages
+only touch Mongo to persist their output instead of scanning
+``bench_night_totals``, ``night_qa``, ``bench_week_totals`` and
+``team_roster`` again.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+
+@dataclass
+class PipelineContext:
+    team_roster: List[dict] = field(default_factory=list)
+    night_qa: Dict[str, dict] = field(default_factory=dict)
+    bench_night_totals: Dict[str, List[dict]] = field(default_factory=dict)
+    # Set by materialize_week_totals for materialize_rankings.
+    bench_week_totals: Optional[List[dict]] = None
+
+    def add_night(self, night: str, qa_doc: dict, bench_docs: List[dict]) -> None:
+        self.night_qa[night] = qa_doc
+        self.bench_night_totals[night] = list(bench_docs)
+
+    def load_missing_nights(self, db) -> None:
+        """Read the stored documents of nights the night stage did not hold.
+
+        Nights without fights or without a Mythic envelope keep whatever an
+        earlier iteration stored, and the week stage has always counted
+        those documents; one filtered query per collection picks them up.
+        """
+
+        held = sorted(self.night_qa)
+        for doc in db["night_qa"].find({"night_id": {"$nin": held}}, {"_id": 0}):
+            if doc.get("night_id"):
+                self.night_qa.setdefault(doc["night_id"], doc)
+        held_bench = sorted(self.bench_night_totals)
+        missing: Dict[str, List[dict]] = {}
+        for doc in db["bench_night_totals"].find({"night_id": {"$nin": held_bench}}, {"_id": 0}):
+            missing.setdefault(doc["night_id"], []).append(doc)
+        self.bench_night_totals.update(missing)
+
+    def night_qa_docs(self) -> List[dict]:
+        return [self.night_qa[night] for night in sorted(self.night_qa)]
+
+    def bench_night_docs(self) -> List[dict]:
+        return [doc for night in sorted(self.bench_night_totals) for doc in self.bench_night_totals[night]]
+
+    def latest_bench_night(self) -> Optional[str]:
+        return max((night for night, docs in self.bench_night_totals.items() if docs), default=None)
@@ -0,0 +1,118 @@
+"""Bookkeeping that lets ``run_pipeline`` recompute only the nights that changed.
+
+Ingest records the nights whose reports or fights it wrote in the
+``pipeline_state`` collection; the compute stage adds nights whose
+availability overrides changed and falls back to every night when the
+roster, the alt map or the time settings changed. Nights are cleared only
+after they were recomputed, so a failed iteration leaves them pending.
+Nights that produce no rows (no fights or no Mythic envelope) keep their
+input fingerprint here instead of a ``night_qa`` document, so they are not
+planned again until their inputs change.
+
+Week totals are tracked the same way: nights whose bench totals were
+rewritten stay pending for the week stage until their weeks are merged,
+and the roster fields that pad week totals are hashed so a roster edit
+rebuilds every week.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+from typing import Any, Dict, Iterable, Set
+
+DIRTY_NIGHTS_ID = "dirty_nights"
+NIGHT_INPUTS_ID = "night_inputs"
+EMPTY_NIGHTS_ID = "empty_nights"
+WEEK_TOTALS_ID = "week_totals"
+
+
+def inputs_hash(value: Any) -> str:
+    """Return a stable digest of a JSON-serialisable ``value``."""
+
+    raw = json.dumps(value, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def mark_dirty_nights(db, nights: Iterable[str]) -> None:
+    nights = sorted(set(nights))
+    if not nights:
+        return
+    db["pipeline_state"].update_one(
+        {"_id": DIRTY_NIGHTS_ID},
+        {"$addToSet": {"nights": {"$each": nights}}},
+        upsert=True,
+    )
+
+
+def pending_dirty_nights(db) -> Set[str]:
+    doc = db["pipeline_state"].find_one({"_id": DIRTY_NIGHTS_ID}) or {}
+    return set(doc.get("nights") or [])
+
+
+def clear_dirty_nights(db, nights: Iterable[str]) -> None:
+    nights = sorted(set(nights))
+    if not nights:
+        return
+    db["pipeline_state"].update_one(
+        {"_id": DIRTY_NIGHTS_ID}, {"$pull": {"nights": {"$in": nights}}}
+    )
+
+
+def load_night_inputs(db) -> Dict[str, Any]:
+    """Return the hashes of the compute inputs seen by the previous run."""
+
+    return db["pipeline_state"].find_one({"_id": NIGHT_INPUTS_ID}, {"_id": 0}) or {}
+
+
+def save_night_inputs(db, *, global_hash: str, overrides: Dict[str, str]) -> None:
+    db["pipeline_state"].update_one(
+        {"_id": NIGHT_INPUTS_ID},
+        {"$set": {"global_hash": global_hash, "overrides": overrides}},
+        upsert=True,
+    )
+
+
+def load_empty_nights(db) -> Dict[str, str]:
+    """Return the input fingerprint of every night that produced no rows."""
+
+    doc = db["pipeline_state"].find_one({"_id": EMPTY_NIGHTS_ID}) or {}
+    return dict(doc.get("nights") or {})
+
+
+def save_empty_nights(db, fingerprints: Dict[str, str], *, cleared: Iterable[str] = ()) -> None:
+    """Record ``fingerprints`` of empty nights and forget nights in ``cleared``."""
+
+    update: Dict[str, Any] = {}
+    if fingerprints:
+        update["$set"] = {f"nights.{night}": fp for night, fp in fingerprints.items()}
+    cleared = sorted(set(cleared) - set(fingerprints))
+    if cleared:
+        update["$unset"] = {f"nights.{night}": "" for night in cleared}
+    if update:
+        db["pipeline_state"].update_one({"_id": EMPTY_NIGHTS_ID}, update, upsert=True)
+
+
+def mark_week_nights(db, nights: Iterable[str]) -> None:
+    nights = sorted(set(nights))
+    if not nights:
+        return
+    db["pipeline_state"].update_one(
+        {"_id": WEEK_TOTALS_ID},
+        {"$addToSet": {"nights": {"$each": nights}}},
+        upsert=True,
+    )
+
+
+def load_week_totals_state(db) -> Dict[str, Any]:
+    """Return the roster hash and pending nights of the week stage."""
+
+    return db["pipeline_state"].find_one({"_id": WEEK_TOTALS_ID}, {"_id": 0}) or {}
+
+
+def save_week_totals_state(db, *, roster_hash: str, refreshed: Iterable[str]) -> None:
+    db["pipeline_state"].update_one(
+        {"_id": WEEK_TOTALS_ID},
+        {"$set": {"roster_hash": roster_hash}, "$pull": {"nights": {"$in": sorted(set(refreshed))}}},
+        upsert=True,
+    )
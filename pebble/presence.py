@@ -0,0 +1,176 @@
+from __future__ import annotations
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Tuple
+
+from .utils.time import ms_to_pt_iso
+
+if TYPE_CHECKING:  # pragma: no cover
+    from .wcl_client import WCLClient
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_GAP_MS = 60_000
+
+
+class PresenceTracker:
+    """Fold a stream of WCL events into per-player presence intervals.
+
+    A player counts as present while they appear as source or target of
+    events no more than ``gap_ms`` apart; a longer silence closes the current
+    interval. Only the open interval per player is kept between pages, so
+    memory depends on the number of players, not the number of events.
+    When ``clip`` is given (fight start/end), an interval whose first or last
+    event lies within ``gap_ms`` of a boundary is extended to it.
+    """
+
+    def __init__(
+        self,
+        actor_ids: Iterable[int],
+        *,
+        gap_ms: int = DEFAULT_GAP_MS,
+        clip: Optional[Tuple[int, int]] = None,
+    ):
+        self.actor_ids = {int(a) for a in actor_ids}
+        self.gap_ms = int(gap_ms)
+        self.clip = clip
+        self._open: Dict[int, List[int]] = {}
+        self._closed: Dict[int, List[Tuple[int, int]]] = {}
+        self.events_seen = 0
+
+    def _touch(self, actor_id: int, ts: int) -> None:
+        current = self._open.get(actor_id)
+        if current is None:
+            self._open[actor_id] = [ts, ts]
+        elif ts - current[1] > self.gap_ms:
+            self._closed.setdefault(actor_id, []).append((current[0], current[1]))
+            self._open[actor_id] = [ts, ts]
+        elif ts > current[1]:
+            current[1] = ts
+
+    def feed(self, events: Iterable[dict]) -> None:
+        for ev in events:
+            ts = ev.get("timestamp")
+            if ts is None:
+                continue
+            self.events_seen += 1
+            ts = int(ts)
+            for key in ("sourceID", "targetID"):
+                aid = ev.get(key)
+                if aid is not None and int(aid) in self.actor_ids:
+                    self._touch(int(aid), ts)
+
+    def intervals(self) -> Dict[int, List[Tuple[int, int]]]:
+        out: Dict[int, List[Tuple[int, int]]] = {}
+        for aid in sorted(set(self._closed) | set(self._open)):
+            ivs = list(self._closed.get(aid, []))
+            if aid in self._open:
+                ivs.append((self._open[aid][0], self._open[aid][1]))
+            if self.clip:
+                lo, hi = self.clip
+                first_s, first_e = ivs[0]
+                if first_s - lo <= self.gap_ms:
+                    ivs[0] = (lo, first_e)
+                last_s, last_e = ivs[-1]
+                if hi - last_e <= self.gap_ms:
+                    ivs[-1] = (last_s, hi)
+                ivs = [(max(lo, s), min(hi, e)) for s, e in ivs if min(hi, e) >= max(lo, s)]
+            if ivs:
+                out[aid] = ivs
+        return out
+
+
+def ingest_report_presence(
+    wcl: "WCLClient",
+    db,
+    *,
+    code: str,
+    report_start_ms: int,
+    night_id: str,
+    fights: List[dict],
+    actor_map: Dict[int, dict],
+    gap_ms: int = DEFAULT_GAP_MS,
+    max_workers: int = 1,
+) -> Dict[int, int]:
+    """Walk the events of each Mythic fight and store presence intervals.
+
+    ``fights`` describe the Mythic fights to scan: ``id``, the canonical
+    ``key`` used by ``fights_all`` and the report-relative ``rel_start_ms`` /
+    ``rel_end_ms``. Existing intervals of a fight are replaced. Returns the
+    number of intervals written per fight id; callers flag those fights
+    (``has_presence``) in ``fights_all`` so participation is built from
+    intervals instead of ``friendlyPlayers``. Fights whose events cannot be
+    read are left out and keep the participant-list fallback.
+
+    The event walks run on up to ``max_workers`` threads, like report
+    fetches; intervals are written from the calling thread in fight order.
+    """
+
+    players = {
+        aid: a for aid, a in actor_map.items() if str(a.get("type", "")).lower() == "player"
+    }
+
+    def walk(f: dict) -> Optional[PresenceTracker]:
+        fight_id = int(f["id"])
+        rel_s, rel_e = f["rel_start_ms"], f["rel_end_ms"]
+        tracker = PresenceTracker(players, gap_ms=gap_ms, clip=(rel_s, rel_e))
+        try:
+            for page in wcl.iter_report_events(code, rel_s, rel_e, fight_ids=[fight_id]):
+                tracker.feed(page)
+        except Exception:
+            logger.warning(
+                "Failed to read WCL events; using fight participants",
+                extra={"code": code, "fight_id": fight_id},
+                exc_info=True,
+            )
+            return None
+        return tracker
+
+    workers = max(1, min(int(max_workers or 1), len(fights)))
+    if workers == 1:
+        trackers = [walk(f) for f in fights]
+    else:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="wcl-events") as pool:
+            trackers = list(pool.map(walk, fights))
+
+    written: Dict[int, int] = {}
+    for f, tracker in zip(fights, trackers):
+        if tracker is None:
+            continue
+        fight_id = int(f["id"])
+
+        docs = []
+        for aid, ivs in tracker.intervals().items():
+            actor = players[aid]
+            for s, e in ivs:
+                start_ms, end_ms = report_start_ms + s, report_start_ms + e
+                docs.append(
+                    {
+                        **f["key"],
+                        "report_code": code,
+                        "fight_id": fight_id,
+                        "night_id": night_id,
+                        "actor_id": aid,
+                        "name": actor.get("name"),
+                        "start_ms": start_ms,
+                        "end_ms": end_ms,
+                        "start_pt": ms_to_pt_iso(start_ms),
+                        "end_pt": ms_to_pt_iso(end_ms),
+                    }
+                )
+        db["presence_intervals"].delete_many({"report_code": code, "fight_id": fight_id})
+        if docs:
+            db["presence_intervals"].insert_many(docs)
+        written[fight_id] = len(docs)
+        logger.info(
+            "Stored presence intervals",
+            extra={
+                "code": code,
+                "fight_id": fight_id,
+                "events": tracker.events_seen,
+                "intervals": len(docs),
+            },
+        )
+    return written
+
@@ -0,0 +1,456 @@
+"""Columnar compute engine built on pandas.
+
+Selected with ``compute.engine: columnar``. Instead of building blocks,
+bench rows and season aggregates night by night from per-row dicts, the
+engine puts every player span of the nights being recomputed into one long
+DataFrame (night, main, start, end, half) and derives blocks with sorted
+group-wise operations, bench rows with the batched NumPy bench engine, and
+week totals, rankings and attendance with group-by and merge operations
+over one read of ``bench_night_totals``, ``night_qa`` and ``team_roster``.
+
+Night QA itself (envelope, break detection, overrides) still comes from
+:func:`pebble.night_compute.prepare_night`: it is a handful of fights per
+night and inherently sequential. Every output matches the loop engine.
+"""
+
+from __future__ import annotations
+
+import math
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .attendance import STATUS_ORDER, _has_out_minutes, _normalize_minutes
+from .bench_calc_numpy import bench_minutes_for_nights
+from .blocks import build_blocks, build_blocks_from_spans
+from .mongo_client import publish_collection
+from .night_compute import (
+    NightInputs,
+    NightPlan,
+    NightResult,
+    NightTimeSettings,
+    finish_night,
+    prepare_night,
+)
+from .participation import build_mythic_participation
+from .pipeline_context import PipelineContext
+from .utils.names import NameResolver
+from .utils.time import ms_to_pt_iso
+from .week_agg import merge_week_totals, week_id_from_night_id
+
+
+def _span_frame(plans: Sequence[NightPlan]) -> pd.DataFrame:
+    """One row per player span; ``key`` numbers (main, night_id) per night."""
+
+    records = []
+    for pos, plan in enumerate(plans):
+        keys: Dict[tuple, int] = {}
+        records.extend(
+            (pos, keys.setdefault((main, night_id), len(keys)), main, night_id, s, e)
+            for main, night_id, spans in plan.player_spans
+            for s, e in spans
+        )
+    return pd.DataFrame.from_records(
+        records, columns=["night_pos", "key", "main", "night_id", "start_ms", "end_ms"]
+    )
+
+
+def columnar_blocks(plans: Sequence[NightPlan]) -> List[List[dict]]:
+    """Return each plan's blocks, equal to :func:`build_blocks_from_spans`.
+
+    Spans of one (main, night_id) are sorted by start; a block starts at the
+    first span, when the half changes, or when a non-Mythic boss pull lies
+    between the previous span's end and this span's start. With spans that
+    never overlap the previous span's end is the open block's end; nights
+    where a player's spans overlap fall back to the scalar builder.
+    """
+
+    out: List[List[dict]] = [[] for _ in plans]
+    df = _span_frame(plans)
+    if df.empty:
+        return out
+
+    df["seq"] = np.arange(len(df), dtype=np.int64)
+    df = df.sort_values(["night_pos", "key", "start_ms", "seq"], kind="stable").reset_index(drop=True)
+    night_pos = df["night_pos"].to_numpy()
+    key = df["key"].to_numpy()
+    start = df["start_ms"].to_numpy()
+    end = df["end_ms"].to_numpy()
+
+    first = np.ones(len(df), dtype=bool)
+    first[1:] = (night_pos[1:] != night_pos[:-1]) | (key[1:] != key[:-1])
+    prev_end = np.empty_like(end)
+    prev_end[0] = 0
+    prev_end[1:] = end[:-1]
+
+    break_start = np.asarray(
+        [plan.break_range[0] if plan.break_range else np.iinfo(np.int64).max for plan in plans],
+        dtype=np.int64,
+    )[night_pos]
+    post = (start + end) // 2 >= break_start
+    half_changed = np.zeros(len(df), dtype=bool)
+    half_changed[1:] = post[1:] != post[:-1]
+
+    nm_between = np.zeros(len(df), dtype=bool)
+    bounds = np.flatnonzero(np.diff(night_pos)) + 1
+    for lo, hi in zip(np.r_[0, bounds], np.r_[bounds, len(df)]):
+        nm_between[lo:hi] = plans[night_pos[lo]].boss_index.has_non_mythic_within_many(
+            prev_end[lo:hi], start[lo:hi]
+        )
+
+    overlapping = ~first & (start < prev_end) | (end < start)
+    fallback = set(np.unique(night_pos[overlapping]).tolist())
+
+    df["block"] = np.cumsum(first | half_changed | nm_between)
+    df["half"] = np.where(post, "post", "pre")
+    blocks = df.groupby("block", sort=True).agg(
+        night_pos=("night_pos", "first"),
+        main=("main", "first"),
+        night_id=("night_id", "first"),
+        half=("half", "first"),
+        start_ms=("start_ms", "first"),
+        end_ms=("end_ms", "max"),
+    )
+    for pos, main, night_id, half, start_ms, end_ms in zip(
+        blocks["night_pos"].tolist(),
+        blocks["main"].tolist(),
+        blocks["night_id"].tolist(),
+        blocks["half"].tolist(),
+        blocks["start_ms"].tolist(),
+        blocks["end_ms"].tolist(),
+    ):
+        if pos in fallback:
+            continue
+        out[pos].append(
+            {
+                "main": main,
+                "night_id": night_id,
+                "half": half,
+                "start_ms": start_ms,
+                "end_ms": end_ms,
+                "start_pt": ms_to_pt_iso(start_ms),
+                "end_pt": ms_to_pt_iso(end_ms),
+            }
+        )
+    for pos in fallback:
+        plan = plans[pos]
+        out[pos] = build_blocks_from_spans(
+            plan.player_spans, break_range=plan.break_range, boss_index=plan.boss_index
+        )
+    return out
+
+
+def compute_nights_columnar(
+    inputs: Sequence[NightInputs],
+    resolver: NameResolver,
+    time_settings: NightTimeSettings,
+    *,
+    audit_participation: bool = False,
+) -> List[Optional[NightResult]]:
+    """Columnar counterpart of :func:`pebble.night_compute.compute_nights`."""
+
+    plans = [prepare_night(item, resolver, time_settings) for item in inputs]
+    ready = [plan for plan in plans if plan is not None]
+    blocks_by_plan = columnar_blocks(ready)
+    for plan, blocks in zip(ready, blocks_by_plan):
+        plan.bench.blocks = blocks
+    bench_by_plan = bench_minutes_for_nights([plan.bench for plan in ready])
+
+    results: List[Optional[NightResult]] = []
+    finished = iter(zip(ready, blocks_by_plan, bench_by_plan))
+    for plan in plans:
+        if plan is None:
+            results.append(None)
+            continue
+        plan, blocks, bench = next(finished)
+        part_rows = None
+        if audit_participation:
+            part_rows = build_mythic_participation(plan.fights_m, resolver=resolver, presence=plan.presence)
+            blocks = build_blocks(part_rows, break_range=plan.break_range, boss_index=plan.boss_index)
+        results.append(finish_night(plan, blocks, bench, part_rows))
+    return results
+
+
+def _roster_frame(roster_docs: List[dict]) -> pd.DataFrame:
+    # Missing join/leave nights become "" (and open-ended game weeks) here;
+    # pandas would turn None into NaN.
+    return pd.DataFrame(
+        [
+            {
+                "main": doc.get("main"),
+                "active": doc.get("active") is not False,
+                "leave_night": doc.get("leave_night") or "",
+                "join_wk": week_id_from_night_id(doc.get("join_night") or "1970-01-01"),
+                "leave_wk": week_id_from_night_id(doc.get("leave_night") or "9999-12-31"),
+            }
+            for doc in roster_docs
+            if doc.get("main")
+        ],
+        columns=["main", "active", "leave_night", "join_wk", "leave_wk"],
+    )
+
+
+def week_totals_frame(bench_docs: List[dict], roster_docs: List[dict]) -> List[dict]:
+    """Week totals per (game_week, main), like ``materialize_week_totals``."""
+
+    columns = ["game_week", "main", "played_min", "bench_min", "bench_pre_min", "bench_post_min"]
+    nights = pd.DataFrame(
+        [
+            {
+                "night_id": r["night_id"],
+                "main": r["main"],
+                "played_min": int(r.get("played_pre_min", 0)) + int(r.get("played_post_min", 0)),
+                "bench_pre_min": int(r.get("bench_pre_min", 0)),
+                "bench_post_min": int(r.get("bench_post_min", 0)),
+            }
+            for r in bench_docs
+        ],
+        columns=["night_id", "main", "played_min", "bench_pre_min", "bench_post_min"],
+    )
+    week_of = {night: week_id_from_night_id(night) for night in nights["night_id"].unique()}
+    nights["game_week"] = nights["night_id"].map(week_of)
+    totals = (
+        nights.groupby(["game_week", "main"], sort=False)[["played_min", "bench_pre_min", "bench_post_min"]]
+        .sum()
+        .reset_index()
+    )
+
+    # Pad rostered mains active during the observed weeks.
+    roster = _roster_frame(roster_docs)
+    roster = roster[roster["active"].astype(bool)]
+    weeks = pd.DataFrame({"game_week": sorted(set(week_of.values()))})
+    if not roster.empty and not weeks.empty:
+        pad = roster[["main", "join_wk", "leave_wk"]].merge(weeks, how="cross")
+        pad = pad[(pad["join_wk"] <= pad["game_week"]) & (pad["game_week"] <= pad["leave_wk"])]
+        pad = pad[["game_week", "main"]].drop_duplicates()
+        totals = totals.merge(pad, on=["game_week", "main"], how="outer")
+
+    totals = totals.fillna(0).sort_values(["game_week", "main"])
+    totals["bench_min"] = totals["bench_pre_min"] + totals["bench_post_min"]
+    updated_at = datetime.utcnow()
+    docs = []
+    for game_week, main, played, bench, bench_pre, bench_post in zip(
+        *(totals[c].tolist() for c in columns)
+    ):
+        docs.append(
+            {
+                "game_week": game_week,
+                "main": main,
+                "played_min": int(played),
+                "bench_min": int(bench),
+                "bench_pre_min": int(bench_pre),
+                "bench_post_min": int(bench_post),
+                "updated_at": updated_at,
+            }
+        )
+    return docs
+
+
+def rankings_frame(
+    week_docs: List[dict], roster_docs: List[dict], latest_night: Optional[str]
+) -> List[dict]:
+    """Season-to-date rankings, like ``materialize_rankings``."""
+
+    roster = _roster_frame(roster_docs)
+    roster = roster[roster["active"].astype(bool)]
+    if latest_night:
+        roster = roster[(roster["leave_night"] == "") | (roster["leave_night"] >= latest_night)]
+    roster_mains = set(roster["main"])
+    if not roster_mains:
+        return []
+
+    weeks = pd.DataFrame(week_docs, columns=["main", "bench_min", "played_min"])
+    weeks = weeks[weeks["main"].isin(roster_mains)]
+    totals = (
+        weeks.groupby("main")[["bench_min", "played_min"]]
+        .sum()
+        .reset_index()
+        .sort_values(["bench_min", "main"])
+    )
+    updated_at = datetime.utcnow()
+    docs = []
+    for idx, (main, bench_min, played_min) in enumerate(
+        zip(totals["main"].tolist(), totals["bench_min"].tolist(), totals["played_min"].tolist()),
+        start=1,
+    ):
+        bench_min = int(bench_min)
+        played_min = int(played_min)
+        docs.append(
+            {
+                "rank": idx,
+                "main": main,
+                "bench_min": bench_min,
+                "played_min": played_min,
+                "bench_to_played_ratio": bench_min / played_min if played_min > 0 else None,
+                "updated_at": updated_at,
+            }
+        )
+    return docs
+
+
+def attendance_rows_frame(
+    night_docs: List[dict], bench_docs: List[dict], roster_docs: List[dict]
+) -> List[List]:
+    """Attendance sheet rows, like :func:`pebble.attendance.build_attendance_rows`."""
+
+    meta = pd.DataFrame(
+        [
+            {
+                "night_id": doc["night_id"],
+                "pre_min": math.floor(float(doc.get("mythic_pre_min", 0) or 0)),
+                "post_min": math.floor(float(doc.get("mythic_post_min", 0) or 0)),
+            }
+            for doc in night_docs
+            if doc.get("night_id")
+        ],
+        columns=["night_id", "pre_min", "post_min"],
+    ).drop_duplicates("night_id", keep="last")
+    meta["total_min"] = meta["pre_min"] + meta["post_min"]
+    meta["week"] = meta["night_id"].map(week_id_from_night_id)
+    meta = meta.sort_values("night_id")
+    all_night_ids = meta["night_id"].tolist()
+    week_ids = sorted(set(meta["week"]))
+
+    bench = pd.DataFrame(
+        [
+            {
+                "night_id": doc["night_id"],
+                "main": doc["main"],
+                "played": float(doc.get("played_total_min", 0) or 0),
+                "bench": float(doc.get("bench_total_min", 0) or 0),
+                "avail_pre": bool(doc.get("avail_pre", False)),
+                "avail_post": bool(doc.get("avail_post", False)),
+                "has_out": _has_out_minutes(doc),
+            }
+            for doc in bench_docs
+        ],
+        columns=["night_id", "main", "played", "bench", "avail_pre", "avail_post", "has_out"],
+    ).drop_duplicates(["night_id", "main"], keep="last")
+
+    roster = {doc["main"]: doc for doc in roster_docs if doc.get("main")}
+    bench_mains = {main for main in bench["main"] if main}
+    sorted_mains = sorted(set(roster) | bench_mains)
+    header = ["Player", "Attendance", "Played", "Bench", "Possible"] + week_ids
+    if not sorted_mains:
+        return [header]
+
+    earliest_night = all_night_ids[0] if all_night_ids else None
+    latest_night = all_night_ids[-1] if all_night_ids else None
+    members = []
+    for main in sorted_mains:
+        entry = roster.get(main)
+        if entry:
+            if not bool(entry.get("active", True)):
+                continue
+            if latest_night:
+                join_night = entry.get("join_night")
+                if join_night and join_night > latest_night:
+                    continue
+                leave_night = entry.get("leave_night")
+                if leave_night and leave_night < latest_night:
+                    continue
+        members.append(
+            {
+                "main": main,
+                "join": (entry or {}).get("join_night") or earliest_night or "1970-01-01",
+                "leave": (entry or {}).get("leave_night") or latest_night or "9999-12-31",
+                "rostered": entry is not None,
+            }
+        )
+    members = pd.DataFrame(members, columns=["main", "join", "leave", "rostered"])
+
+    grid = members.merge(meta, how="cross")
+    grid = grid[(grid["join"] <= grid["night_id"]) & (grid["night_id"] <= grid["leave"])]
+    grid = grid.merge(bench, on=["night_id", "main"], how="left", indicator=True)
+    has_doc = grid["_merge"] == "both"
+    played = grid["played"].where(has_doc, 0.0)
+    benched = grid["bench"].where(has_doc, 0.0)
+    out = (
+        (~has_doc & (grid["total_min"] > 0))
+        | (has_doc & grid["has_out"].eq(True))
+        | (has_doc & (grid["pre_min"] > 0) & ~grid["avail_pre"].eq(True))
+        | (has_doc & (grid["post_min"] > 0) & ~grid["avail_post"].eq(True))
+    )
+    grid = grid.assign(
+        played=played,
+        bench=benched,
+        P=has_doc & (played > 0),
+        B=has_doc & (benched > 0),
+        O=out,
+    )
+
+    totals = grid.groupby("main").agg(
+        played=("played", "sum"), bench=("bench", "sum"), possible=("total_min", "sum")
+    )
+    letters = grid.groupby(["main", "week"])[list(STATUS_ORDER)].any()
+    letters = {
+        (main, week): "".join(letter for letter in STATUS_ORDER if flags[letter])
+        for (main, week), flags in letters.iterrows()
+    }
+
+    rows: List[List] = [header]
+    for main, rostered in zip(members["main"].tolist(), members["rostered"].tolist()):
+        if main in totals.index:
+            total_played, total_bench, total_possible = (
+                float(totals.at[main, "played"]),
+                float(totals.at[main, "bench"]),
+                float(totals.at[main, "possible"]),
+            )
+        else:
+            if rostered and all_night_ids:
+                continue
+            total_played = total_bench = total_possible = 0.0
+        if total_possible > 0:
+            attendance_pct = f"{(total_played + total_bench) / total_possible * 100:.1f}%"
+        else:
+            attendance_pct = ""
+        rows.append(
+            [
+                main,
+                attendance_pct,
+                _normalize_minutes(total_played),
+                _normalize_minutes(total_bench),
+                _normalize_minutes(total_possible),
+            ]
+            + [letters.get((main, week), "") for week in week_ids]
+        )
+    return rows
+
+
+def materialize_season_frame(
+    db,
+    context: Optional[PipelineContext] = None,
+    *,
+    publish_mode: str = "replace",
+    changed_nights: Optional[Iterable[str]] = None,
+) -> Tuple[List[dict], List[dict], List[List]]:
+    """Refresh ``bench_week_totals`` and ``bench_rankings`` from one read.
+
+    Returns the week total documents, the ranking documents and the
+    attendance rows. With ``context`` nothing is read from Mongo. With
+    ``changed_nights`` only their weeks are written, through
+    :func:`pebble.week_agg.merge_week_totals`.
+    """
+
+    if context is not None:
+        bench_docs = context.bench_night_docs()
+        night_docs = context.night_qa_docs()
+        roster_docs = context.team_roster
+    else:
+        bench_docs = list(db["bench_night_totals"].find({}, {"_id": 0}))
+        night_docs = list(db["night_qa"].find({}, {"_id": 0}))
+        roster_docs = list(db["team_roster"].find({}, {"_id": 0}))
+
+    week_docs = week_totals_frame(bench_docs, roster_docs)
+    latest_night = max((doc["night_id"] for doc in bench_docs), default=None)
+    ranking_docs = rankings_frame(week_docs, roster_docs, latest_night)
+    attendance_rows = attendance_rows_frame(night_docs, bench_docs, roster_docs)
+
+    if changed_nights is not None:
+        merge_week_totals(db, changed_nights, roster_docs)
+    else:
+        publish_collection(db, "bench_week_totals", [dict(doc) for doc in week_docs], mode=publish_mode)
+    publish_collection(db, "bench_rankings", [dict(doc) for doc in ranking_docs], mode=publish_mode)
+    return week_docs, ranking_docs, attendance_rows
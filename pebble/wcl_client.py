@@ -1,9 +1,14 @@
 from __future__ import annotations
 
+import hashlib
 import json
 import logging
+import threading
 import time
-from typing import Optional
+import zlib
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Optional, Sequence
 
 import requests
 from requests.auth import HTTPBasicAuth
@@ -17,6 +22,11 @@ from tenacity import (
 
 import redis
 
+from .cache_backends import CacheBackend, RedisCacheBackend, build_cache_backend
+
+if TYPE_CHECKING:
+    from .config_loader import Settings
+
 logger = logging.getLogger(__name__)
 
 _RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
@@ -25,6 +35,260 @@ CACHE_TTL_SHORT = 5 * 60  # 5 minutes
 CACHE_TTL_LONG = 60 * 60 * 24 * 30 * 6  # ~6 months
 _FRESH_MS = 24 * 60 * 60 * 1000
 
+# Selection set shared by the single and aliased multi-report queries.
+_REPORT_BUNDLE_FIELDS = """
+              code
+              title
+              startTime
+              endTime
+              owner { name }
+              zone { name }
+              region { id name compactName }
+              guild { id name server { name region { id name compactName } } }
+              fights { id encounterID name difficulty startTime endTime friendlyPlayers kill }
+              masterData(translate: $translate) { actors(type: "Player") { id name server subType type } }
+"""
+
+# Cached bundles are stored as MAGIC + format version + codec id [+ fresh-until]
+# + payload. Version 2 adds an 8-byte big-endian epoch second after which the
+# entry is stale (0 = never); version 1 entries are always treated as fresh.
+# Entries without the magic prefix predate the header and are plain JSON.
+_CACHE_MAGIC = b"PBL"
+_CACHE_FORMAT_VERSION = 3
+CACHE_CODECS = {"json": 1, "zlib": 2}
+_CODEC_NAMES = {v: k for k, v in CACHE_CODECS.items()}
+
+
+def encode_bundle(
+    report: dict,
+    codec: str = "zlib",
+    *,
+    fresh_until: Optional[float] = None,
+    expires_at: Optional[float] = None,
+) -> bytes:
+    """Serialize a report bundle for the cache using ``codec``.
+
+    ``fresh_until`` (epoch seconds) marks when the entry becomes stale; it
+    is still served until the backend's hard TTL evicts it. ``expires_at``
+    records that eviction time so readers holding a copy can honour it.
+    """
+
+    codec_id = CACHE_CODECS.get(codec)
+    if codec_id is None:
+        raise ValueError(f"Unknown cache codec: {codec}")
+    payload = json.dumps(report, separators=(",", ":")).encode("utf-8")
+    if codec == "zlib":
+        payload = zlib.compress(payload, 6)
+    header = _CACHE_MAGIC + bytes([_CACHE_FORMAT_VERSION, codec_id])
+    times = int(fresh_until or 0).to_bytes(8, "big") + int(expires_at or 0).to_bytes(8, "big")
+    return header + times + payload
+
+
+def _decode_payload(data: bytes | str) -> tuple[str, bytes, Optional[float], Optional[float]]:
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    if not data.startswith(_CACHE_MAGIC):
+        return "legacy", data, None, None
+    offset = len(_CACHE_MAGIC)
+    version, codec_id = data[offset], data[offset + 1]
+    if version not in (1, 2, 3) or codec_id not in _CODEC_NAMES:
+        raise ValueError(f"Unsupported cache entry (version={version}, codec={codec_id})")
+    offset += 2
+    fresh_until: Optional[float] = None
+    expires_at: Optional[float] = None
+    if version >= 2:
+        fresh_until = float(int.from_bytes(data[offset : offset + 8], "big")) or None
+        offset += 8
+    if version >= 3:
+        expires_at = float(int.from_bytes(data[offset : offset + 8], "big")) or None
+        offset += 8
+    codec = _CODEC_NAMES[codec_id]
+    payload = data[offset:]
+    if codec == "zlib":
+        payload = zlib.decompress(payload)
+    return codec, payload, fresh_until, expires_at
+
+
+def decode_entry(data: bytes | str) -> tuple[dict, Optional[float]]:
+    """Return ``(report, fresh_until)`` for a cache entry; see :func:`encode_bundle`."""
+
+    _, payload, fresh_until, _ = _decode_payload(data)
+    return json.loads(payload), fresh_until
+
+
+def decode_bundle(data: bytes | str) -> dict:
+    """Inverse of :func:`encode_bundle`; also reads legacy plain-JSON entries."""
+
+    return decode_entry(data)[0]
+
+
+# Number of fight ids requested per incremental fetch of a live report.
+INCREMENTAL_FIGHT_WINDOW = 100
+
+# Maximum events per page requested from ``report.events``.
+EVENTS_PAGE_LIMIT = 10000
+
+
+_RATE_LIMIT_FIELDS = "rateLimitData { limitPerHour pointsSpentThisHour pointsResetIn }"
+_RATE_LIMIT_QUERY = f"""
+query RateLimit {{
+  {_RATE_LIMIT_FIELDS}
+}}
+"""
+
+PRIORITY_LIVE = "live"
+PRIORITY_LOW = "low"
+
+
+class RateLimitBudget:
+    """Track the WCL hourly point budget reported by ``rateLimitData``.
+
+    Live fetches (tonight's reports) are always allowed. Low-priority fetches
+    such as old reports or full reingests are only allowed while the remaining
+    points stay above ``reserve_fraction`` of the hourly limit, so a backfill
+    cannot starve raid-night ingestion. Until the first reading arrives the
+    budget is unknown and everything is allowed.
+
+    Readings come from the ``X-RateLimit-*`` headers of any WCL response or
+    from ``rateLimitData`` selected alongside a report bundle once the last
+    reading is older than ``refresh_interval``.
+    """
+
+    def __init__(self, *, reserve_fraction: float = 0.2, refresh_interval: float = 60.0):
+        self.reserve_fraction = max(0.0, min(1.0, float(reserve_fraction)))
+        self.refresh_interval = max(0.0, float(refresh_interval))
+        self.limit_per_hour: Optional[float] = None
+        self.points_spent: Optional[float] = None
+        self.reset_at: Optional[float] = None
+        self.updated_at: Optional[float] = None
+        self.deferred = 0
+        self._lock = threading.Lock()
+
+    def update(self, data: dict, *, now: Optional[float] = None) -> None:
+        now = time.time() if now is None else now
+        with self._lock:
+            self.limit_per_hour = float(data.get("limitPerHour") or 0)
+            self.points_spent = float(data.get("pointsSpentThisHour") or 0)
+            self.reset_at = now + float(data.get("pointsResetIn") or 0)
+            self.updated_at = now
+
+    def update_from_headers(self, headers, *, now: Optional[float] = None) -> bool:
+        """Apply ``X-RateLimit-*`` response headers; return whether they were present."""
+
+        try:
+            limit = float(headers["X-RateLimit-Limit"])
+            remaining = float(headers["X-RateLimit-Remaining"])
+            reset_in = float(headers.get("X-RateLimit-Reset") or 0)
+        except (KeyError, TypeError, ValueError):
+            return False
+        self.update(
+            {"limitPerHour": limit, "pointsSpentThisHour": limit - remaining, "pointsResetIn": reset_in},
+            now=now,
+        )
+        return True
+
+    def mark_throttled(self, *, now: Optional[float] = None) -> None:
+        """Treat the budget as exhausted after WCL answers with HTTP 429."""
+
+        with self._lock:
+            if self.limit_per_hour:
+                self.points_spent = self.limit_per_hour
+            self.updated_at = time.time() if now is None else now
+
+    def is_stale(self, *, now: Optional[float] = None) -> bool:
+        now = time.time() if now is None else now
+        if self.updated_at is None:
+            return True
+        if self.reset_at is not None and now >= self.reset_at:
+            return True
+        return now - self.updated_at >= self.refresh_interval
+
+    @property
+    def remaining(self) -> Optional[float]:
+        if self.limit_per_hour is None or self.points_spent is None:
+            return None
+        if self.reset_at is not None and time.time() >= self.reset_at:
+            return self.limit_per_hour
+        return max(0.0, self.limit_per_hour - self.points_spent)
+
+    @property
+    def reserve(self) -> float:
+        return (self.limit_per_hour or 0.0) * self.reserve_fraction
+
+    def allows(self, priority: str) -> bool:
+        if priority == PRIORITY_LIVE:
+            return True
+        remaining = self.remaining
+        if remaining is None:
+            return True
+        return remaining > self.reserve
+
+    def snapshot(self) -> dict:
+        remaining = self.remaining
+        reset_in = None
+        if self.reset_at is not None:
+            reset_in = max(0, int(self.reset_at - time.time()))
+        return {
+            "limit_per_hour": self.limit_per_hour,
+            "points_spent": self.points_spent,
+            "points_remaining": remaining,
+            "reserve_points": round(self.reserve, 1),
+            "reset_in": reset_in,
+        }
+
+
+def report_cache_ttl(report: dict, *, now_ms: Optional[int] = None) -> int:
+    """Short TTL for reports started within the last day, long TTL otherwise."""
+
+    start_ms = int(report.get("startTime") or 0)
+    now_ms = int(time.time() * 1000) if now_ms is None else now_ms
+    return CACHE_TTL_SHORT if start_ms and (now_ms - start_ms) < _FRESH_MS else CACHE_TTL_LONG
+
+
+class ReportLRU:
+    """Small in-process LRU of decoded report bundles.
+
+    Entries expire after the same short/long TTL used for Redis, capped at
+    ``max_age`` seconds, and the least recently used entry is evicted once
+    ``max_entries`` is exceeded. ``max_entries=0`` disables the cache.
+    """
+
+    def __init__(self, *, max_entries: int = 128, max_age: float = 900.0):
+        self.max_entries = max(0, int(max_entries))
+        self.max_age = max(0.0, float(max_age))
+        self._entries: "OrderedDict[str, tuple[float, dict]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, code: str, *, now: Optional[float] = None) -> Optional[dict]:
+        now = time.time() if now is None else now
+        with self._lock:
+            entry = self._entries.get(code)
+            if entry is None:
+                return None
+            expires_at, report = entry
+            if now >= expires_at:
+                del self._entries[code]
+                return None
+            self._entries.move_to_end(code)
+            return report
+
+    def put(self, code: str, report: dict, ttl: float, *, now: Optional[float] = None) -> None:
+        if not self.max_entries:
+            return
+        now = time.time() if now is None else now
+        with self._lock:
+            self._entries[code] = (now + min(float(ttl), self.max_age), report)
+            self._entries.move_to_end(code)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
 
 def _is_retryable(exc: Exception) -> bool:
     if isinstance(exc, requests.HTTPError):
@@ -42,7 +306,14 @@ class WCLClient:
         token_url: str = "https://www.warcraftlogs.com/oauth/token",
         redis_url: str | None = None,
         redis_client: Optional[redis.Redis] = None,
+        cache_backend: Optional[CacheBackend] = None,
         cache_prefix: str = "pebble:wcl:",
+        share_token: bool = False,
+        cache_codec: str = "zlib",
+        memory_cache_entries: int = 128,
+        memory_cache_seconds: float = 900.0,
+        stale_ttl: int = 0,
+        rate_limit_budget: Optional[RateLimitBudget] = None,
     ):
         self._session = requests.Session()
         self._client_id = client_id
@@ -51,13 +322,80 @@ class WCLClient:
         self._token_url = token_url
         self._token: Optional[str] = None
         self._token_exp: float = 0.0
-        if redis_client is not None:
-            self._redis = redis_client
+        # Serializes token refreshes when bundles are fetched from worker threads.
+        self._token_lock = threading.Lock()
+        self._cache: Optional[CacheBackend]
+        if cache_backend is not None:
+            self._cache = cache_backend
+        elif redis_client is not None:
+            self._cache = RedisCacheBackend(redis_client)
         elif redis_url:
-            self._redis = redis.from_url(redis_url)
+            self._cache = RedisCacheBackend.from_url(redis_url)
         else:
-            self._redis = None
+            self._cache = None
         self._cache_prefix = cache_prefix
+        if cache_codec not in CACHE_CODECS:
+            raise ValueError(f"Unknown cache codec: {cache_codec}")
+        self._cache_codec = cache_codec
+        self._memory_cache = ReportLRU(max_entries=memory_cache_entries, max_age=memory_cache_seconds)
+        self._cache_counts = {tier: {"hits": 0, "misses": 0} for tier in ("memory", "shared")}
+        self._cache_counts["shared"]["stale"] = 0
+        # Fresh reports stay in the shared cache for ``stale_ttl`` seconds past
+        # their short TTL and are refreshed in the background when served.
+        self._stale_ttl = max(0, int(stale_ttl))
+        self._refresh_pool: Optional[ThreadPoolExecutor] = None
+        self._refreshing: Dict[str, Future] = {}
+        self._refresh_lock = threading.Lock()
+        self._cache_counts_lock = threading.Lock()
+        self.budget = rate_limit_budget or RateLimitBudget()
+        self._token_cache_key: Optional[str] = None
+        if share_token and self._cache is not None:
+            digest = hashlib.sha256(f"{client_id}\x1e{token_url}".encode("utf-8")).hexdigest()[:16]
+            self._token_cache_key = f"{cache_prefix}oauth:{digest}"
+
+    def _set_token(self, token: str, expires_at: float) -> None:
+        self._token = token
+        self._token_exp = expires_at
+        self._session.headers.update({"Authorization": f"Bearer {self._token}"})
+
+    def _load_shared_token(self, now: float) -> bool:
+        """Adopt a still-valid token persisted by this or a sibling process."""
+
+        if not self._token_cache_key:
+            return False
+        try:
+            raw = self._cache.get(self._token_cache_key)
+        except Exception:
+            logger.warning("Failed to read shared WCL token", exc_info=True)
+            return False
+        if not raw:
+            return False
+        try:
+            data = json.loads(raw)
+            token = data["access_token"]
+            expires_at = float(data["expires_at"])
+        except (ValueError, KeyError, TypeError):
+            return False
+        if now >= expires_at - 60:
+            return False
+        self._set_token(token, expires_at)
+        logger.info(
+            "Reusing shared WCL access token",
+            extra={"expires_in": int(expires_at - now)},
+        )
+        return True
+
+    def _store_shared_token(self, now: float) -> None:
+        if not self._token_cache_key or not self._token:
+            return
+        ttl = int(self._token_exp - now) - 60
+        if ttl <= 0:
+            return
+        payload = json.dumps({"access_token": self._token, "expires_at": self._token_exp})
+        try:
+            self._cache.set(self._token_cache_key, payload, ttl)
+        except Exception:
+            logger.warning("Failed to persist shared WCL token", exc_info=True)
 
     @retry(
         reraise=True,
@@ -67,9 +405,15 @@ class WCLClient:
         before_sleep=before_sleep_log(logger, logging.WARNING),
     )
     def _ensure_token(self) -> None:
+        with self._token_lock:
+            self._refresh_token_locked()
+
+    def _refresh_token_locked(self) -> None:
         now = time.time()
         if self._token and now < (self._token_exp - 60):
             return
+        if self._load_shared_token(now):
+            return
         logger.info("Requesting WCL access token", extra={"url": self._token_url})
         try:
             r = self._session.post(
@@ -87,9 +431,8 @@ class WCLClient:
         if not token:
             raise RuntimeError(f"WCL token response missing access_token: {data}")
         expires_in = int(data.get("expires_in", 3600))
-        self._token = token
-        self._token_exp = now + max(60, expires_in)
-        self._session.headers.update({"Authorization": f"Bearer {self._token}"})
+        self._set_token(token, now + max(60, expires_in))
+        self._store_shared_token(now)
         logger.info(
             "Obtained WCL access token",
             extra={"expires_in": expires_in},
@@ -113,10 +456,17 @@ class WCLClient:
         try:
             r = self._session.post(self._base_url, json=payload, timeout=60)
             r.raise_for_status()
-        except Exception:
+        except Exception as exc:
+            if isinstance(exc, requests.HTTPError) and exc.response is not None and exc.response.status_code == 429:
+                self.budget.mark_throttled()
             logger.warning("WCL request failed", exc_info=True)
             raise
         data = r.json()
+        rate_limit = (data.get("data") or {}).get("rateLimitData")
+        if rate_limit:
+            self.budget.update(rate_limit)
+        else:
+            self.budget.update_from_headers(r.headers)
         if "errors" in data:
             logger.warning("WCL GraphQL errors", extra={"errors": data["errors"]})
             raise RuntimeError(data["errors"])  # surface graph errors
@@ -124,22 +474,251 @@ class WCLClient:
         logger.info("WCL request succeeded", extra={"elapsed": round(dur, 3)})
         return data
 
+    def _rate_limit_selection(self) -> str:
+        """``rateLimitData`` to bundle into the next query when the reading is stale."""
+
+        return _RATE_LIMIT_FIELDS if self.budget.is_stale() else ""
+
+    def refresh_rate_limit(self, *, force: bool = False) -> RateLimitBudget:
+        """Read ``rateLimitData`` when no budget reading exists yet.
+
+        Later readings arrive with regular requests (see :meth:`_post`), so
+        this only spends a request on the first call or when ``force`` is
+        set. Failures are logged and leave the previous reading in place so a
+        budget lookup never blocks ingestion.
+        """
+
+        if force or self.budget.updated_at is None:
+            try:
+                # _post applies the reading (body or headers) to the budget.
+                self._post(_RATE_LIMIT_QUERY)
+            except Exception:
+                logger.warning("Failed to read WCL rate limit", exc_info=True)
+        return self.budget
+
+    def _cache_key(self, code: str) -> str:
+        return f"{self._cache_prefix}{code}"
+
+    def _count_cache(self, tier: str, hit: bool) -> None:
+        with self._cache_counts_lock:
+            self._cache_counts[tier]["hits" if hit else "misses"] += 1
+
+    def _count_stale(self) -> None:
+        with self._cache_counts_lock:
+            self._cache_counts["shared"]["stale"] += 1
+
+    def cache_counters(self) -> Dict[str, Dict[str, int]]:
+        """Cumulative hit/miss counts per cache tier.
+
+        ``memory`` is the in-process LRU and ``shared`` the configured cache
+        backend (Redis by default).
+        """
+
+        with self._cache_counts_lock:
+            return {tier: dict(counts) for tier, counts in self._cache_counts.items()}
+
+    def _decode_cached(self, code: str, cache_key: str, cached: bytes | str) -> Optional[dict]:
+        logger.info(
+            "WCL cache hit",
+            extra={"code": code, "cache_key": cache_key},
+        )
+        try:
+            _, payload, fresh_until, expires_at = _decode_payload(cached)
+            report = json.loads(payload)
+        except (ValueError, zlib.error):
+            logger.warning(
+                "Ignoring unreadable WCL cache entry",
+                extra={"code": code, "cache_key": cache_key},
+                exc_info=True,
+            )
+            return None
+        now = time.time()
+        if fresh_until is not None and now >= fresh_until:
+            self._count_stale()
+            self._schedule_refresh(code)
+            return report
+        # The in-process copy lives no longer than the shared entry it was
+        # read from; entries written before expiries were stored fall back to
+        # a full TTL from now.
+        deadlines = [t for t in (fresh_until, expires_at) if t is not None]
+        ttl = min(deadlines) - now if deadlines else report_cache_ttl(report)
+        self._memory_cache.put(code, report, ttl)
+        return report
+
+    def _cached_report(self, code: str) -> Optional[dict]:
+        if self._memory_cache.max_entries:
+            report = self._memory_cache.get(code)
+            self._count_cache("memory", report is not None)
+            if report is not None:
+                return report
+        if not self._cache:
+            return None
+        cache_key = self._cache_key(code)
+        cached = self._cache.get(cache_key)
+        self._count_cache("shared", bool(cached))
+        if not cached:
+            return None
+        return self._decode_cached(code, cache_key, cached)
+
+    def cached_report_bundles(self, codes: Sequence[str]) -> Dict[str, dict]:
+        """Return the cached bundles among ``codes`` without touching WCL.
+
+        The in-process tier is consulted first and everything it misses is
+        resolved with a single ``get_many`` (``MGET`` on Redis). Stale entries
+        are returned and refreshed in the background. Codes absent from the
+        result are cache misses.
+        """
+
+        reports: Dict[str, dict] = {}
+        pending: List[str] = []
+        for code in dict.fromkeys(codes):
+            report = None
+            if self._memory_cache.max_entries:
+                report = self._memory_cache.get(code)
+                self._count_cache("memory", report is not None)
+            if report is not None:
+                reports[code] = report
+            else:
+                pending.append(code)
+        if not pending or not self._cache:
+            return reports
+        keys = [self._cache_key(code) for code in pending]
+        for code, cache_key, cached in zip(pending, keys, self._cache.get_many(keys)):
+            self._count_cache("shared", bool(cached))
+            if not cached:
+                continue
+            report = self._decode_cached(code, cache_key, cached)
+            if report is not None:
+                reports[code] = report
+        return reports
+
+    def _cache_report(self, code: str, report: dict) -> None:
+        ttl = report_cache_ttl(report)
+        self._memory_cache.put(code, report, ttl)
+        if not self._cache:
+            return
+        cache_key = self._cache_key(code)
+        now = time.time()
+        fresh_until = None
+        hard_ttl = ttl
+        if self._stale_ttl and ttl == CACHE_TTL_SHORT:
+            fresh_until = now + ttl
+            hard_ttl = ttl + self._stale_ttl
+        try:
+            self._cache.set(
+                cache_key,
+                encode_bundle(report, self._cache_codec, fresh_until=fresh_until, expires_at=now + hard_ttl),
+                hard_ttl,
+            )
+            logger.info(
+                "Cached WCL report",
+                extra={"code": code, "cache_key": cache_key, "ttl": ttl, "hard_ttl": hard_ttl},
+            )
+        except Exception:
+            logger.warning(
+                "Failed to cache WCL report",
+                extra={"code": code, "cache_key": cache_key},
+                exc_info=True,
+            )
+            raise
+
+    def _schedule_refresh(self, code: str) -> None:
+        """Refetch a stale bundle on the single background worker.
+
+        A code already queued or in flight is not scheduled again.
+        """
+
+        with self._refresh_lock:
+            if code in self._refreshing:
+                return
+            if self._refresh_pool is None:
+                self._refresh_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="wcl-refresh")
+            logger.info("Serving stale WCL report; refreshing in background", extra={"code": code})
+            self._refreshing[code] = self._refresh_pool.submit(self._refresh_report, code)
+
+    def _is_fresh_in_cache(self, code: str) -> bool:
+        try:
+            cached = self._cache.get(self._cache_key(code)) if self._cache else None
+            if not cached:
+                return False
+            _, fresh_until = decode_entry(cached)
+        except Exception:
+            return False
+        return fresh_until is None or time.time() < fresh_until
+
+    def _refresh_report(self, code: str) -> None:
+        try:
+            # A reader may have seen the stale entry just before a previous
+            # refresh replaced it; skip the refetch in that case.
+            if self._is_fresh_in_cache(code):
+                return
+            self._fetch_report_bundle_uncached(code)
+        except Exception:
+            logger.warning("Background WCL report refresh failed", extra={"code": code}, exc_info=True)
+        finally:
+            with self._refresh_lock:
+                self._refreshing.pop(code, None)
+
+    def wait_for_refreshes(self, timeout: Optional[float] = None) -> None:
+        """Block until background refreshes scheduled so far have finished."""
+
+        with self._refresh_lock:
+            pending = list(self._refreshing.values())
+        if pending:
+            wait(pending, timeout=timeout)
+
     def fetch_report_bundle(self, code: str, translate: bool = True) -> dict:
         """Report meta + fights + masterData actors in one call.
         NOTE: fight start/end are relative ms to report.startTime; we normalize in ingest.
         """
-        cache_key = f"{self._cache_prefix}{code}"
-        if self._redis:
-            cached = self._redis.get(cache_key)
-            if cached:
-                logger.info(
-                    "WCL cache hit",
-                    extra={"code": code, "cache_key": cache_key},
-                )
-                return json.loads(cached)
+        cached = self._cached_report(code)
+        if cached is not None:
+            return cached
+        return self._fetch_report_bundle_uncached(code, translate)
+
+    def _fetch_report_bundle_uncached(self, code: str, translate: bool = True) -> dict:
         logger.info("Fetching WCL report bundle", extra={"code": code})
+        q = f"""
+        query ReportFightsAndActors($code: String!, $translate: Boolean = true) {{
+          reportData {{
+            report(code: $code) {{{_REPORT_BUNDLE_FIELDS}}}
+          }}
+          {self._rate_limit_selection()}
+        }}
+        """
+        report = self._post(q, {"code": code, "translate": translate})["data"]["reportData"]["report"]
+        self._cache_report(code, report)
+        return report
+
+    def fetch_report_fights_since(
+        self,
+        code: str,
+        first_fight_id: int,
+        *,
+        window: int = INCREMENTAL_FIGHT_WINDOW,
+    ) -> Optional[dict]:
+        """Report meta plus every fight with an id of at least ``first_fight_id``.
+
+        Used for live reports that were already ingested: WCL fight ids grow
+        monotonically, so asking for ids after the last one seen returns only
+        the pulls logged since. Ids are requested ``window`` at a time until a
+        page comes back short, so a report that grew by more than ``window``
+        pulls between polls is still read completely. ``masterData`` is
+        omitted; callers resolve actors from what they stored and use
+        :meth:`fetch_report_actors` when a new player shows up. Results are
+        never cached. Returns ``None`` when WCL returns no report for the
+        first page; a later empty page ends the walk with the fights read so
+        far.
+        """
+
+        first = max(1, int(first_fight_id))
+        window = max(1, int(window))
+        logger.info(
+            "Fetching WCL report fights incrementally",
+            extra={"code": code, "first_fight_id": first},
+        )
         q = """
-        query ReportFightsAndActors($code: String!, $translate: Boolean = true) {
+        query ReportFightsSince($code: String!, $fightIDs: [Int]) {
           reportData {
             report(code: $code) {
               code
@@ -147,40 +726,239 @@ class WCLClient:
               startTime
               endTime
               owner { name }
-              zone { name }
-              region { id name compactName }
-              guild { id name server { name region { id name compactName } } }
-              fights { id encounterID name difficulty startTime endTime friendlyPlayers kill }
+              fights(fightIDs: $fightIDs) { id encounterID name difficulty startTime endTime friendlyPlayers kill }
+            }
+          }
+        }
+        """
+        report = None
+        fights: List[dict] = []
+        while True:
+            page = self._post(q, {"code": code, "fightIDs": list(range(first, first + window))})["data"][
+                "reportData"
+            ]["report"]
+            if page is None:
+                if report is None:
+                    return None
+                break
+            if report is None:
+                report = page
+            page_fights = page.get("fights") or []
+            fights.extend(page_fights)
+            if len(page_fights) < window:
+                break
+            first += window
+        report["fights"] = fights
+        return report
+
+    def fetch_report_actors(self, code: str, translate: bool = True) -> List[dict]:
+        """Return the player actors from a report's ``masterData``."""
+
+        q = """
+        query ReportActors($code: String!, $translate: Boolean = true) {
+          reportData {
+            report(code: $code) {
               masterData(translate: $translate) { actors(type: "Player") { id name server subType type } }
             }
           }
         }
         """
         report = self._post(q, {"code": code, "translate": translate})["data"]["reportData"]["report"]
-        if self._redis:
-            start_ms = int(report.get("startTime") or 0)
-            now_ms = int(time.time() * 1000)
-            ttl = CACHE_TTL_SHORT if start_ms and (now_ms - start_ms) < _FRESH_MS else CACHE_TTL_LONG
-            try:
-                self._redis.setex(cache_key, ttl, json.dumps(report))
-                logger.info(
-                    "Cached WCL report",
-                    extra={"code": code, "cache_key": cache_key, "ttl": ttl},
-                )
-            except Exception:
-                logger.warning(
-                    "Failed to cache WCL report",
-                    extra={"code": code, "cache_key": cache_key},
-                    exc_info=True,
-                )
-                raise
-        return report
+        return ((report or {}).get("masterData") or {}).get("actors") or []
+
+    def iter_report_events(
+        self,
+        code: str,
+        start_ms: int,
+        end_ms: int,
+        *,
+        fight_ids: Optional[Sequence[int]] = None,
+        limit: int = EVENTS_PAGE_LIMIT,
+    ) -> Iterator[List[dict]]:
+        """Yield pages of report events between report-relative ``start_ms`` and ``end_ms``.
+
+        Follows ``nextPageTimestamp`` until WCL reports no further page. Pages
+        are yielded as they arrive and never cached, so callers that fold
+        each page into a summary keep memory flat however long the report is.
+        """
+
+        q = """
+        query ReportEvents($code: String!, $start: Float!, $end: Float!, $fightIDs: [Int], $limit: Int) {
+          reportData {
+            report(code: $code) {
+              events(startTime: $start, endTime: $end, fightIDs: $fightIDs, limit: $limit) {
+                data
+                nextPageTimestamp
+              }
+            }
+          }
+        }
+        """
+        cursor: Optional[float] = start_ms
+        pages = 0
+        while cursor is not None:
+            variables = {"code": code, "start": cursor, "end": end_ms, "limit": limit}
+            if fight_ids is not None:
+                variables["fightIDs"] = list(fight_ids)
+            report = self._post(q, variables)["data"]["reportData"]["report"] or {}
+            events = report.get("events") or {}
+            pages += 1
+            yield events.get("data") or []
+            next_ts = events.get("nextPageTimestamp")
+            # Guard against a page cursor that does not advance.
+            cursor = next_ts if next_ts is not None and next_ts > cursor else None
+        logger.info("Read WCL report events", extra={"code": code, "pages": pages})
+
+    def fetch_report_bundles(self, codes: Sequence[str], translate: bool = True) -> Dict[str, dict]:
+        """Fetch several report bundles with a single GraphQL request.
+
+        Cached reports are served from the cache; the remaining codes are packed
+        into one document using aliases (``r0: report(code: $c0)``) and the
+        response is split back per code and cached individually. Any GraphQL
+        error fails the whole batch, so callers wanting per-report isolation
+        should fall back to :meth:`fetch_report_bundle`.
+        """
 
+        reports = self.cached_report_bundles(codes)
+        misses = [code for code in dict.fromkeys(codes) if code not in reports]
+        if not misses:
+            return reports
 
-def flush_cache(redis_url: str, prefix: str) -> int:
-    """Delete cached WCL reports with the given prefix."""
-    r = redis.from_url(redis_url)
-    keys = list(r.scan_iter(f"{prefix}*"))
-    if keys:
-        r.delete(*keys)
-    return len(keys)
+        logger.info("Fetching WCL report bundles", extra={"codes": misses})
+        var_defs = "".join(f", $c{i}: String!" for i in range(len(misses)))
+        selections = "\n".join(
+            f"    r{i}: report(code: $c{i}) {{{_REPORT_BUNDLE_FIELDS}}}" for i in range(len(misses))
+        )
+        q = (
+            f"query ReportBundles($translate: Boolean = true{var_defs}) {{\n"
+            f"  reportData {{\n{selections}\n  }}\n"
+            f"  {self._rate_limit_selection()}\n"
+            "}\n"
+        )
+        variables: Dict[str, Any] = {"translate": translate}
+        variables.update({f"c{i}": code for i, code in enumerate(misses)})
+        data = self._post(q, variables)["data"]["reportData"]
+        for i, code in enumerate(misses):
+            report = data.get(f"r{i}")
+            if not report:
+                raise RuntimeError(f"WCL response missing report {code}")
+            self._cache_report(code, report)
+            reports[code] = report
+        return {code: reports[code] for code in dict.fromkeys(codes)}
+
+
+_CLIENTS: Dict[tuple, WCLClient] = {}
+_CLIENTS_LOCK = threading.Lock()
+
+
+def get_shared_client(s: "Settings") -> WCLClient:
+    """Return the process-wide :class:`WCLClient` for the configured credentials.
+
+    Clients are keyed by credentials, endpoints and cache location so the
+    ``loop`` command keeps its HTTP connection pool and access token across
+    iterations, while a settings change that touches any of those values gets a
+    fresh client.
+    """
+
+    key = (
+        s.wcl.client_id,
+        s.wcl.client_secret,
+        s.wcl.base_url,
+        s.wcl.token_url,
+        s.redis.url,
+        s.redis.key_prefix,
+        s.redis.codec,
+        s.cache.backend,
+        s.cache.disk_path,
+        s.cache.stale_ttl_seconds,
+        s.wcl.share_token,
+        s.wcl.memory_cache_entries,
+        s.wcl.memory_cache_seconds,
+    )
+    with _CLIENTS_LOCK:
+        client = _CLIENTS.get(key)
+        if client is None:
+            client = WCLClient(
+                s.wcl.client_id,
+                s.wcl.client_secret,
+                base_url=s.wcl.base_url,
+                token_url=s.wcl.token_url,
+                cache_backend=build_cache_backend(s),
+                cache_prefix=s.redis.key_prefix,
+                share_token=s.wcl.share_token,
+                cache_codec=s.redis.codec,
+                memory_cache_entries=s.wcl.memory_cache_entries,
+                memory_cache_seconds=s.wcl.memory_cache_seconds,
+                stale_ttl=s.cache.stale_ttl_seconds,
+                rate_limit_budget=RateLimitBudget(
+                    reserve_fraction=s.wcl.rate_limit_reserve_fraction,
+                    refresh_interval=s.wcl.rate_limit_refresh_seconds,
+                ),
+            )
+            _CLIENTS[key] = client
+        else:
+            client.budget.reserve_fraction = s.wcl.rate_limit_reserve_fraction
+            client.budget.refresh_interval = s.wcl.rate_limit_refresh_seconds
+        return client
+
+
+def clear_shared_clients() -> None:
+    with _CLIENTS_LOCK:
+        _CLIENTS.clear()
+
+
+def _as_backend(cache: CacheBackend | str) -> CacheBackend:
+    if isinstance(cache, CacheBackend):
+        return cache
+    return RedisCacheBackend.from_url(cache)
+
+
+def flush_cache(cache: CacheBackend | str, prefix: str) -> int:
+    """Delete cached WCL reports with the given prefix.
+
+    ``cache`` is a backend or, for backwards compatibility, a Redis URL. The
+    shared OAuth token under the same prefix is kept.
+    """
+    backend = _as_backend(cache)
+    return backend.delete([key for key in backend.scan(prefix) if _is_report_key(key, prefix)])
+
+
+def _is_report_key(key: bytes | str, prefix: str) -> bool:
+    if isinstance(key, bytes):
+        key = key.decode("utf-8", "replace")
+    return key.startswith(prefix) and not key[len(prefix) :].startswith("oauth:")
+
+
+def cache_stats(cache: CacheBackend | str, prefix: str) -> dict:
+    """Summarize cached WCL reports under ``prefix``.
+
+    Returns the key count, stored bytes, the size of the same entries as plain
+    JSON and the resulting compression ratio, plus a per-codec key count so
+    leftover legacy entries are visible.
+    """
+
+    backend = _as_backend(cache)
+    keys = [key for key in backend.scan(prefix) if _is_report_key(key, prefix)]
+    stored_bytes = 0
+    raw_bytes = 0
+    codecs: Dict[str, int] = {}
+    for i in range(0, len(keys), 100):
+        chunk = keys[i : i + 100]
+        for value in backend.get_many(chunk):
+            if value is None:
+                continue  # expired between scan and read
+            stored_bytes += len(value)
+            try:
+                codec, payload, _, _ = _decode_payload(value)
+            except (ValueError, zlib.error):
+                codec, payload = "unreadable", b""
+            codecs[codec] = codecs.get(codec, 0) + 1
+            raw_bytes += len(payload)
+    ratio = round(raw_bytes / stored_bytes, 2) if stored_bytes else None
+    return {
+        "keys": sum(codecs.values()),
+        "stored_bytes": stored_bytes,
+        "raw_bytes": raw_bytes,
+        "compression_ratio": ratio,
+        "codecs": codecs,
+    }
@@ -0,0 +1,321 @@
+"""Local stand-in for the Warcraft Logs API used by offline benchmarks.
+
+:class:`WCLStandin` serves the OAuth token endpoint and the GraphQL endpoint
+from recorded report bundles (the ``reportData.report`` objects returned by
+:meth:`WCLClient.fetch_report_bundle`). It understands the handful of query
+shapes the client sends — single and aliased ``report(code: $x)`` selections,
+``fights(fightIDs:)``, paginated ``events`` and ``rateLimitData`` — without
+parsing GraphQL, and can add latency, jitter, HTTP 429/5xx responses and
+rate-limit headers so concurrency, retry and caching changes can be measured
+reproducibly. A recording's optional ``events`` list (report-relative
+``timestamp`` and ``fight`` per event) is served only to ``events`` queries.
+"""
+
+from __future__ import annotations
+
+import copy
+import json
+import logging
+import random
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, Mapping, Optional
+
+logger = logging.getLogger(__name__)
+
+TOKEN_PATH = "/oauth/token"
+GRAPHQL_PATH = "/api/v2/client"
+
+_ALIASED_REPORT_RE = re.compile(r"(\w+)\s*:\s*report\(code:\s*\$(\w+)\)")
+_REPORT_RE = re.compile(r"\breport\(code:\s*\$(\w+)\)")
+
+
+@dataclass
+class StandinOptions:
+    latency_ms: float = 0.0
+    jitter_ms: float = 0.0
+    error_rate_429: float = 0.0
+    error_rate_5xx: float = 0.0
+    limit_per_hour: int = 3600
+    # Answer ``rateLimitData`` with null, leaving only the rate-limit headers.
+    null_rate_limit_data: bool = False
+    seed: Optional[int] = None
+
+
+@dataclass
+class StandinStats:
+    token_requests: int = 0
+    graphql_requests: int = 0
+    throttled: int = 0
+    server_errors: int = 0
+    points_spent: int = 0
+    reports_served: int = 0
+    missing_reports: Dict[str, int] = field(default_factory=dict)
+
+    def as_dict(self) -> dict:
+        return {
+            "token_requests": self.token_requests,
+            "graphql_requests": self.graphql_requests,
+            "throttled": self.throttled,
+            "server_errors": self.server_errors,
+            "points_spent": self.points_spent,
+            "reports_served": self.reports_served,
+            "missing_reports": dict(self.missing_reports),
+        }
+
+
+def load_recordings(path: str | Path) -> Dict[str, dict]:
+    """Load recorded bundles from a directory of ``<code>.json`` files or one JSON map."""
+
+    p = Path(path)
+    if p.is_dir():
+        recordings: Dict[str, dict] = {}
+        for f in sorted(p.glob("*.json")):
+            bundle = json.loads(f.read_text(encoding="utf-8"))
+            recordings[bundle.get("code") or f.stem] = bundle
+        return recordings
+    data = json.loads(p.read_text(encoding="utf-8"))
+    if not isinstance(data, dict):
+        raise ValueError(f"{p} must contain a JSON object mapping report codes to bundles")
+    return data
+
+
+def save_recording(directory: str | Path, code: str, bundle: dict) -> Path:
+    """Write ``bundle`` as ``<directory>/<code>.json`` for :func:`load_recordings`."""
+
+    d = Path(directory)
+    d.mkdir(parents=True, exist_ok=True)
+    out = d / f"{code}.json"
+    out.write_text(json.dumps({**bundle, "code": code}, indent=1), encoding="utf-8")
+    return out
+
+
+class WCLStandin:
+    """Threaded HTTP server replaying recorded WCL responses.
+
+    Use as a context manager, or call :meth:`start` and :meth:`stop`. Point a
+    client at :attr:`base_url` and :attr:`token_url`.
+    """
+
+    def __init__(
+        self,
+        recordings: Mapping[str, dict],
+        options: Optional[StandinOptions] = None,
+        *,
+        host: str = "127.0.0.1",
+        port: int = 0,
+    ):
+        self.recordings = dict(recordings)
+        self.options = options or StandinOptions()
+        self.stats = StandinStats()
+        self._rng = random.Random(self.options.seed)
+        self._lock = threading.Lock()
+        self._window_started = time.time()
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def base_url(self) -> str:
+        return self.url + GRAPHQL_PATH
+
+    @property
+    def token_url(self) -> str:
+        return self.url + TOKEN_PATH
+
+    def start(self) -> "WCLStandin":
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._server.serve_forever, name="wcl-standin", daemon=True
+            )
+            self._thread.start()
+            logger.info("WCL stand-in listening", extra={"url": self.url})
+        return self
+
+    def stop(self) -> None:
+        if self._thread is not None:
+            self._server.shutdown()
+            self._thread.join()
+            self._thread = None
+        self._server.server_close()
+
+    def __enter__(self) -> "WCLStandin":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    # -- behaviour -----------------------------------------------------------------
+
+    def _delay(self) -> float:
+        with self._lock:
+            jitter = self._rng.uniform(-1.0, 1.0) * self.options.jitter_ms
+        return max(0.0, self.options.latency_ms + jitter) / 1000.0
+
+    def _injected_error(self) -> Optional[int]:
+        with self._lock:
+            roll = self._rng.random()
+        if roll < self.options.error_rate_429:
+            return 429
+        if roll < self.options.error_rate_429 + self.options.error_rate_5xx:
+            return 503
+        return None
+
+    def _rate_limit_data(self) -> Optional[dict]:
+        return None if self.options.null_rate_limit_data else self._rate_limit()
+
+    def _rate_limit(self) -> dict:
+        now = time.time()
+        with self._lock:
+            if now - self._window_started >= 3600:
+                self._window_started = now
+                self.stats.points_spent = 0
+            return {
+                "limitPerHour": self.options.limit_per_hour,
+                "pointsSpentThisHour": self.stats.points_spent,
+                "pointsResetIn": int(3600 - (now - self._window_started)),
+            }
+
+    def _report(self, code: Any, variables: dict) -> Optional[dict]:
+        bundle = self.recordings.get(code)
+        with self._lock:
+            if bundle is None:
+                self.stats.missing_reports[code] = self.stats.missing_reports.get(code, 0) + 1
+                return None
+            self.stats.reports_served += 1
+        report = copy.deepcopy(bundle)
+        report.pop("events", None)
+        fight_ids = variables.get("fightIDs")
+        if fight_ids is not None:
+            wanted = set(fight_ids)
+            report["fights"] = [f for f in report.get("fights") or [] if f.get("id") in wanted]
+        return report
+
+    def _events_page(self, code: Any, variables: dict) -> Optional[dict]:
+        """One ``events`` page of a recording, cut like WCL's ``nextPageTimestamp``."""
+
+        bundle = self.recordings.get(code)
+        if bundle is None:
+            with self._lock:
+                self.stats.missing_reports[code] = self.stats.missing_reports.get(code, 0) + 1
+            return None
+        start = float(variables.get("start") or 0)
+        end = float(variables.get("end") or 0)
+        fight_ids = variables.get("fightIDs")
+        wanted = set(fight_ids) if fight_ids is not None else None
+        events = [
+            ev
+            for ev in bundle.get("events") or []
+            if start <= float(ev.get("timestamp") or 0) < end and (wanted is None or ev.get("fight") in wanted)
+        ]
+        events.sort(key=lambda ev: float(ev.get("timestamp") or 0))
+        limit = max(1, int(variables.get("limit") or 10000))
+        page, rest = events[:limit], events[limit:]
+        return {
+            "events": {
+                "data": copy.deepcopy(page),
+                "nextPageTimestamp": rest[0]["timestamp"] if rest else None,
+            }
+        }
+
+    def resolve(self, query: str, variables: Optional[dict] = None) -> dict:
+        """Build the GraphQL response body for ``query``."""
+
+        variables = variables or {}
+        selections = _ALIASED_REPORT_RE.findall(query)
+        if not selections:
+            m = _REPORT_RE.search(query)
+            selections = [("report", m.group(1))] if m else []
+        if not selections and "rateLimitData" in query:
+            return {"data": {"rateLimitData": self._rate_limit_data()}}
+        report_data: Dict[str, Any] = {}
+        errors = []
+        events_query = "events(" in query
+        for alias, var in selections:
+            code = variables.get(var)
+            if events_query:
+                report_data[alias] = self._events_page(code, variables)
+            else:
+                report_data[alias] = self._report(code, variables)
+            if report_data[alias] is None:
+                errors.append({"message": "This report does not exist.", "path": ["reportData", alias]})
+        with self._lock:
+            self.stats.points_spent += max(1, len(selections))
+        body: Dict[str, Any] = {"data": {"reportData": report_data}}
+        if "rateLimitData" in query:
+            body["data"]["rateLimitData"] = self._rate_limit_data()
+        if errors:
+            body["errors"] = errors
+        return body
+
+    def _handler_class(self):
+        standin = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, fmt, *args):  # route through logging, quietly
+                logger.debug("WCL stand-in " + fmt, *args)
+
+            def _send(self, status: int, body: dict, headers: Optional[dict] = None) -> None:
+                raw = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(raw)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, str(value))
+                self.end_headers()
+                self.wfile.write(raw)
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                raw = self.rfile.read(length) if length else b""
+                time.sleep(standin._delay())
+                if self.path == TOKEN_PATH:
+                    with standin._lock:
+                        standin.stats.token_requests += 1
+                    self._send(
+                        200,
+                        {"access_token": "standin-token", "token_type": "Bearer", "expires_in": 3600},
+                    )
+                    return
+                if self.path != GRAPHQL_PATH:
+                    self._send(404, {"error": "not found"})
+                    return
+                with standin._lock:
+                    standin.stats.graphql_requests += 1
+                status = standin._injected_error()
+                limits = standin._rate_limit()
+                headers = {
+                    "X-RateLimit-Limit": limits["limitPerHour"],
+                    "X-RateLimit-Remaining": max(0, limits["limitPerHour"] - limits["pointsSpentThisHour"]),
+                    "X-RateLimit-Reset": limits["pointsResetIn"],
+                }
+                if status == 429:
+                    with standin._lock:
+                        standin.stats.throttled += 1
+                    self._send(429, {"error": "Too Many Requests"}, {**headers, "Retry-After": 1})
+                    return
+                if status is not None:
+                    with standin._lock:
+                        standin.stats.server_errors += 1
+                    self._send(status, {"error": "Service Unavailable"}, headers)
+                    return
+                try:
+                    payload = json.loads(raw or b"{}")
+                except ValueError:
+                    self._send(400, {"error": "invalid JSON"})
+                    return
+                body = standin.resolve(payload.get("query") or "", payload.get("variables") or {})
+                self._send(200, body, headers)
+
+        return Handler
@@ -1,8 +1,13 @@
 from __future__ import annotations
-from typing import List
+from typing import Iterable, List, Optional
 from datetime import datetime, timedelta
 import logging
 
+from pymongo import ReplaceOne, UpdateOne
+from pymongo.errors import OperationFailure
+
+from .mongo_client import publish_collection
+from .pipeline_context import PipelineContext
 from .utils.time import PT
 
 logger = logging.getLogger(__name__)
@@ -22,8 +27,162 @@ def week_id_from_night_id(night_id: str) -> str:
     return tuesday.strftime("%Y-%m-%d")
 
 
-def materialize_week_totals(db, *, include_docs: bool = False) -> int | tuple[int, list[dict]]:
-    nights = list(db["bench_night_totals"].find({}, {"_id": 0}))
+def _week_end(week_id: str) -> str:
+    return (datetime.strptime(week_id, "%Y-%m-%d") + timedelta(days=6)).strftime("%Y-%m-%d")
+
+
+def _merge_unsupported(exc: Exception) -> bool:
+    # mongomock has no $merge; servers before 4.2 reject the stage by name.
+    return isinstance(exc, NotImplementedError) or getattr(exc, "code", None) == 40324
+
+
+def merge_week_totals(db, nights: Iterable[str], roster: Iterable[dict]) -> int:
+    """Refresh ``bench_week_totals`` for the game weeks containing ``nights``.
+
+    An aggregation over ``bench_night_totals`` assigns each night of those
+    weeks to its game week (night ids are PT dates, so a week is a string
+    range), sums the totals and ``$merge``s them into ``bench_week_totals``.
+    Rostered mains are padded into those weeks and rows a full rebuild would
+    not produce are removed; other weeks are left as they are. Returns the
+    number of documents in the refreshed weeks.
+    """
+
+    weeks = sorted({week_id_from_night_id(night) for night in nights})
+    if not weeks:
+        return 0
+    ranges = [(week, _week_end(week)) for week in weeks]
+    match = {"$match": {"$or": [{"night_id": {"$gte": start, "$lte": end}} for start, end in ranges]}}
+    key = {
+        "game_week": {
+            "$switch": {
+                "branches": [
+                    {
+                        "case": {"$and": [{"$gte": ["$night_id", start]}, {"$lte": ["$night_id", end]}]},
+                        "then": start,
+                    }
+                    for start, end in ranges
+                ],
+                "default": None,
+            }
+        },
+        "main": "$main",
+    }
+
+    # Rows the refresh produces, per week; rostered mains pad those weeks.
+    expected: dict = {}
+    for row in db["bench_night_totals"].aggregate([match, {"$group": {"_id": key}}]):
+        expected.setdefault(row["_id"]["game_week"], set()).add(row["_id"]["main"])
+    produced = {(wk, main) for wk, mains in expected.items() for main in mains}
+    for row in roster:
+        main = row.get("main")
+        if not main or row.get("active") is False:
+            continue
+        join_wk = week_id_from_night_id(row.get("join_night") or "1970-01-01")
+        leave_wk = week_id_from_night_id(row.get("leave_night") or "9999-12-31")
+        for wk, mains in expected.items():
+            if join_wk <= wk <= leave_wk:
+                mains.add(main)
+
+    updated_at = datetime.utcnow()
+    pipeline = [
+        match,
+        {
+            "$group": {
+                "_id": key,
+                "played_min": {
+                    "$sum": {
+                        "$add": [
+                            {"$ifNull": ["$played_pre_min", 0]},
+                            {"$ifNull": ["$played_post_min", 0]},
+                        ]
+                    }
+                },
+                "bench_pre_min": {"$sum": "$bench_pre_min"},
+                "bench_post_min": {"$sum": "$bench_post_min"},
+            }
+        },
+        {
+            "$project": {
+                "_id": 0,
+                "game_week": "$_id.game_week",
+                "main": "$_id.main",
+                "played_min": 1,
+                "bench_min": {"$add": ["$bench_pre_min", "$bench_post_min"]},
+                "bench_pre_min": 1,
+                "bench_post_min": 1,
+                "updated_at": {"$literal": updated_at},
+            }
+        },
+    ]
+    merge = {
+        "$merge": {
+            "into": "bench_week_totals",
+            "on": ["game_week", "main"],
+            "whenMatched": "replace",
+            "whenNotMatched": "insert",
+        }
+    }
+    try:
+        list(db["bench_night_totals"].aggregate(pipeline + [merge]))
+    except (NotImplementedError, OperationFailure) as exc:
+        if not _merge_unsupported(exc):
+            raise
+        ops = [
+            ReplaceOne({"game_week": row["game_week"], "main": row["main"]}, row, upsert=True)
+            for row in db["bench_night_totals"].aggregate(pipeline)
+        ]
+        if ops:
+            db["bench_week_totals"].bulk_write(ops, ordered=False)
+
+    zeros = {"played_min": 0, "bench_min": 0, "bench_pre_min": 0, "bench_post_min": 0, "updated_at": updated_at}
+    padding = [
+        UpdateOne({"game_week": wk, "main": main}, {"$set": zeros}, upsert=True)
+        for wk in sorted(expected)
+        for main in sorted(expected[wk])
+        if (wk, main) not in produced
+    ]
+    if padding:
+        db["bench_week_totals"].bulk_write(padding, ordered=False)
+    db["bench_week_totals"].delete_many(
+        {"$or": [{"game_week": wk, "main": {"$nin": sorted(expected.get(wk, ()))}} for wk in weeks]}
+    )
+    return sum(len(mains) for mains in expected.values())
+
+
+def materialize_week_totals(
+    db,
+    *,
+    include_docs: bool = False,
+    context: Optional[PipelineContext] = None,
+    publish_mode: str = "replace",
+    changed_nights: Optional[Iterable[str]] = None,
+) -> int | tuple[int, list[dict]]:
+    """Rebuild ``bench_week_totals`` from the nightly bench totals.
+
+    With ``context`` the nightly totals and roster come from memory and the
+    written documents are kept on it for :func:`materialize_rankings`.
+    ``publish_mode`` is passed to :func:`pebble.mongo_client.publish_collection`.
+
+    With ``changed_nights`` only the weeks containing those nights are
+    refreshed, in place, by :func:`merge_week_totals`. Without a ``context``
+    the count is then that of the refreshed weeks and the returned documents
+    are read back from the collection.
+    """
+
+    if changed_nights is not None:
+        roster = context.team_roster if context is not None else list(db["team_roster"].find({}, {"_id": 0}))
+        merged = merge_week_totals(db, changed_nights, roster)
+        if context is None:
+            if include_docs:
+                return merged, list(
+                    db["bench_week_totals"].find({}, {"_id": 0}).sort([("game_week", 1), ("main", 1)])
+                )
+            return merged
+
+    if context is not None:
+        nights = context.bench_night_docs()
+    else:
+        nights = list(db["bench_night_totals"].find({}, {"_id": 0}))
     # group by (game_week, main)
     from collections import defaultdict
 
@@ -47,7 +206,7 @@ def materialize_week_totals(db, *, include_docs: bool = False) -> int | tuple[in
         agg[key]["bench"] = agg[key]["bench_pre"] + agg[key]["bench_post"]
 
     # Include roster mains active during observed weeks even if they didn't play
-    roster = list(db["team_roster"].find({}, {"_id": 0}))
+    roster = context.team_roster if context is not None else list(db["team_roster"].find({}, {"_id": 0}))
     for row in roster:
         main = row.get("main")
         if not main or row.get("active") is False:
@@ -85,9 +244,10 @@ def materialize_week_totals(db, *, include_docs: bool = False) -> int | tuple[in
             }
         )
 
-    db["bench_week_totals"].delete_many({})
-    if docs:
-        db["bench_week_totals"].insert_many(docs)
+    if changed_nights is None:
+        publish_collection(db, "bench_week_totals", docs, mode=publish_mode)
+    if context is not None:
+        context.bench_week_totals = docs
 
     count = len(docs)
     if include_docs:
@@ -104,13 +264,29 @@ def _latest_night_id(db) -> str | None:
     return latest.get("night_id")
 
 
-def materialize_rankings(db, *, include_docs: bool = False) -> int | tuple[int, list[dict]]:
-    """Materialize season-to-date bench rankings ordered by bench minutes."""
+def materialize_rankings(
+    db,
+    *,
+    include_docs: bool = False,
+    context: Optional[PipelineContext] = None,
+    publish_mode: str = "replace",
+) -> int | tuple[int, list[dict]]:
+    """Materialize season-to-date bench rankings ordered by bench minutes.
+
+    With a ``context`` that went through :func:`materialize_week_totals`
+    the week totals are summed in memory instead of aggregated in Mongo.
+    """
 
-    latest_night = _latest_night_id(db)
+    in_memory = context is not None and context.bench_week_totals is not None
+    if in_memory:
+        latest_night = context.latest_bench_night()
+        roster_rows = context.team_roster
+    else:
+        latest_night = _latest_night_id(db)
+        roster_rows = db["team_roster"].find({}, {"_id": 0, "main": 1, "active": 1, "leave_night": 1})
 
     roster_mains = set()
-    for row in db["team_roster"].find({}, {"_id": 0, "main": 1, "active": 1, "leave_night": 1}):
+    for row in roster_rows:
         main = row.get("main")
         if not main:
             continue
@@ -124,7 +300,7 @@ def materialize_rankings(db, *, include_docs: bool = False) -> int | tuple[int,
         roster_mains.add(main)
 
     if not roster_mains:
-        db["bench_rankings"].delete_many({})
+        publish_collection(db, "bench_rankings", [], mode=publish_mode)
         if include_docs:
             return 0, []
         return 0
@@ -140,7 +316,17 @@ def materialize_rankings(db, *, include_docs: bool = False) -> int | tuple[int,
         },
         {"$sort": {"bench_min": 1, "_id": 1}},
     ]
-    rows: List[dict] = list(db["bench_week_totals"].aggregate(pipeline))
+    if in_memory:
+        totals: dict = {}
+        for doc in context.bench_week_totals:
+            if doc["main"] not in roster_mains:
+                continue
+            t = totals.setdefault(doc["main"], {"_id": doc["main"], "bench_min": 0, "played_min": 0})
+            t["bench_min"] += doc.get("bench_min", 0)
+            t["played_min"] += doc.get("played_min", 0)
+        rows: List[dict] = sorted(totals.values(), key=lambda r: (r["bench_min"], r["_id"]))
+    else:
+        rows = list(db["bench_week_totals"].aggregate(pipeline))
 
     docs = []
     for idx, r in enumerate(rows, start=1):
@@ -162,9 +348,7 @@ def materialize_rankings(db, *, include_docs: bool = False) -> int | tuple[int,
             }
         )
 
-    db["bench_rankings"].delete_many({})
-    if docs:
-        db["bench_rankings"].insert_many(docs)
+    publish_collection(db, "bench_rankings", docs, mode=publish_mode)
 
     count = len(docs)
     if include_docs:
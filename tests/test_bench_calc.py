@@ -201,3 +201,15 @@ def test_last_non_mythic_boss_mains_excludes_trash():
     roster_map = {"Alt-Illidan": "Main-Illidan"}
     mains = last_non_mythic_boss_mains(fights_all, mythic_start_ms=2000, roster_map=roster_map)
     assert mains == {"Main-Illidan"}
+
+
+def test_last_non_mythic_boss_mains_prefers_first_of_tied_pulls():
+    fights = [
+        {"encounter_id": 1, "is_mythic": False, "fight_abs_start_ms": 100, "participants": [{"name": "A"}]},
+        {"encounter_id": 2, "is_mythic": False, "fight_abs_start_ms": 300, "participants": [{"name": "B"}]},
+        {"encounter_id": 3, "is_mythic": False, "fight_abs_start_ms": 300, "participants": [{"name": "C"}]},
+        {"encounter_id": 4, "is_mythic": False, "fight_abs_start_ms": 900, "participants": [{"name": "D"}]},
+        {"encounter_id": 5, "is_mythic": True, "fight_abs_start_ms": 500, "participants": [{"name": "E"}]},
+    ]
+    assert last_non_mythic_boss_mains(fights, 500) == {"B"}
+    assert last_non_mythic_boss_mains(fights, 100) == set()
@@ -0,0 +1,102 @@
+import random
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from pebble.bench_calc import bench_minutes_for_night
+from pebble.bench_calc_numpy import (
+    BenchNight,
+    bench_minutes_for_night_numpy,
+    bench_minutes_for_nights,
+)
+
+MAINS = [f"Main{i}" for i in range(12)]
+ALTS = {"Alt0": "Main0", "Alt1": "Main1"}
+
+
+def _random_night(rng):
+    pre_ms = rng.randint(0, 120) * 60000 + rng.randint(0, 59999)
+    post_ms = rng.randint(0, 120) * 60000 + rng.randint(0, 59999)
+    blocks = []
+    for _ in range(rng.randint(0, 30)):
+        start = rng.randint(0, 3_600_000)
+        blocks.append(
+            {
+                "main": rng.choice(MAINS + list(ALTS)),
+                "half": rng.choice(["pre", "post"]),
+                "start_ms": start,
+                "end_ms": start + rng.randint(0, 3_600_000),
+            }
+        )
+    overrides = {}
+    for main in rng.sample(MAINS, rng.randint(0, 5)):
+        overrides[main] = {
+            half: rng.choice([None, True, False, 0, rng.randint(1, 200), -rng.randint(1, 200), "x"])
+            for half in ("pre", "post")
+            if rng.random() < 0.8
+        }
+    return BenchNight(
+        blocks=blocks,
+        pre_ms=pre_ms,
+        post_ms=post_ms,
+        overrides=overrides,
+        last_fight_mains=set(rng.sample(MAINS, rng.randint(0, 4))),
+        roster_map=ALTS if rng.random() < 0.5 else {},
+        pre_extension_ms=rng.choice([0, -5, rng.randint(1, 900_000)]),
+        pre_extension_mains=set(rng.sample(MAINS, rng.randint(0, 6))),
+        post_extension_ms=rng.choice([0, rng.randint(1, 900_000)]),
+        post_extension_mains=set(rng.sample(MAINS, rng.randint(0, 6))),
+    )
+
+
+def _scalar(night):
+    return bench_minutes_for_night(
+        night.blocks,
+        night.pre_ms,
+        night.post_ms,
+        overrides=night.overrides,
+        last_fight_mains=night.last_fight_mains,
+        roster_map=night.roster_map,
+        pre_extension_ms=night.pre_extension_ms,
+        pre_extension_mains=night.pre_extension_mains,
+        post_extension_ms=night.post_extension_ms,
+        post_extension_mains=night.post_extension_mains,
+    )
+
+
+def _assert_same(got, expected):
+    assert got == expected
+    for g, e in zip(got, expected):
+        for key, value in e.items():
+            assert type(g[key]) is type(value), key
+
+
+def test_numpy_engine_matches_scalar_per_night():
+    rng = random.Random(3)
+    for _ in range(300):
+        night = _random_night(rng)
+        got = bench_minutes_for_night_numpy(
+            night.blocks,
+            night.pre_ms,
+            night.post_ms,
+            overrides=night.overrides,
+            last_fight_mains=night.last_fight_mains,
+            roster_map=night.roster_map,
+            pre_extension_ms=night.pre_extension_ms,
+            pre_extension_mains=night.pre_extension_mains,
+            post_extension_ms=night.post_extension_ms,
+            post_extension_mains=night.post_extension_mains,
+        )
+        _assert_same(got, _scalar(night))
+
+
+def test_numpy_engine_matches_scalar_over_batched_nights():
+    rng = random.Random(5)
+    nights = [_random_night(rng) for _ in range(60)]
+    nights.append(BenchNight(blocks=[], pre_ms=0, post_ms=0))
+    results = bench_minutes_for_nights(nights)
+    assert len(results) == len(nights)
+    for night, got in zip(nights, results):
+        _assert_same(got, _scalar(night))
+    assert results[-1] == []
+    assert bench_minutes_for_nights([]) == []
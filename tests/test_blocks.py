@@ -93,3 +93,88 @@ def test_long_gap_does_not_split_blocks():
     assert len(blocks) == 1
     assert blocks[0]["start_ms"] == 0
     assert blocks[0]["end_ms"] == 11 * 60 * 1000 + 2000
+
+
+def test_boss_index_matches_linear_scan():
+    import random
+
+    from pebble.bench import _linear_has_nm_boss_between, synthetic_night
+    from pebble.boss_index import BossIntervalIndex
+
+    fights, _ = synthetic_night(120, 1, non_mythic_share=0.3, seed=7)
+    index = BossIntervalIndex(fights)
+    rng = random.Random(7)
+    lo = fights[0]["fight_abs_start_ms"] - 60_000
+    hi = fights[-1]["fight_abs_end_ms"] + 60_000
+    for _ in range(2000):
+        s = rng.randint(lo, hi)
+        e = s + rng.randint(0, 3_600_000)
+        assert index.has_non_mythic_within(s, e) == _linear_has_nm_boss_between(fights, s, e)
+
+
+def test_bench_blocks_reports_index_and_linear_timings():
+    from pebble.bench import bench_blocks
+
+    res = bench_blocks(pulls=40, mains=5, iterations=1)
+    assert res["pulls"] == 40
+    assert res["gap_queries"] > 0
+    assert res["blocks"] >= 5
+    assert res["index_queries_ms"] >= 0 and res["linear_queries_ms"] >= 0
+    assert res["fused_blocks_ms"] >= 0 and res["participation_blocks_ms"] >= 0
+
+
+def test_blocks_from_fights_match_participation_rows():
+    import random
+
+    from pebble.blocks import build_blocks_from_fights
+    from pebble.boss_index import BossIntervalIndex
+    from pebble.participation import build_mythic_participation
+    from pebble.utils.names import NameResolver
+
+    rng = random.Random(11)
+    resolver = NameResolver(["Alice", "Bob", "Cara"], {"Alt-Realm": "Alice"})
+    names = ["Alice-Realm", "Bob-Realm", "Cara-Realm", "Alt-Realm", "Stray-Realm"]
+    for trial in range(30):
+        t = 1_704_164_400_000
+        fights, presence = [], []
+        for i in range(40):
+            # Overlapping and equal starts exercise the tie order.
+            start = t + rng.randint(-60, 120) * 1000
+            end = start + rng.randint(60, 360) * 1000
+            t = max(t, end)
+            fight = {
+                "night_id": "2024-01-01",
+                "report_code": "R",
+                "id": i + 1,
+                "encounter_id": 3000 + i % 4,
+                "difficulty": 5,
+                "is_mythic": rng.random() >= 0.2,
+                "fight_abs_start_ms": start,
+                "fight_abs_end_ms": end,
+                "start_rounded_ms": start,
+                "end_rounded_ms": end,
+                "participants": [{"name": n} for n in names if rng.random() >= 0.3],
+            }
+            if fight["is_mythic"] and rng.random() < 0.3:
+                fight["has_presence"] = True
+                for p in fight["participants"]:
+                    s = start
+                    while s < end:
+                        e = min(end, s + rng.randint(10, 90) * 1000)
+                        presence.append(
+                            {"name": p["name"], "start_ms": s, "end_ms": e,
+                             **{k: fight[k] for k in ("encounter_id", "difficulty", "start_rounded_ms", "end_rounded_ms")}}
+                        )
+                        s = e + rng.randint(0, 60) * 1000
+            fights.append(fight)
+        fights_m = [f for f in fights if f["is_mythic"]]
+        mid = fights[20]["fight_abs_start_ms"]
+        break_range = (mid, mid + 600_000) if trial % 2 else None
+        index = BossIntervalIndex(fights)
+        for res in (None, resolver):
+            rows = build_mythic_participation(fights_m, resolver=res, presence=presence)
+            expected = build_blocks(rows, break_range=break_range, boss_index=index)
+            got = build_blocks_from_fights(
+                fights_m, break_range=break_range, resolver=res, presence=presence, fights_all=fights
+            )
+            assert got == expected
@@ -0,0 +1,181 @@
+import mongomock
+import pytest
+from pymongo.errors import BulkWriteError
+
+from pebble.mongo_client import BulkWriter, ensure_indexes, find_by_night, publish_collection, publish_nights
+
+
+class CountingDB:
+    def __init__(self):
+        self.db = mongomock.MongoClient().db
+        self.calls = []
+
+    def __getitem__(self, name):
+        coll = self.db[name]
+        calls = self.calls
+
+        class Wrapped:
+            def bulk_write(self, ops, ordered=True):
+                calls.append((name, len(ops), ordered))
+                return coll.bulk_write(ops, ordered=ordered)
+
+        return Wrapped()
+
+
+def test_bulk_writer_batches_per_collection_and_counts():
+    db = CountingDB()
+    writer = BulkWriter(db, batch_size=2)
+    for i in range(3):
+        writer.update_one("fights_all", {"id": i}, {"$set": {"id": i}}, upsert=True)
+    writer.update_one("reports", {"code": "A"}, {"$set": {"code": "A"}}, upsert=True)
+    assert db.calls == []
+
+    writer.flush()
+    writer.update_one("fights_all", {"id": 0}, {"$set": {"kill": True}})
+    writer.flush()
+
+    assert db.calls == [("fights_all", 2, False), ("fights_all", 1, False), ("reports", 1, False), ("fights_all", 1, False)]
+    assert writer.counts() == {
+        "fights_all": {"ops": 4, "batches": 3, "matched": 1, "modified": 1, "upserted": 3},
+        "reports": {"ops": 1, "batches": 1, "matched": 0, "modified": 0, "upserted": 1},
+    }
+    assert db.db["fights_all"].count_documents({}) == 3
+
+
+def test_bulk_writer_flushes_early_past_byte_budget():
+    db = CountingDB()
+    writer = BulkWriter(db, batch_size=100, max_bytes=200)
+    writer.update_one("actors", {"id": 1}, {"$set": {"name": "x" * 50}}, upsert=True)
+    assert writer.pending == 1
+    writer.update_one("actors", {"id": 2}, {"$set": {"name": "y" * 150}}, upsert=True)
+
+    assert writer.pending == 0
+    assert db.calls == [("actors", 2, False)]
+
+
+def test_bulk_writer_maps_failed_ops_to_tags():
+    db = mongomock.MongoClient().db
+    db["fights_all"].create_index([("report_code", 1), ("id", 1)], unique=True)
+    db["fights_all"].insert_one({"report_code": "B", "id": 1, "key": 0})
+    writer = BulkWriter(db)
+    writer.update_one("fights_all", {"key": 1}, {"$set": {"report_code": "A", "id": 1}}, upsert=True, tag="A")
+    writer.update_one("fights_all", {"key": 2}, {"$set": {"report_code": "B", "id": 1}}, upsert=True, tag="B")
+    writer.update_one("fights_all", {"key": 3}, {"$set": {"report_code": "C", "id": 1}}, upsert=True, tag="C")
+
+    writer.flush()
+
+    assert writer.failed_tags == {"B"}
+    assert writer.counts()["fights_all"]["batches"] == 1
+    assert sorted(d["report_code"] for d in db["fights_all"].find()) == ["A", "B", "C"]
+
+    writer.update_one("fights_all", {"key": 4}, {"$set": {"report_code": "A", "id": 1}}, upsert=True)
+    with pytest.raises(BulkWriteError):
+        writer.flush()
+
+
+def test_find_by_night_groups_one_sorted_cursor():
+    db = mongomock.MongoClient().db
+    db["fights_all"].insert_many(
+        [
+            {"night_id": "2024-07-11", "id": 1},
+            {"night_id": "2024-07-10", "id": 2},
+            {"night_id": "2024-07-11", "id": 3},
+            {"night_id": "2024-07-12", "id": 4},
+        ]
+    )
+
+    grouped = find_by_night(db, "fights_all", ["2024-07-11", "2024-07-10", "2024-07-09"], {"_id": 0})
+
+    assert grouped == {
+        "2024-07-10": [{"night_id": "2024-07-10", "id": 2}],
+        "2024-07-11": [{"night_id": "2024-07-11", "id": 1}, {"night_id": "2024-07-11", "id": 3}],
+    }
+    assert find_by_night(db, "fights_all", []) == {}
+
+
+def test_find_by_night_sorts_on_indexed_keys(monkeypatch):
+    db = mongomock.MongoClient().db
+    ensure_indexes(db)
+    sorts = []
+    original = mongomock.collection.Cursor.sort
+
+    def recording_sort(self, key_or_list, direction=None):
+        sorts.append(list(key_or_list))
+        return original(self, key_or_list, direction)
+
+    monkeypatch.setattr(mongomock.collection.Cursor, "sort", recording_sort)
+    find_by_night(db, "fights_all", ["2024-07-11"], {"_id": 0})
+    find_by_night(db, "bench_night_totals", ["2024-07-11"], {"_id": 0}, sort=[("main", 1)])
+    monkeypatch.undo()
+
+    indexed = {
+        name: [info["key"] for info in db[name].index_information().values()]
+        for name in ("fights_all", "bench_night_totals")
+    }
+    assert sorts == [[("night_id", 1)], [("night_id", 1), ("main", 1)]]
+    for name, sort in zip(("fights_all", "bench_night_totals"), sorts):
+        assert any(keys[: len(sort)] == sort for keys in indexed[name])
+
+
+def test_publish_nights_swap_matches_replace():
+    def seeded():
+        db = mongomock.MongoClient().db
+        db["blocks"].insert_many(
+            [
+                {"night_id": "2024-07-10", "main": "A", "half": "pre", "block_seq": 1},
+                {"night_id": "2024-07-11", "main": "A", "half": "pre", "block_seq": 1},
+                {"night_id": "2024-07-11", "main": "B", "half": "post", "block_seq": 1},
+            ]
+        )
+        return db
+
+    new_docs = [{"night_id": "2024-07-11", "main": "C", "half": "pre", "block_seq": 1}]
+    stored = {}
+    for mode in ("replace", "swap"):
+        db = seeded()
+        assert publish_nights(db, "blocks", ["2024-07-11"], [dict(d) for d in new_docs], mode=mode) == 1
+        stored[mode] = sorted(
+            (d["night_id"], d["main"]) for d in db["blocks"].find({}, {"_id": 0})
+        )
+
+    assert stored["swap"] == stored["replace"] == [("2024-07-10", "A"), ("2024-07-11", "C")]
+    assert db.list_collection_names() == ["blocks"]
+    assert "night_id_1_main_1_half_1_block_seq_1" in db["blocks"].index_information()
+
+
+def test_publish_collection_swap_replaces_everything():
+    db = mongomock.MongoClient().db
+    db["bench_rankings"].insert_many([{"main": "A", "rank": 1}, {"main": "B", "rank": 2}])
+
+    publish_collection(db, "bench_rankings", [{"main": "C", "rank": 1}], mode="swap")
+    assert list(db["bench_rankings"].find({}, {"_id": 0})) == [{"main": "C", "rank": 1}]
+    assert db["bench_rankings"].index_information()["main_1"]["unique"] is True
+
+    publish_collection(db, "bench_rankings", [], mode="swap")
+    assert list(db["bench_rankings"].find({})) == []
+    assert db.list_collection_names() == ["bench_rankings"]
+
+
+def test_publish_nights_swaps_only_when_most_nights_changed():
+    db = mongomock.MongoClient().db
+    db["blocks"].insert_many(
+        [{"night_id": f"2024-07-{day:02d}", "main": "A", "half": "pre", "block_seq": 1} for day in range(1, 11)]
+    )
+    copies = []
+    real_aggregate = db["blocks"].aggregate
+
+    def recording_aggregate(pipeline, *args, **kwargs):
+        copies.append(pipeline)
+        return real_aggregate(pipeline, *args, **kwargs)
+
+    db["blocks"].aggregate = recording_aggregate
+    doc = {"night_id": "2024-07-01", "main": "B", "half": "pre", "block_seq": 1}
+
+    publish_nights(db, "blocks", ["2024-07-01"], [dict(doc)], mode="swap", total_nights=10)
+    assert copies == []
+    assert db["blocks"].count_documents({}) == 10
+
+    nights = [f"2024-07-{day:02d}" for day in range(1, 6)]
+    publish_nights(db, "blocks", nights, [dict(doc)], mode="swap", total_nights=10)
+    assert len(copies) == 1
+    assert db["blocks"].count_documents({}) == 6
@@ -5,6 +5,7 @@ import mongomock
 import pytest
 
 import pebble.cli as cli
+import pebble.night_compute as night_compute
 from pebble.utils.time import PT, ms_to_pt_sheets, pt_time_to_ms
 
 
@@ -784,7 +785,7 @@ def test_run_pipeline_removes_stale_bench_entries(monkeypatch):
     monkeypatch.setattr(
         "pebble.cli.build_replace_values_requests", fake_build_requests
     )
-    monkeypatch.setattr("pebble.cli.bench_minutes_for_night", fake_bench_minutes)
+    monkeypatch.setattr("pebble.night_compute.bench_minutes_for_night", fake_bench_minutes)
     _setup_pipeline(monkeypatch, db, settings, _sheet_map(settings))
 
     cli.run_pipeline(settings, _fake_log())
@@ -792,8 +793,8 @@ def test_run_pipeline_removes_stale_bench_entries(monkeypatch):
     docs = list(db["bench_night_totals"].find({}, {"_id": 0}))
     assert {d["main"] for d in docs} == {"Alice-Illidan", "Bob-Illidan"}
 
-    # Second run should remove Bob's entry
-    cli.run_pipeline(settings, _fake_log())
+    # Second (full) run should remove Bob's entry
+    cli.run_pipeline(settings, _fake_log(), full_recompute=True)
 
     docs = list(db["bench_night_totals"].find({}, {"_id": 0}))
     assert {d["main"] for d in docs} == {"Alice-Illidan"}
@@ -895,7 +896,7 @@ def test_run_pipeline_refreshes_weekly_rankings(monkeypatch):
     monkeypatch.setattr(
         "pebble.cli.build_replace_values_requests", fake_build_requests
     )
-    monkeypatch.setattr("pebble.cli.bench_minutes_for_night", fake_bench_minutes)
+    monkeypatch.setattr("pebble.night_compute.bench_minutes_for_night", fake_bench_minutes)
     _setup_pipeline(monkeypatch, db, settings, _sheet_map(settings))
 
     cli.run_pipeline(settings, _fake_log())
@@ -1040,3 +1041,507 @@ def test_run_pipeline_batches_ingest_sheet_updates(monkeypatch):
         ]
     ]
     assert captured_requests == [{"requests": [{"updateCells": {"range": {"sheetId": 123}}}]}]
+
+
+def _insert_night(db, night_id, day, code, participants):
+    base = datetime(2024, 7, day, 19, 0, tzinfo=PT)
+    db["reports"].insert_one(
+        {
+            "night_id": night_id,
+            "code": code,
+            "start_ms": int(base.timestamp() * 1000),
+            "end_ms": int((base + timedelta(hours=4)).timestamp() * 1000),
+        }
+    )
+    db["fights_all"].insert_one(
+        {
+            "night_id": night_id,
+            "report_code": code,
+            "fight_abs_start_ms": int((base + timedelta(minutes=30)).timestamp() * 1000),
+            "fight_abs_end_ms": int((base + timedelta(minutes=40)).timestamp() * 1000),
+            "participants": [{"name": n} for n in participants],
+            "encounter_id": 1,
+            "is_mythic": True,
+            "id": 1,
+        }
+    )
+
+
+def test_run_pipeline_recomputes_only_dirty_nights(monkeypatch):
+    db = mongomock.MongoClient().db
+    _insert_night(db, "2024-07-10", 10, "R1", ["Alice-Illidan", "Zed-Illidan"])
+    _insert_night(db, "2024-07-11", 11, "R2", ["Alice-Illidan", "Zed-Illidan"])
+    db["team_roster"].insert_one({"main": "Alice-Illidan", "active": True})
+
+    captured = {}
+
+    def fake_build_requests(spreadsheet_id, tab, values, *, client=None, **kwargs):
+        captured[tab] = values
+        return []
+
+    computed = []
+    real_bench = night_compute.bench_minutes_for_night
+
+    def counting_bench(blocks, *args, **kwargs):
+        computed.append({b["night_id"] for b in blocks})
+        return real_bench(blocks, *args, **kwargs)
+
+    settings = _base_settings()
+    monkeypatch.setattr("pebble.cli.build_replace_values_requests", fake_build_requests)
+    monkeypatch.setattr("pebble.night_compute.bench_minutes_for_night", counting_bench)
+    _setup_pipeline(monkeypatch, db, settings, _sheet_map(settings))
+
+    cli.run_pipeline(settings, _fake_log())
+    first_qa = captured[settings.sheets.tabs.night_qa]
+    first_bench = captured[settings.sheets.tabs.bench_night_totals]
+    assert len(computed) == 2
+    # Zed is reported on the first night only
+    assert [row[3] for row in first_qa[1:]] == ["Zed-Illidan", ""]
+
+    # Nothing changed: both nights are served from night_qa/bench_night_totals
+    computed.clear()
+    cli.run_pipeline(settings, _fake_log())
+    assert computed == []
+    assert captured[settings.sheets.tabs.night_qa] == first_qa
+    assert captured[settings.sheets.tabs.bench_night_totals] == first_bench
+
+    # Ingest flags the second night: only it is rebuilt, and the unmatched
+    # names of the reused first night still suppress Zed there.
+    def ingest_dirty(_settings, *, rows=None, client=None, force_full_reingest=False):
+        return {"reports": 1, "fights": 1, "dirty_nights": ["2024-07-11"]}
+
+    db["fights_all"].update_one(
+        {"night_id": "2024-07-11"}, {"$inc": {"fight_abs_end_ms": 60000}}
+    )
+    monkeypatch.setattr("pebble.cli.ingest_reports", ingest_dirty)
+    cli.run_pipeline(settings, _fake_log())
+    assert computed == [{"2024-07-11"}]
+    qa_rows = captured[settings.sheets.tabs.night_qa]
+    assert qa_rows[1] == first_qa[1]
+    assert qa_rows[2][3] == ""
+    assert qa_rows[2] != first_qa[2]
+
+    # A roster change invalidates every night.
+    computed.clear()
+    db["team_roster"].insert_one({"main": "Zed-Illidan", "active": True})
+    cli.run_pipeline(settings, _fake_log())
+    assert len(computed) == 2
+    assert [row[3] for row in captured[settings.sheets.tabs.night_qa][1:]] == ["", ""]
+
+
+def test_run_pipeline_recomputes_night_when_overrides_change(monkeypatch):
+    db = mongomock.MongoClient().db
+    _insert_night(db, "2024-07-10", 10, "R1", ["Alice-Illidan"])
+    _insert_night(db, "2024-07-11", 11, "R2", ["Alice-Illidan"])
+    db["team_roster"].insert_many(
+        [{"main": "Alice-Illidan", "active": True}, {"main": "Bob-Illidan", "active": True}]
+    )
+
+    computed = []
+    real_bench = night_compute.bench_minutes_for_night
+
+    def counting_bench(blocks, *args, **kwargs):
+        computed.append({b["night_id"] for b in blocks})
+        return real_bench(blocks, *args, **kwargs)
+
+    settings = _base_settings()
+    monkeypatch.setattr("pebble.cli.build_replace_values_requests", lambda *a, **k: [])
+    monkeypatch.setattr("pebble.night_compute.bench_minutes_for_night", counting_bench)
+    sheet_map = _sheet_map(settings)
+    _setup_pipeline(monkeypatch, db, settings, sheet_map)
+    cli.run_pipeline(settings, _fake_log())
+    assert len(computed) == 2
+
+    computed.clear()
+    sheet_map[settings.sheets.tabs.availability_overrides] = [
+        ["Night", "Main", "Avail Pre?", "Avail Post?"],
+        ["2024-07-11", "Bob-Illidan", "N", "N"],
+    ]
+    cli.run_pipeline(settings, _fake_log())
+    assert computed == [{"2024-07-11"}]
+    mains = {d["main"] for d in db["bench_night_totals"].find({"night_id": "2024-07-11"})}
+    assert "Bob" in mains
+
+    computed.clear()
+    cli.run_pipeline(settings, _fake_log(), full_recompute=True)
+    assert len(computed) == 2
+
+
+def test_run_pipeline_drops_rows_of_nights_that_compute_to_nothing(monkeypatch):
+    db = mongomock.MongoClient().db
+    _insert_night(db, "2024-07-10", 10, "R1", ["Alice-Illidan"])
+    _insert_night(db, "2024-07-11", 11, "R2", ["Alice-Illidan"])
+    db["team_roster"].insert_one({"main": "Alice", "active": True})
+
+    captured = {}
+
+    def fake_build_requests(spreadsheet_id, tab, values, *, client=None, **kwargs):
+        captured[tab] = values
+        return []
+
+    settings = _base_settings()
+    monkeypatch.setattr("pebble.cli.build_replace_values_requests", fake_build_requests)
+    _setup_pipeline(monkeypatch, db, settings, _sheet_map(settings))
+    cli.run_pipeline(settings, _fake_log())
+    assert db["bench_night_totals"].count_documents({"night_id": "2024-07-11"}) == 1
+
+    # The night's only pull is removed by a re-ingest.
+    db["fights_all"].delete_many({"night_id": "2024-07-11"})
+    monkeypatch.setattr(
+        "pebble.cli.ingest_reports",
+        lambda _s, **kwargs: {"reports": 1, "fights": 0, "dirty_nights": ["2024-07-11"]},
+    )
+    for _ in range(2):
+        cli.run_pipeline(settings, _fake_log())
+        for name in ("night_qa", "blocks", "bench_night_totals"):
+            assert db[name].count_documents({"night_id": "2024-07-11"}) == 0
+        assert [row[0] for row in captured[settings.sheets.tabs.night_qa][1:]] == ["2024-07-10"]
+        assert {row[0] for row in captured[settings.sheets.tabs.bench_night_totals][1:]} == {"2024-07-10"}
+
+    # A night whose pulls are no longer Mythic has no envelope left.
+    db["fights_all"].update_many({"night_id": "2024-07-10"}, {"$set": {"is_mythic": False}})
+    monkeypatch.setattr(
+        "pebble.cli.ingest_reports",
+        lambda _s, **kwargs: {"reports": 1, "fights": 0, "dirty_nights": ["2024-07-10"]},
+    )
+    cli.run_pipeline(settings, _fake_log())
+    for name in ("night_qa", "blocks", "bench_night_totals"):
+        assert db[name].count_documents({}) == 0
+    assert captured[settings.sheets.tabs.night_qa][1:] == []
+
+
+def test_run_pipeline_does_not_replan_nights_without_mythic_pulls(monkeypatch):
+    db = mongomock.MongoClient().db
+    _insert_night(db, "2024-07-10", 10, "R1", ["Alice-Illidan"])
+    _insert_night(db, "2024-07-11", 11, "R2", ["Alice-Illidan"])
+    db["fights_all"].update_many({"night_id": "2024-07-11"}, {"$set": {"is_mythic": False}})
+    db["team_roster"].insert_one({"main": "Alice", "active": True})
+
+    plans = []
+
+    def info(msg, *args, extra=None, **kwargs):
+        if msg == "night recompute plan":
+            plans.append(extra["dirty_nights"])
+
+    log = SimpleNamespace(info=info, warning=lambda *a, **k: None)
+    settings = _base_settings()
+    monkeypatch.setattr("pebble.cli.build_replace_values_requests", lambda *a, **k: [])
+    _setup_pipeline(monkeypatch, db, settings, _sheet_map(settings))
+
+    cli.run_pipeline(settings, log)
+    assert db["night_qa"].count_documents({"night_id": "2024-07-11"}) == 0
+    cli.run_pipeline(settings, log)
+    assert plans == [["2024-07-10", "2024-07-11"], []]
+
+    # Once its pulls turn Mythic the night is planned and computed again.
+    db["fights_all"].update_many({"night_id": "2024-07-11"}, {"$set": {"is_mythic": True}})
+    monkeypatch.setattr(
+        "pebble.cli.ingest_reports",
+        lambda _s, **kwargs: {"reports": 1, "fights": 0, "dirty_nights": ["2024-07-11"]},
+    )
+    cli.run_pipeline(settings, log)
+    assert plans[-1] == ["2024-07-11"]
+    assert db["night_qa"].count_documents({"night_id": "2024-07-11"}) == 1
+    assert "2024-07-11" not in (db["pipeline_state"].find_one({"_id": "empty_nights"}) or {}).get("nights", {})
+
+
+def test_run_pipeline_memoizes_nights_with_unchanged_inputs(monkeypatch):
+    db = mongomock.MongoClient().db
+    _insert_night(db, "2024-07-10", 10, "R1", ["Alice-Illidan"])
+    _insert_night(db, "2024-07-11", 11, "R2", ["Alice-Illidan"])
+    db["team_roster"].insert_one({"main": "Alice-Illidan", "active": True})
+
+    computed = []
+    real_bench = night_compute.bench_minutes_for_night
+
+    def counting_bench(blocks, *args, **kwargs):
+        computed.append({b["night_id"] for b in blocks})
+        return real_bench(blocks, *args, **kwargs)
+
+    memo_logs = []
+
+    def info(msg, *args, extra=None, **kwargs):
+        if msg == "night memo":
+            memo_logs.append(extra)
+
+    log = SimpleNamespace(info=info, warning=lambda *a, **k: None)
+
+    def ingest_everything(_settings, *, rows=None, client=None, force_full_reingest=False):
+        return {"reports": 2, "fights": 0, "dirty_nights": ["2024-07-10", "2024-07-11"]}
+
+    settings = _base_settings()
+    monkeypatch.setattr("pebble.cli.build_replace_values_requests", lambda *a, **k: [])
+    monkeypatch.setattr("pebble.night_compute.bench_minutes_for_night", counting_bench)
+    _setup_pipeline(monkeypatch, db, settings, _sheet_map(settings))
+    monkeypatch.setattr("pebble.cli.ingest_reports", ingest_everything)
+
+    cli.run_pipeline(settings, log)
+    assert len(computed) == 2
+    assert memo_logs[-1]["memo_misses"] == 2
+
+    # Ingest reports both nights as dirty (e.g. a Notes edit), but the stage
+    # inputs are unchanged: everything is served from the memo.
+    computed.clear()
+    blocks_before = list(db["blocks"].find({}, {"_id": 1}))
+    cli.run_pipeline(settings, log)
+    assert computed == []
+    assert list(db["blocks"].find({}, {"_id": 1})) == blocks_before
+    assert memo_logs[-1]["memo_hits"] == 2
+    assert memo_logs[-1]["hit_rate"] == 1.0
+
+    # A report override changes that night's fingerprint only.
+    db["reports"].update_one(
+        {"code": "R2"}, {"$set": {"mythic_override_end_ms": db["reports"].find_one({"code": "R2"})["end_ms"]}}
+    )
+    cli.run_pipeline(settings, log)
+    assert computed == [{"2024-07-11"}]
+    assert memo_logs[-1]["memo_hits"] == 1
+    assert memo_logs[-1]["hit_rate"] == 0.5
+
+
+def test_run_pipeline_parallel_nights_match_serial(monkeypatch):
+    def seeded_db():
+        db = mongomock.MongoClient().db
+        _insert_night(db, "2024-07-10", 10, "R1", ["Alice-Illidan", "Zed-Illidan"])
+        _insert_night(db, "2024-07-11", 11, "R2", ["Alice-Illidan", "Zed-Illidan", "Yan-Illidan"])
+        _insert_night(db, "2024-07-12", 12, "R3", ["Bob-Illidan", "Yan-Illidan"])
+        db["team_roster"].insert_many(
+            [{"main": "Alice-Illidan", "active": True}, {"main": "Bob-Illidan", "active": True}]
+        )
+        return db
+
+    def run(workers, bench_engine="python", engine="loop", publish_mode="replace"):
+        settings.compute = SimpleNamespace(bench_engine=bench_engine, engine=engine)
+        settings.mongo = SimpleNamespace(publish_mode=publish_mode)
+        db = seeded_db()
+        captured = {}
+
+        def fake_build_requests(spreadsheet_id, tab, values, *, client=None, **kwargs):
+            captured[tab] = values
+            return []
+
+        monkeypatch.setattr("pebble.cli.build_replace_values_requests", fake_build_requests)
+        _setup_pipeline(monkeypatch, db, settings, _sheet_map(settings))
+        cli.run_pipeline(settings, _fake_log(), workers=workers)
+        qa = list(db["night_qa"].find({}, {"_id": 0}).sort("night_id", 1))
+        bench = list(db["bench_night_totals"].find({}, {"_id": 0}).sort([("night_id", 1), ("main", 1)]))
+        return captured, qa, bench
+
+    settings = _base_settings()
+    serial = run(1)
+    parallel = run(2)
+
+    assert parallel == serial
+    assert run(2, "numpy") == serial
+    assert run(1, engine="columnar") == serial
+    assert run(1, publish_mode="swap") == serial
+    assert run(1, engine="columnar", publish_mode="swap") == serial
+    night_qa = serial[0][settings.sheets.tabs.night_qa]
+    assert [row[3] for row in night_qa[1:]] == ["Zed-Illidan", "Yan-Illidan", ""]
+
+
+class _CountingDB:
+    """Wrap a mongomock database and count ``find`` calls per collection."""
+
+    def __init__(self, db):
+        self._db = db
+        self.finds = {}
+
+    def __getitem__(self, name):
+        coll = self._db[name]
+        outer = self
+
+        class _Collection:
+            def find(self, *args, **kwargs):
+                outer.finds[name] = outer.finds.get(name, 0) + 1
+                return coll.find(*args, **kwargs)
+
+            def find_one(self, *args, **kwargs):
+                outer.finds[name] = outer.finds.get(name, 0) + 1
+                return coll.find_one(*args, **kwargs)
+
+            def aggregate(self, *args, **kwargs):
+                outer.finds[name] = outer.finds.get(name, 0) + 1
+                return coll.aggregate(*args, **kwargs)
+
+            def __getattr__(self, attr):
+                return getattr(coll, attr)
+
+        return _Collection()
+
+
+def test_run_pipeline_loads_night_inputs_in_bulk(monkeypatch):
+    raw = mongomock.MongoClient().db
+    for day in range(1, 13):
+        _insert_night(raw, f"2024-07-{day:02d}", day, f"R{day}", ["Alice-Illidan"])
+    raw["team_roster"].insert_one({"main": "Alice-Illidan", "active": True})
+    db = _CountingDB(raw)
+
+    captured = {}
+
+    def fake_build_requests(spreadsheet_id, tab, values, *, client=None, **kwargs):
+        captured[tab] = values
+        return []
+
+    settings = _base_settings()
+    monkeypatch.setattr("pebble.cli.build_replace_values_requests", fake_build_requests)
+    _setup_pipeline(monkeypatch, db, settings, _sheet_map(settings))
+
+    cli.run_pipeline(settings, _fake_log())
+    assert len(captured[settings.sheets.tabs.night_qa]) == 13
+    assert db.finds["fights_all"] == 1
+    assert db.finds["reports"] == 2  # night list + inputs
+    first_bench = captured[settings.sheets.tabs.bench_night_totals]
+
+    # Reused nights: stored bench rows also come from a single cursor, so
+    # the number of queries does not grow with the number of nights.
+    db.finds.clear()
+    cli.run_pipeline(settings, _fake_log())
+    assert "fights_all" not in db.finds
+    assert sum(db.finds.values()) < 12
+    assert captured[settings.sheets.tabs.bench_night_totals] == first_bench
+
+
+def test_run_pipeline_persists_participation_only_in_audit_mode(monkeypatch):
+    db = mongomock.MongoClient().db
+    _insert_night(db, "2024-07-10", 10, "R1", ["Alice-Illidan", "Zed-Illidan"])
+    db["team_roster"].insert_one({"main": "Alice-Illidan", "active": True})
+
+    captured = {}
+
+    def fake_build_requests(spreadsheet_id, tab, values, *, client=None, **kwargs):
+        captured[tab] = values
+        return []
+
+    settings = _base_settings()
+    monkeypatch.setattr("pebble.cli.build_replace_values_requests", fake_build_requests)
+    _setup_pipeline(monkeypatch, db, settings, _sheet_map(settings))
+
+    cli.run_pipeline(settings, _fake_log())
+    assert db["participation_m"].count_documents({}) == 0
+    blocks = list(db["blocks"].find({}, {"_id": 0}))
+    bench = captured[settings.sheets.tabs.bench_night_totals]
+    assert blocks
+
+    # Enabling audit mode rebuilds the night and stores the per-pull rows;
+    # blocks and bench rows are unchanged.
+    settings.mongo = SimpleNamespace(audit_participation=True)
+    cli.run_pipeline(settings, _fake_log())
+    rows = list(db["participation_m"].find({}, {"_id": 0}))
+    assert {r["main"] for r in rows} == {"Alice"}
+    assert list(db["blocks"].find({}, {"_id": 0})) == blocks
+    assert captured[settings.sheets.tabs.bench_night_totals] == bench
+
+    # Turning it off again rebuilds the night without the per-pull rows.
+    settings.mongo = SimpleNamespace(audit_participation=False)
+    cli.run_pipeline(settings, _fake_log())
+    assert db["participation_m"].count_documents({}) == 0
+    assert list(db["blocks"].find({}, {"_id": 0})) == blocks
+
+
+def test_run_pipeline_hands_night_docs_to_week_stages(monkeypatch):
+    from pebble.attendance import build_attendance_rows
+    from pebble.week_agg import materialize_rankings, materialize_week_totals
+
+    raw = mongomock.MongoClient().db
+    _insert_night(raw, "2024-07-10", 10, "R1", ["Alice-Illidan", "Bob-Illidan"])
+    _insert_night(raw, "2024-07-17", 17, "R2", ["Alice-Illidan"])
+    raw["team_roster"].insert_many(
+        [{"main": "Alice", "active": True}, {"main": "Bob", "active": True, "leave_night": "2024-07-12"}]
+    )
+    # A night with stored totals but no reports left is still counted.
+    raw["bench_night_totals"].insert_one(
+        {"night_id": "2024-07-03", "main": "Alice", "played_pre_min": 30, "played_post_min": 0,
+         "played_total_min": 30, "bench_pre_min": 0, "bench_post_min": 5, "bench_total_min": 5,
+         "avail_pre": True, "avail_post": True, "status_source": "blocks"}
+    )
+    db = _CountingDB(raw)
+
+    captured = {}
+
+    def fake_build_requests(spreadsheet_id, tab, values, *, client=None, **kwargs):
+        captured[tab] = values
+        return []
+
+    settings = _base_settings()
+    monkeypatch.setattr("pebble.cli.build_replace_values_requests", fake_build_requests)
+    _setup_pipeline(monkeypatch, db, settings, _sheet_map(settings))
+
+    for _ in range(2):
+        db.finds.clear()
+        cli.run_pipeline(settings, _fake_log())
+        assert db.finds["team_roster"] == 1
+        assert "bench_week_totals" not in db.finds
+        assert db.finds["bench_night_totals"] <= 2
+
+    # The in-memory stages match a fresh read of the collections.
+    weeks = captured[settings.sheets.tabs.bench_week_totals]
+    assert ["2024-07-02", "Alice", 30, 5, 0, 5] in weeks
+    _, week_docs = materialize_week_totals(raw, include_docs=True)
+    assert weeks[1:] == [
+        [d["game_week"], d["main"], d["played_min"], d["bench_min"], d["bench_pre_min"], d["bench_post_min"]]
+        for d in week_docs
+    ]
+    _, rank_docs = materialize_rankings(raw, include_docs=True)
+    assert [row[:4] for row in captured[settings.sheets.tabs.bench_rankings][1:]] == [
+        [d["rank"], d["main"], d["bench_min"], d["played_min"]] for d in rank_docs
+    ]
+    assert captured[settings.sheets.tabs.attendance] == build_attendance_rows(raw)
+
+
+@pytest.mark.parametrize("engine", ["loop", "columnar"])
+def test_run_pipeline_merges_week_totals_of_changed_nights(monkeypatch, engine):
+    from pebble.week_agg import materialize_week_totals
+
+    db = mongomock.MongoClient().db
+    _insert_night(db, "2024-07-10", 10, "R1", ["Alice-Illidan"])
+    _insert_night(db, "2024-07-17", 17, "R2", ["Alice-Illidan"])
+    db["team_roster"].insert_many(
+        [{"main": "Alice", "active": True}, {"main": "Bob", "active": True}]
+    )
+
+    week_logs = []
+
+    def info(msg, *args, extra=None, **kwargs):
+        if msg == "weekly aggregates refreshed":
+            week_logs.append(extra)
+
+    log = SimpleNamespace(info=info, warning=lambda *a, **k: None)
+    settings = _base_settings()
+    settings.compute = SimpleNamespace(engine=engine)
+    sheet_map = _sheet_map(settings)
+    monkeypatch.setattr("pebble.cli.build_replace_values_requests", lambda *a, **k: [])
+    _setup_pipeline(monkeypatch, db, settings, sheet_map)
+
+    def stored():
+        return {(d["game_week"], d["main"]): d for d in db["bench_week_totals"].find({})}
+
+    cli.run_pipeline(settings, log)
+    assert week_logs[-1]["week_merge_nights"] is None
+    before = stored()
+
+    # Bob's override changes one night: only its week is merged.
+    sheet_map[settings.sheets.tabs.availability_overrides] = [
+        ["Night", "Main", "Avail Pre?", "Avail Post?"],
+        ["2024-07-17", "Bob-Illidan", "Y", "Y"],
+    ]
+    cli.run_pipeline(settings, log)
+    assert week_logs[-1]["week_merge_nights"] == 1
+    after = stored()
+    assert after[("2024-07-09", "Alice")] == before[("2024-07-09", "Alice")]
+    assert after[("2024-07-16", "Bob")]["bench_min"] > 0
+    assert after[("2024-07-16", "Alice")]["updated_at"] != before[("2024-07-16", "Alice")]["updated_at"]
+
+    strip = lambda docs: sorted(
+        (d["game_week"], d["main"], d["played_min"], d["bench_min"], d["bench_pre_min"], d["bench_post_min"])
+        for d in docs
+    )
+    merged = strip(after.values())
+    _, rebuilt = materialize_week_totals(db, include_docs=True)
+    assert merged == strip(rebuilt)
+
+    # A roster edit rewrites every week.
+    db["team_roster"].update_one({"main": "Bob"}, {"$set": {"join_night": "2024-07-16"}})
+    cli.run_pipeline(settings, log)
+    assert week_logs[-1]["week_merge_nights"] is None
+    assert ("2024-07-09", "Bob") not in stored()
@@ -8,8 +8,25 @@ from pebble.config_loader import (
     MongoConfig,
     WCLConfig,
 )
-from pebble.ingest import ingest_reports, _report_inputs_hash
+from pebble.ingest import ingest_reports, _fetch_one_bundle, _report_inputs_hash
 from pebble.utils.time import ms_to_pt_sheets, PT
+from pebble.wcl_client import RateLimitBudget
+
+
+class StubWCLClient:
+    """Base for WCL client doubles; subclasses provide the fetch methods."""
+
+    def __init__(self, *args, **kwargs):
+        self.budget = RateLimitBudget()
+
+    def refresh_rate_limit(self, *, force=False):
+        return self.budget
+
+    def cached_report_bundles(self, codes):
+        return {}
+
+    def cache_counters(self):
+        return {"memory": {"hits": 0, "misses": 0}, "shared": {"hits": 0, "misses": 0}}
 
 
 def test_ingest_reports_updates_sheet(monkeypatch):
@@ -58,14 +75,11 @@ def test_ingest_reports_updates_sheet(monkeypatch):
         "masterData": {"actors": []},
     }
 
-    class DummyWCLClient:
-        def __init__(self, *args, **kwargs):
-            pass
-
+    class DummyWCLClient(StubWCLClient):
         def fetch_report_bundle(self, code):
             return sample_bundle
 
-    monkeypatch.setattr("pebble.ingest.WCLClient", DummyWCLClient)
+    monkeypatch.setattr("pebble.ingest.get_shared_client", lambda s: DummyWCLClient())
     monkeypatch.setattr("pebble.ingest.get_db", lambda s: mongomock.MongoClient().db)
 
     fixed_now = datetime(2025, 4, 2, 18, 50, 49, tzinfo=PT)
@@ -198,14 +212,11 @@ def test_ingest_reports_marks_bad_links_on_fetch_error(monkeypatch, caplog):
             raise AssertionError("ingest should not touch Sheets")
     monkeypatch.setattr("pebble.ingest.get_db", lambda s: mongomock.MongoClient().db)
 
-    class DummyWCLClient:
-        def __init__(self, *args, **kwargs):
-            pass
-
+    class DummyWCLClient(StubWCLClient):
         def fetch_report_bundle(self, code):
             raise RuntimeError([{"message": "Unknown report"}])
 
-    monkeypatch.setattr("pebble.ingest.WCLClient", DummyWCLClient)
+    monkeypatch.setattr("pebble.ingest.get_shared_client", lambda s: DummyWCLClient())
 
     settings = Settings(
         sheets=SheetsConfig(
@@ -293,14 +304,11 @@ def test_ingest_reports_skips_when_inputs_unchanged(monkeypatch):
         def execute(self, _req):
             raise AssertionError("ingest should not touch Sheets")
 
-    class DummyWCLClient:
-        def __init__(self, *args, **kwargs):
-            pass
-
+    class DummyWCLClient(StubWCLClient):
         def fetch_report_bundle(self, code):
             raise AssertionError("should not fetch WCL when skipping")
 
-    monkeypatch.setattr("pebble.ingest.WCLClient", DummyWCLClient)
+    monkeypatch.setattr("pebble.ingest.get_shared_client", lambda s: DummyWCLClient())
     monkeypatch.setattr("pebble.ingest.get_db", lambda s: db)
 
     settings = _base_settings()
@@ -341,17 +349,14 @@ def test_ingest_reports_force_full_reingest(monkeypatch):
         "masterData": {"actors": []},
     }
 
-    class DummyWCLClient:
+    class DummyWCLClient(StubWCLClient):
         calls = 0
 
-        def __init__(self, *args, **kwargs):
-            pass
-
         def fetch_report_bundle(self, code):
             DummyWCLClient.calls += 1
             return sample_bundle
 
-    monkeypatch.setattr("pebble.ingest.WCLClient", DummyWCLClient)
+    monkeypatch.setattr("pebble.ingest.get_shared_client", lambda s: DummyWCLClient())
     monkeypatch.setattr("pebble.ingest.get_db", lambda s: db)
 
     settings = _base_settings()
@@ -367,3 +372,540 @@ def test_ingest_reports_force_full_reingest(monkeypatch):
     assert res["reports"] == 1
     assert res["skipped_reports"] == 0
     assert DummyWCLClient.calls == 1
+
+
+def test_ingest_reports_skips_fight_writes_for_identical_bundle(monkeypatch):
+    rows = _base_report_rows()
+    db = mongomock.MongoClient().db
+
+    class DummySheetsClient:
+        svc = None
+
+        def execute(self, _req):
+            raise AssertionError("ingest should not touch Sheets")
+
+    bundle = {
+        "title": "Report One",
+        "startTime": 1000,
+        "endTime": 2000,
+        "owner": {"name": "Creator"},
+        "fights": [
+            {"id": 1, "encounterID": 10, "name": "Boss", "difficulty": 5,
+             "startTime": 0, "endTime": 500, "friendlyPlayers": [1], "kill": True}
+        ],
+        "masterData": {"actors": [{"id": 1, "name": "Alice", "server": "Illidan", "subType": "Mage", "type": "Player"}]},
+    }
+
+    class DummyWCLClient(StubWCLClient):
+        def fetch_report_bundle(self, code):
+            return bundle
+
+    monkeypatch.setattr("pebble.ingest.get_shared_client", lambda s: DummyWCLClient())
+    monkeypatch.setattr("pebble.ingest.get_db", lambda s: db)
+
+    first = ingest_reports(_base_settings(), rows=rows, client=DummySheetsClient())
+    assert first["unchanged_bundles"] == 0
+    assert set(first["writes"]) == {"reports", "actors", "fights_all"}
+
+    rows[1][7] = "Edited note"
+    second = ingest_reports(_base_settings(), rows=rows, client=DummySheetsClient())
+
+    assert second["reports"] == 1
+    assert second["unchanged_bundles"] == 1
+    assert set(second["writes"]) == {"reports"}
+    stored = db["reports"].find_one({"code": "ABC123"})
+    assert stored["notes"] == "Edited note"
+    assert stored["last_fight_id"] == 1
+    assert db["fights_all"].count_documents({}) == 1
+
+
+def test_ingest_reports_marks_dirty_nights(monkeypatch):
+    rows = _base_report_rows()
+    db = mongomock.MongoClient().db
+
+    class DummySheetsClient:
+        svc = None
+
+        def execute(self, _req):
+            raise AssertionError("ingest should not touch Sheets")
+
+    bundle = {
+        "title": "Report One",
+        "startTime": 1000,
+        "endTime": 2000,
+        "owner": {"name": "Creator"},
+        "fights": [
+            {"id": 1, "encounterID": 10, "name": "Boss", "difficulty": 5,
+             "startTime": 0, "endTime": 500, "friendlyPlayers": [1], "kill": True}
+        ],
+        "masterData": {"actors": []},
+    }
+
+    class DummyWCLClient(StubWCLClient):
+        def fetch_report_bundle(self, code):
+            return bundle
+
+    monkeypatch.setattr("pebble.ingest.get_shared_client", lambda s: DummyWCLClient())
+    monkeypatch.setattr("pebble.ingest.get_db", lambda s: db)
+
+    first = ingest_reports(_base_settings(), rows=rows, client=DummySheetsClient())
+    night_id = db["reports"].find_one({"code": "ABC123"})["night_id"]
+    assert first["dirty_nights"] == [night_id]
+    assert db["pipeline_state"].find_one({"_id": "dirty_nights"})["nights"] == [night_id]
+
+    # Re-fetching an identical bundle with unchanged inputs dirties nothing.
+    db["pipeline_state"].delete_many({})
+    again = ingest_reports(
+        _base_settings(), rows=rows, client=DummySheetsClient(), force_full_reingest=True
+    )
+    assert again["reports"] == 1
+    assert again["dirty_nights"] == []
+    assert db["pipeline_state"].count_documents({}) == 0
+
+    # Changed override cells dirty the report's night.
+    rows[1][3] = "8:05 PM"
+    edited = ingest_reports(_base_settings(), rows=rows, client=DummySheetsClient())
+    assert edited["dirty_nights"] == [night_id]
+
+
+def test_ingest_reports_fetches_concurrently_in_row_order(monkeypatch):
+    header = _base_report_rows()[0]
+    codes = ["AAA111", "BBB222", "CCC333", "DDD444"]
+    rows = [header] + [
+        [f"https://www.warcraftlogs.com/reports/{code}"] + [""] * (len(header) - 1)
+        for code in codes
+    ]
+    db = mongomock.MongoClient().db
+
+    class DummySheetsClient:
+        svc = None
+
+        def execute(self, _req):
+            raise AssertionError("ingest should not touch Sheets")
+
+    import threading
+    import time as _time
+
+    in_flight = {"now": 0, "max": 0}
+    lock = threading.Lock()
+
+    class DummyWCLClient(StubWCLClient):
+        def fetch_report_bundle(self, code):
+            with lock:
+                in_flight["now"] += 1
+                in_flight["max"] = max(in_flight["max"], in_flight["now"])
+            # Later rows finish first so completion order differs from row order.
+            _time.sleep(0.01 * (len(codes) - codes.index(code)))
+            with lock:
+                in_flight["now"] -= 1
+            if code == "CCC333":
+                raise RuntimeError([{"message": "Unknown report"}])
+            return {
+                "title": f"Report {code}",
+                "startTime": 1000,
+                "endTime": 2000,
+                "owner": {"name": "Creator"},
+                "fights": [],
+                "masterData": {"actors": []},
+            }
+
+    monkeypatch.setattr("pebble.ingest.get_shared_client", lambda s: DummyWCLClient())
+    monkeypatch.setattr("pebble.ingest.get_db", lambda s: db)
+
+    settings = _base_settings()
+    settings.wcl.max_concurrency = 2
+
+    res = ingest_reports(settings, rows=rows, client=DummySheetsClient())
+
+    assert res["reports"] == 3
+    assert in_flight["max"] == 2
+    assert set(res["fetch_ms"]) == set(codes)
+    # Each report's writes are flushed once it is processed.
+    assert res["writes"]["reports"] == {
+        "ops": 3, "batches": 1, "matched": 0, "modified": 0, "upserted": 3
+    }
+    names = [
+        u["values"][0][0]
+        for u in res["sheet_updates"]
+        if u["range"].split("!")[1].startswith(("I", "B"))
+    ]
+    assert names == ["Report AAA111", "Report BBB222", "Bad report link", "Report DDD444"]
+
+
+def test_ingest_reports_batches_and_isolates_bad_codes(monkeypatch):
+    header = _base_report_rows()[0]
+    codes = ["AAA111", "BAD222", "CCC333"]
+    rows = [header] + [
+        [f"https://www.warcraftlogs.com/reports/{code}"] + [""] * (len(header) - 1)
+        for code in codes
+    ]
+    db = mongomock.MongoClient().db
+
+    class DummySheetsClient:
+        svc = None
+
+        def execute(self, _req):
+            raise AssertionError("ingest should not touch Sheets")
+
+    def _bundle(code):
+        return {
+            "title": f"Report {code}",
+            "startTime": 1000,
+            "endTime": 2000,
+            "owner": {"name": "Creator"},
+            "fights": [],
+            "masterData": {"actors": []},
+        }
+
+    calls = {"batch": [], "single": []}
+
+    class DummyWCLClient(StubWCLClient):
+        def fetch_report_bundles(self, batch):
+            calls["batch"].append(list(batch))
+            if "BAD222" in batch:
+                raise RuntimeError([{"message": "Unknown report"}])
+            return {code: _bundle(code) for code in batch}
+
+        def fetch_report_bundle(self, code):
+            calls["single"].append(code)
+            if code == "BAD222":
+                raise RuntimeError([{"message": "Unknown report"}])
+            return _bundle(code)
+
+    monkeypatch.setattr("pebble.ingest.get_shared_client", lambda s: DummyWCLClient())
+    monkeypatch.setattr("pebble.ingest.get_db", lambda s: db)
+
+    settings = _base_settings()
+    settings.wcl.batch_size = 2
+    settings.wcl.max_concurrency = 1
+
+    res = ingest_reports(settings, rows=rows, client=DummySheetsClient())
+
+    assert calls["batch"] == [["AAA111", "BAD222"]]
+    assert calls["single"] == ["AAA111", "BAD222", "CCC333"]
+    assert res["reports"] == 2
+    update_map = {
+        u["range"].split("!")[1]: u["values"][0][0] for u in res["sheet_updates"]
+    }
+    assert update_map["B7"] == "Bad report link"
+
+
+def test_ingest_reports_defers_old_reports_when_budget_low(monkeypatch):
+    header = _base_report_rows()[0]
+    rows = [
+        header,
+        ["https://www.warcraftlogs.com/reports/OLD111"] + [""] * (len(header) - 1),
+        ["https://www.warcraftlogs.com/reports/NEW222"] + [""] * (len(header) - 1),
+    ]
+    db = mongomock.MongoClient().db
+    db["reports"].insert_one(
+        {
+            "code": "OLD111",
+            "inputs_hash": "stale",
+            "ingested_at": datetime(2024, 1, 1, tzinfo=PT),
+            "start_ms": 1000,
+        }
+    )
+
+    class DummySheetsClient:
+        svc = None
+
+        def execute(self, _req):
+            raise AssertionError("ingest should not touch Sheets")
+
+    fetched = []
+
+    class DummyWCLClient(StubWCLClient):
+        def __init__(self):
+            super().__init__()
+            self.budget.update(
+                {"limitPerHour": 3600, "pointsSpentThisHour": 3500, "pointsResetIn": 600}
+            )
+
+        def fetch_report_bundle(self, code):
+            fetched.append(code)
+            return {
+                "title": f"Report {code}",
+                "startTime": 1000,
+                "endTime": 2000,
+                "owner": {"name": "Creator"},
+                "fights": [],
+                "masterData": {"actors": []},
+            }
+
+    monkeypatch.setattr("pebble.ingest.get_shared_client", lambda s: DummyWCLClient())
+    monkeypatch.setattr("pebble.ingest.get_db", lambda s: db)
+
+    res = ingest_reports(_base_settings(), rows=rows, client=DummySheetsClient())
+
+    assert fetched == ["NEW222"]
+    assert res["reports"] == 1
+    assert res["deferred_reports"] == 1
+    assert res["rate_limit"]["points_remaining"] == 100
+
+
+def test_ingest_reports_serves_cache_hits_before_budget_check(monkeypatch):
+    header = _base_report_rows()[0]
+    rows = [
+        header,
+        ["https://www.warcraftlogs.com/reports/OLD111"] + [""] * (len(header) - 1),
+        ["https://www.warcraftlogs.com/reports/OLD222"] + [""] * (len(header) - 1),
+    ]
+    db = mongomock.MongoClient().db
+    db["reports"].insert_many(
+        [
+            {"code": code, "inputs_hash": "stale", "ingested_at": datetime(2024, 1, 1, tzinfo=PT), "start_ms": 1000}
+            for code in ("OLD111", "OLD222")
+        ]
+    )
+
+    class DummySheetsClient:
+        svc = None
+
+        def execute(self, _req):
+            raise AssertionError("ingest should not touch Sheets")
+
+    bundle = {
+        "title": "Cached",
+        "startTime": 1000,
+        "endTime": 2000,
+        "owner": {"name": "Creator"},
+        "fights": [],
+        "masterData": {"actors": []},
+    }
+    lookups = []
+    fetched = []
+
+    class DummyWCLClient(StubWCLClient):
+        def __init__(self):
+            super().__init__()
+            self.budget.update(
+                {"limitPerHour": 3600, "pointsSpentThisHour": 3500, "pointsResetIn": 600}
+            )
+
+        def cached_report_bundles(self, codes):
+            lookups.append(list(codes))
+            return {"OLD111": bundle}
+
+        def fetch_report_bundle(self, code):
+            fetched.append(code)
+            return bundle
+
+    monkeypatch.setattr("pebble.ingest.get_shared_client", lambda s: DummyWCLClient())
+    monkeypatch.setattr("pebble.ingest.get_db", lambda s: db)
+
+    res = ingest_reports(_base_settings(), rows=rows, client=DummySheetsClient())
+
+    assert lookups == [["OLD111", "OLD222"]]
+    assert fetched == []
+    assert res["reports"] == 1
+    assert res["deferred_reports"] == 1
+    assert db["reports"].find_one({"code": "OLD111"})["title"] == "Cached"
+
+
+def test_ingest_reports_fetches_live_reports_incrementally(monkeypatch):
+    rows = _base_report_rows()
+    db = mongomock.MongoClient().db
+    import time as _time
+
+    start_ms = int(_time.time() * 1000) - 60 * 60 * 1000
+    db["reports"].insert_one(
+        {
+            "code": "ABC123",
+            "inputs_hash": _report_inputs_hash(
+                "Some note", "8:00 PM", "8:15 PM", "8:30 PM", "11:00 PM"
+            ),
+            "ingested_at": datetime.now(PT),
+            "start_ms": start_ms,
+            "last_fight_id": 3,
+        }
+    )
+    db["actors"].insert_many(
+        [
+            {"report_code": "ABC123", "actor_id": 1, "name": "Alice-Illidan", "type": "Player", "subType": "Mage", "server": "Illidan"},
+            {"report_code": "ABC123", "actor_id": 2, "name": "Bob-Illidan", "type": "Player", "subType": "Druid", "server": "Illidan"},
+        ]
+    )
+
+    class DummySheetsClient:
+        svc = None
+
+        def execute(self, _req):
+            raise AssertionError("ingest should not touch Sheets")
+
+    calls = {"since": [], "actors": 0}
+    new_fights = [4]
+
+    class DummyWCLClient(StubWCLClient):
+        def fetch_report_bundle(self, code):
+            raise AssertionError("live report should be fetched incrementally")
+
+        def fetch_report_fights_since(self, code, first_fight_id):
+            calls["since"].append((code, first_fight_id))
+            return {
+                "title": "Live",
+                "startTime": start_ms,
+                "endTime": start_ms + 30 * 60000,
+                "owner": {"name": "Creator"},
+                "fights": [
+                    {"id": fid, "encounterID": 1, "difficulty": 5, "startTime": 180000, "endTime": 240000, "friendlyPlayers": [1, 5]}
+                    for fid in new_fights
+                ],
+            }
+
+        def fetch_report_actors(self, code):
+            calls["actors"] += 1
+            return [
+                {"id": 1, "name": "Alice", "server": "Illidan", "type": "Player", "subType": "Mage"},
+                {"id": 5, "name": "Cara", "server": "Illidan", "type": "Player", "subType": "Priest"},
+            ]
+
+    monkeypatch.setattr("pebble.ingest.get_shared_client", lambda s: DummyWCLClient())
+    monkeypatch.setattr("pebble.ingest.get_db", lambda s: db)
+
+    settings = _base_settings()
+    settings.wcl.incremental_live_reports = True
+    res = ingest_reports(settings, rows=rows, client=DummySheetsClient())
+
+    assert calls["since"] == [("ABC123", 4)]
+    assert calls["actors"] == 1
+    assert res["reports"] == 1
+    assert res["incremental_reports"] == 1
+    assert res["fights"] == 1
+    assert res["dirty_nights"] == [db["reports"].find_one({"code": "ABC123"})["night_id"]]
+    assert db["actors"].count_documents({"report_code": "ABC123"}) == 3
+    latest = db["fights_all"].find_one({"id": 4})
+    assert {p["name"] for p in latest["participants"]} == {"Alice-Illidan", "Cara-Illidan"}
+    assert db["reports"].find_one({"code": "ABC123"})["last_fight_id"] == 4
+
+    # Nothing new was logged: the report is polled from the next id and its
+    # night stays clean.
+    new_fights.clear()
+    calls["since"].clear()
+    res = ingest_reports(settings, rows=rows, client=DummySheetsClient())
+    assert calls["since"] == [("ABC123", 5)]
+    assert res["fights"] == 0
+    assert res["dirty_nights"] == []
+    assert db["reports"].find_one({"code": "ABC123"})["last_fight_id"] == 4
+
+
+def test_incremental_fetch_without_report_falls_back_to_full_bundle():
+    class DummyWCLClient(StubWCLClient):
+        def fetch_report_fights_since(self, code, first_fight_id):
+            return None
+
+        def fetch_report_bundle(self, code):
+            return {"code": code, "fights": [], "masterData": {"actors": []}}
+
+    res = _fetch_one_bundle(DummyWCLClient(), "ABC123", since_fight_id=4)
+
+    assert res.bundle == {"code": "ABC123", "fights": [], "masterData": {"actors": []}}
+    assert res.incremental is False
+
+
+def test_ingest_reports_failed_write_only_drops_that_report(monkeypatch):
+    rows = _base_report_rows()
+    rows.append([rows[1][0].replace("ABC123", "DEF456")] + rows[1][1:])
+    db = mongomock.MongoClient().db
+    # A fight stored under DEF456's (report, id) with another canonical key
+    # makes that report's fight upsert fail on the unique index.
+    db["fights_all"].create_index([("report_code", 1), ("id", 1)], unique=True)
+    db["fights_all"].insert_one({"report_code": "DEF456", "id": 1, "encounter_id": 99})
+
+    class DummySheetsClient:
+        svc = None
+
+        def execute(self, _req):
+            raise AssertionError("ingest should not touch Sheets")
+
+    def bundle(code):
+        return {
+            "title": f"Report {code}",
+            "startTime": 1000,
+            "endTime": 2000,
+            "owner": {"name": "Creator"},
+            "fights": [
+                {"id": 1, "encounterID": 10 if code == "ABC123" else 11, "name": "Boss", "difficulty": 5,
+                 "startTime": 0, "endTime": 500, "friendlyPlayers": [1], "kill": True}
+            ],
+            "masterData": {"actors": [{"id": 1, "name": "Alice", "server": "Illidan", "subType": "Mage", "type": "Player"}]},
+        }
+
+    fetched = []
+
+    class DummyWCLClient(StubWCLClient):
+        def fetch_report_bundle(self, code):
+            fetched.append(code)
+            return bundle(code)
+
+    monkeypatch.setattr("pebble.ingest.get_shared_client", lambda s: DummyWCLClient())
+    monkeypatch.setattr("pebble.ingest.get_db", lambda s: db)
+
+    res = ingest_reports(_base_settings(), rows=rows, client=DummySheetsClient())
+
+    assert res["reports"] == 1
+    assert res["failed_reports"] == 1
+    assert db["fights_all"].count_documents({"report_code": "ABC123"}) == 1
+    # Only ABC123's row (the first under the header) is updated.
+    assert {u["range"][-1] for u in res["sheet_updates"]} == {"6"}
+    assert "ingested_at" not in db["reports"].find_one({"code": "DEF456"})
+
+    # Once the conflict is gone the report is fetched and written again.
+    db["fights_all"].delete_one({"report_code": "DEF456", "encounter_id": 99})
+    fetched.clear()
+    res = ingest_reports(_base_settings(), rows=rows, client=DummySheetsClient())
+    assert fetched == ["DEF456"]
+    assert res["failed_reports"] == 0
+    assert db["fights_all"].count_documents({"report_code": "DEF456"}) == 1
+
+
+def test_ingest_reports_defers_presence_walk_without_budget(monkeypatch):
+    rows = _base_report_rows()
+    db = mongomock.MongoClient().db
+    db["reports"].insert_one(
+        {"code": "ABC123", "inputs_hash": "stale", "ingested_at": datetime(2024, 1, 1, tzinfo=PT), "start_ms": 1000}
+    )
+
+    class DummySheetsClient:
+        svc = None
+
+        def execute(self, _req):
+            raise AssertionError("ingest should not touch Sheets")
+
+    bundle = {
+        "title": "Report One",
+        "startTime": 1000,
+        "endTime": 2000,
+        "owner": {"name": "Creator"},
+        "fights": [
+            {"id": 1, "encounterID": 10, "name": "Boss", "difficulty": 5,
+             "startTime": 0, "endTime": 500, "friendlyPlayers": [1], "kill": True}
+        ],
+        "masterData": {"actors": [{"id": 1, "name": "Alice", "server": "Illidan", "subType": "Mage", "type": "Player"}]},
+    }
+
+    class DummyWCLClient(StubWCLClient):
+        def __init__(self):
+            super().__init__()
+            self.budget.update({"limitPerHour": 100, "pointsSpentThisHour": 95, "pointsResetIn": 3600})
+
+        def cached_report_bundles(self, codes):
+            # An old report served from the cache is not held back by the
+            # budget; its presence walk is.
+            return {code: bundle for code in codes}
+
+        def iter_report_events(self, *args, **kwargs):
+            raise AssertionError("presence walk should wait for budget")
+
+    monkeypatch.setattr("pebble.ingest.get_shared_client", lambda s: DummyWCLClient())
+    monkeypatch.setattr("pebble.ingest.get_db", lambda s: db)
+
+    settings = _base_settings()
+    settings.wcl.events_presence = True
+    res = ingest_reports(settings, rows=rows, client=DummySheetsClient())
+
+    assert res["reports"] == 0
+    assert res["deferred_reports"] == 1
+    assert res["sheet_updates"] == []
+    assert db["fights_all"].count_documents({}) == 0
+    assert db["reports"].find_one({"code": "ABC123"})["inputs_hash"] == "stale"
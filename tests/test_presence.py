@@ -0,0 +1,124 @@
+import mongomock
+
+from pebble.blocks import build_blocks
+from pebble.participation import build_mythic_participation
+from pebble.presence import PresenceTracker, ingest_report_presence
+from pebble.wcl_client import WCLClient
+
+
+def test_tracker_splits_on_gaps_and_clips_to_fight():
+    tracker = PresenceTracker([1, 2], gap_ms=100, clip=(0, 1000))
+    tracker.feed([{"timestamp": 50, "sourceID": 1}, {"timestamp": 120, "targetID": 1}])
+    tracker.feed([{"timestamp": 600, "sourceID": 1}, {"timestamp": 950, "sourceID": 2}])
+    tracker.feed([{"timestamp": 700, "sourceID": 99}])  # not a player
+
+    assert tracker.intervals() == {1: [(0, 120), (600, 600)], 2: [(950, 1000)]}
+    assert tracker.events_seen == 5
+
+
+def test_iter_report_events_follows_next_page_timestamp():
+    client = WCLClient("id", "secret")
+    calls = []
+    pages = {0: ([{"timestamp": 1}], 500), 500: ([{"timestamp": 600}], 900), 900: ([], None)}
+
+    def fake_post(query, variables=None):
+        calls.append(variables["start"])
+        data, nxt = pages[variables["start"]]
+        return {"data": {"reportData": {"report": {"events": {"data": data, "nextPageTimestamp": nxt}}}}}
+
+    client._post = fake_post
+    out = list(client.iter_report_events("ABC", 0, 1000, fight_ids=[3]))
+
+    assert calls == [0, 500, 900]
+    assert out == [[{"timestamp": 1}], [{"timestamp": 600}], []]
+
+
+def test_ingest_report_presence_stores_intervals():
+    db = mongomock.MongoClient().db
+    key = {"encounter_id": 1, "difficulty": 5, "start_rounded_ms": 10_000, "end_rounded_ms": 20_000}
+
+    class FakeWCL:
+        def iter_report_events(self, code, start, end, fight_ids=None):
+            assert fight_ids == [4]
+            yield [{"timestamp": 0, "sourceID": 1}, {"timestamp": 2_000, "sourceID": 2}]
+            yield [{"timestamp": 9_000, "sourceID": 1}]
+
+    written = ingest_report_presence(
+        FakeWCL(),
+        db,
+        code="ABC",
+        report_start_ms=10_000,
+        night_id="N1",
+        fights=[{"id": 4, "key": key, "rel_start_ms": 0, "rel_end_ms": 10_000}],
+        actor_map={
+            1: {"actor_id": 1, "name": "Alice-Illidan", "type": "Player"},
+            2: {"actor_id": 2, "name": "Bob-Illidan", "type": "Player"},
+        },
+        gap_ms=5_000,
+    )
+
+    assert written == {4: 3}
+    spans = sorted((d["name"], d["start_ms"], d["end_ms"]) for d in db["presence_intervals"].find())
+    assert spans == [
+        ("Alice-Illidan", 10_000, 10_000),
+        ("Alice-Illidan", 19_000, 20_000),
+        ("Bob-Illidan", 10_000, 12_000),
+    ]
+
+
+def test_participation_prefers_presence_and_blocks_use_intervals():
+    key = {"encounter_id": 1, "difficulty": 5, "start_rounded_ms": 0, "end_rounded_ms": 1000}
+    fights = [
+        {**key, "id": 1, "report_code": "ABC", "night_id": "N1", "has_presence": True,
+         "fight_abs_start_ms": 0, "fight_abs_end_ms": 1000, "participants": [{"name": "Alice"}]},
+        {"encounter_id": 2, "difficulty": 5, "start_rounded_ms": 2000, "end_rounded_ms": 3000,
+         "id": 2, "report_code": "ABC", "night_id": "N1",
+         "fight_abs_start_ms": 2000, "fight_abs_end_ms": 3000, "participants": [{"name": "Alice"}]},
+    ]
+    presence = [
+        {**key, "name": "Alice", "start_ms": 0, "end_ms": 200},
+        {**key, "name": "Alice", "start_ms": 600, "end_ms": 1000},
+    ]
+
+    rows = build_mythic_participation(fights, presence=presence)
+
+    assert [(r["fight_id"], r["start_ms"], r["end_ms"]) for r in rows] == [(1, 0, 1000), (2, 2000, 3000)]
+    assert rows[0]["intervals"] == [[0, 200], [600, 1000]]
+
+    blocks = build_blocks(rows, break_range=(500, 550), fights_all=fights)
+    assert [(b["half"], b["start_ms"], b["end_ms"]) for b in blocks] == [
+        ("pre", 0, 200),
+        ("post", 600, 3000),
+    ]
+
+
+def test_ingest_report_presence_walks_fights_concurrently():
+    import threading
+
+    db = mongomock.MongoClient().db
+    both_walking = threading.Barrier(2, timeout=5)
+
+    class FakeWCL:
+        def iter_report_events(self, code, start, end, fight_ids=None):
+            # Each walk waits for the other, so this only returns when the two
+            # fights are read at the same time.
+            both_walking.wait()
+            yield [{"timestamp": start, "sourceID": 1}]
+
+    fights = [
+        {"id": fid, "key": {"encounter_id": fid}, "rel_start_ms": fid * 1_000, "rel_end_ms": fid * 1_000 + 500}
+        for fid in (1, 2)
+    ]
+    written = ingest_report_presence(
+        FakeWCL(),
+        db,
+        code="ABC",
+        report_start_ms=0,
+        night_id="N1",
+        fights=fights,
+        actor_map={1: {"actor_id": 1, "name": "Alice-Illidan", "type": "Player"}},
+        max_workers=2,
+    )
+
+    assert list(written) == [1, 2]
+    assert [d["fight_id"] for d in db["presence_intervals"].find()] == [1, 2]
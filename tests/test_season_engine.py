@@ -0,0 +1,111 @@
+import copy
+import sys
+from pathlib import Path
+
+import mongomock
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from pebble.attendance import build_attendance_rows
+from pebble.bench import bench_season, synthetic_season
+from pebble.night_compute import NightTimeSettings, compute_nights
+from pebble.season_engine import (
+    attendance_rows_frame,
+    compute_nights_columnar,
+    materialize_season_frame,
+)
+from pebble.utils.names import NameResolver
+from pebble.week_agg import materialize_rankings, materialize_week_totals
+
+TS = NightTimeSettings(
+    break_start_pt="20:30",
+    break_end_pt="21:30",
+    min_gap_minutes=10,
+    max_gap_minutes=30,
+    mythic_post_extension_min=5,
+)
+
+
+def _season():
+    inputs, roster = synthetic_season(6, pulls=30, mains=8, bench_size=3, seed=4)
+    # A re-logged pull overlapping the previous one sends its night through
+    # the scalar fallback.
+    fights = inputs[2].fights_all
+    mythic = next(f for f in fights[5:] if f["is_mythic"])
+    dup = copy.deepcopy(mythic)
+    dup["id"] = 999
+    dup["fight_abs_start_ms"] -= 30_000
+    dup["fight_abs_end_ms"] -= 30_000
+    fights.append(dup)
+    # An empty night yields no result in either engine.
+    inputs[3].fights_all = []
+    return inputs, roster
+
+
+def _strip(docs):
+    return [{k: v for k, v in doc.items() if k not in ("_id", "updated_at")} for doc in docs]
+
+
+def test_columnar_nights_match_loop():
+    inputs, roster = _season()
+    resolver = NameResolver([r["main"] for r in roster])
+    loop = compute_nights(inputs, resolver, TS)
+    columnar = compute_nights_columnar(inputs, resolver, TS)
+    assert loop[3] is None
+    assert columnar == loop
+    assert any(r and r.resolver_unmatched for r in loop)
+
+    audited = compute_nights_columnar(inputs, resolver, TS, audit_participation=True)
+    assert [r and r.block_docs for r in audited] == [r and r.block_docs for r in loop]
+    assert all(r is None or r.part_rows for r in audited)
+
+
+def test_season_frame_matches_loop_aggregates():
+    inputs, roster = _season()
+    resolver = NameResolver([r["main"] for r in roster])
+    db = mongomock.MongoClient().db
+    roster = roster + [
+        {"main": "Retired", "active": False},
+        {"main": "Future", "join_night": "2099-01-01"},
+    ]
+    db["team_roster"].insert_many([dict(r) for r in roster])
+    for result in compute_nights(inputs, resolver, TS):
+        if result is None:
+            continue
+        db["night_qa"].insert_one(dict(result.qa_doc))
+        db["bench_night_totals"].insert_many([dict(doc) for doc in result.bench_docs])
+    # Out minutes, a missing availability flag and a bench-only main.
+    db["bench_night_totals"].update_one(
+        {"night_id": inputs[0].night}, {"$set": {"bench_out_min": 5}}
+    )
+    db["bench_night_totals"].update_one(
+        {"night_id": inputs[1].night}, {"$unset": {"avail_post": ""}}
+    )
+    db["bench_night_totals"].insert_one(
+        {"night_id": inputs[4].night, "main": "Pug", "played_total_min": 12, "bench_total_min": 0}
+    )
+
+    _, loop_weeks = materialize_week_totals(db, include_docs=True)
+    _, loop_ranks = materialize_rankings(db, include_docs=True)
+    loop_attendance = build_attendance_rows(db)
+
+    weeks, ranks, attendance = materialize_season_frame(db)
+    assert _strip(weeks) == _strip(loop_weeks)
+    assert _strip(ranks) == _strip(loop_ranks)
+    assert attendance == loop_attendance
+    assert _strip(db["bench_week_totals"].find()) == _strip(loop_weeks)
+    assert _strip(db["bench_rankings"].find()) == _strip(loop_ranks)
+
+
+def test_attendance_frame_handles_empty_collections():
+    db = mongomock.MongoClient().db
+    assert attendance_rows_frame([], [], []) == build_attendance_rows(db)
+    db["team_roster"].insert_one({"main": "Alice"})
+    assert attendance_rows_frame([], [], [{"main": "Alice"}]) == build_attendance_rows(db)
+    assert materialize_season_frame(db)[:2] == ([], [])
+
+
+def test_bench_season_reports_both_engines():
+    res = bench_season(weeks=2, pulls=20, mains=6, iterations=1)
+    assert res["nights"] == 4
+    assert res["loop_nights_ms"] >= 0 and res["columnar_nights_ms"] >= 0
+    assert res["loop_season_ms"] >= 0 and res["columnar_season_ms"] >= 0
@@ -1,3 +1,4 @@
+import pytest
 import requests
 import time
 from tenacity import nap
@@ -19,6 +20,8 @@ def test_post_retries(monkeypatch):
             raise requests.ConnectionError("boom")
 
         class Resp:
+            headers = {}
+
             def raise_for_status(self):
                 return None
 
@@ -41,6 +44,9 @@ class DummyRedis:
     def get(self, key):
         return self.store.get(key)
 
+    def mget(self, keys):
+        return [self.store.get(k) for k in keys]
+
     def setex(self, key, ttl, value):
         self.store[key] = value
         self.last_ttl = ttl
@@ -87,3 +93,371 @@ def test_fetch_report_bundle_ttl(monkeypatch):
     client2._post = fake_post2
     client2.fetch_report_bundle("OLD")
     assert dr2.last_ttl == wcl_client.CACHE_TTL_LONG
+
+
+def test_fetch_report_bundles_uses_aliases_and_caches_per_code():
+    dr = DummyRedis()
+    dr.store["test:HIT"] = b'{"code": "HIT", "startTime": 0}'
+    client = WCLClient("id", "secret", redis_client=dr, cache_prefix="test:")
+    client._ensure_token = lambda: None
+    posts = []
+
+    def fake_post(query, variables=None):
+        posts.append((query, variables))
+        return {
+            "data": {
+                "reportData": {
+                    "r0": {"code": variables["c0"], "startTime": 0},
+                    "r1": {"code": variables["c1"], "startTime": 0},
+                }
+            }
+        }
+
+    client._post = fake_post
+    res = client.fetch_report_bundles(["A", "HIT", "B"])
+
+    assert list(res) == ["A", "HIT", "B"]
+    assert res["HIT"]["code"] == "HIT"
+    assert len(posts) == 1
+    query, variables = posts[0]
+    assert "r0: report(code: $c0)" in query
+    assert "r1: report(code: $c1)" in query
+    assert variables["c0"] == "A" and variables["c1"] == "B"
+    assert {"test:A", "test:B"} <= set(dr.store)
+
+    client.fetch_report_bundles(["A", "B"])
+    assert len(posts) == 1
+
+
+def test_token_shared_through_redis(monkeypatch):
+    dr = DummyRedis()
+    requests_made = []
+
+    class TokenResp:
+        def raise_for_status(self):
+            return None
+
+        def json(self):
+            return {"access_token": "tok-1", "expires_in": 3600}
+
+    def fake_post(url, *args, **kwargs):
+        requests_made.append(url)
+        return TokenResp()
+
+    first = WCLClient("id", "secret", redis_client=dr, cache_prefix="test:", share_token=True)
+    first._session.post = fake_post
+    first._ensure_token()
+    assert len(requests_made) == 1
+    assert any(key.startswith("test:oauth:") for key in dr.store)
+
+    second = WCLClient("id", "secret", redis_client=dr, cache_prefix="test:", share_token=True)
+    second._session.post = fake_post
+    second._ensure_token()
+    assert len(requests_made) == 1
+    assert second._session.headers["Authorization"] == "Bearer tok-1"
+
+
+def test_get_shared_client_reuses_instance():
+    from pebble.config_loader import MongoConfig, Settings, SheetsConfig, SheetsTriggers, WCLConfig
+
+    wcl_client.clear_shared_clients()
+    settings = Settings(
+        sheets=SheetsConfig(spreadsheet_id="1", triggers=SheetsTriggers(ingest_compute_week="Reports!B2")),
+        mongo=MongoConfig(uri="mongodb://example"),
+        wcl=WCLConfig(client_id="id", client_secret="secret"),
+    )
+    try:
+        a = wcl_client.get_shared_client(settings)
+        assert wcl_client.get_shared_client(settings) is a
+        settings.wcl.client_id = "other"
+        assert wcl_client.get_shared_client(settings) is not a
+    finally:
+        wcl_client.clear_shared_clients()
+
+
+def test_fights_since_keeps_pages_read_before_a_null_page():
+    client = WCLClient("id", "secret")
+    pages = [
+        {"code": "ABC", "fights": [{"id": 1}, {"id": 2}]},
+        {"code": "ABC", "fights": [{"id": 3}, {"id": 4}]},
+        None,
+    ]
+    client._post = lambda query, variables=None: {"data": {"reportData": {"report": pages.pop(0)}}}
+
+    report = client.fetch_report_fights_since("ABC", 1, window=2)
+
+    assert [f["id"] for f in report["fights"]] == [1, 2, 3, 4]
+
+    client._post = lambda query, variables=None: {"data": {"reportData": {"report": None}}}
+    assert client.fetch_report_fights_since("ABC", 1) is None
+
+
+def test_rate_limit_budget_reserves_points_for_live_fetches():
+    budget = wcl_client.RateLimitBudget(reserve_fraction=0.25)
+    assert budget.allows(wcl_client.PRIORITY_LOW)  # unknown budget never blocks
+
+    budget.update({"limitPerHour": 3600, "pointsSpentThisHour": 2000, "pointsResetIn": 600})
+    assert budget.remaining == 1600
+    assert budget.allows(wcl_client.PRIORITY_LOW)
+
+    budget.update({"limitPerHour": 3600, "pointsSpentThisHour": 2800, "pointsResetIn": 600})
+    assert not budget.allows(wcl_client.PRIORITY_LOW)
+    assert budget.allows(wcl_client.PRIORITY_LIVE)
+    assert budget.snapshot()["points_remaining"] == 800
+
+
+def test_refresh_rate_limit_reads_rate_limit_data(monkeypatch):
+    client = WCLClient("id", "secret")
+    client._ensure_token = lambda: None
+    posts = []
+
+    def fake_post(url, json=None, timeout=None):
+        posts.append(json["query"])
+
+        class Resp:
+            headers = {}
+
+            def raise_for_status(self):
+                return None
+
+            def json(self):
+                return {
+                    "data": {
+                        "rateLimitData": {
+                            "limitPerHour": 3600,
+                            "pointsSpentThisHour": 100,
+                            "pointsResetIn": 1200,
+                        }
+                    }
+                }
+
+        return Resp()
+
+    monkeypatch.setattr(client._session, "post", fake_post)
+    budget = client.refresh_rate_limit()
+    assert budget.remaining == 3500
+    client.refresh_rate_limit()
+    assert len(posts) == 1  # later readings ride along with regular requests
+
+
+
+def test_budget_refreshes_from_responses_not_extra_queries(monkeypatch):
+    client = WCLClient("id", "secret", rate_limit_budget=wcl_client.RateLimitBudget(refresh_interval=60))
+    client._ensure_token = lambda: None
+    queries = []
+
+    def post(url, json=None, timeout=None):
+        queries.append(json["query"])
+
+        class Resp:
+            headers = {"X-RateLimit-Limit": "3600", "X-RateLimit-Remaining": "3000", "X-RateLimit-Reset": "900"}
+
+            def raise_for_status(self):
+                return None
+
+            def json(self):
+                data = {"reportData": {"report": {"code": "ABC", "startTime": 0}}}
+                if "rateLimitData" in queries[-1]:
+                    data["rateLimitData"] = {"limitPerHour": 3600, "pointsSpentThisHour": 700, "pointsResetIn": 900}
+                return {"data": data}
+
+        return Resp()
+
+    monkeypatch.setattr(client._session, "post", post)
+
+    # No reading yet: the first bundle query carries rateLimitData.
+    client.fetch_report_bundle("ABC")
+    assert "rateLimitData" in queries[0]
+    assert client.budget.remaining == 2900
+    # A fresh reading makes refresh_rate_limit free; the headers keep it current.
+    assert client.refresh_rate_limit() is client.budget
+    client._memory_cache.clear()
+    client.fetch_report_bundle("ABC")
+    assert len(queries) == 2 and "rateLimitData" not in queries[1]
+    assert client.budget.remaining == 3000
+
+def test_cache_codec_round_trip_and_reads_legacy_json():
+    report = {"code": "ABC", "fights": [{"id": i, "name": "Boss"} for i in range(50)]}
+    packed = wcl_client.encode_bundle(report, "zlib")
+    assert packed.startswith(b"PBL")
+    assert len(packed) < len(wcl_client.encode_bundle(report, "json"))
+    assert wcl_client.decode_bundle(packed) == report
+
+    dr = DummyRedis()
+    dr.store["test:ABC"] = b'{"code": "ABC", "startTime": 0}'
+    client = WCLClient("id", "secret", redis_client=dr, cache_prefix="test:")
+    assert client._cached_report("ABC") == {"code": "ABC", "startTime": 0}
+
+    dr.store["test:BAD"] = b"PBL\x09\x02junk"
+    assert client._cached_report("BAD") is None
+
+
+def test_cache_stats_reports_compression(monkeypatch):
+    class ScanRedis(DummyRedis):
+        def scan_iter(self, pattern):
+            prefix = pattern.rstrip("*")
+            return [k for k in self.store if k.startswith(prefix)]
+
+    dr = ScanRedis()
+    report = {"code": "ABC", "fights": [{"id": i, "name": "Boss"} for i in range(50)]}
+    dr.store["test:ABC"] = wcl_client.encode_bundle(report, "zlib")
+    dr.store["test:OLD"] = b'{"code": "OLD"}'
+    dr.store["test:oauth:abcd"] = b'{"access_token": "t"}'
+    monkeypatch.setattr(wcl_client.redis, "from_url", lambda url: dr)
+
+    stats = wcl_client.cache_stats("redis://x", "test:")
+
+    assert stats["keys"] == 2
+    assert stats["codecs"] == {"zlib": 1, "legacy": 1}
+    assert stats["raw_bytes"] > stats["stored_bytes"]
+    assert stats["compression_ratio"] > 1
+
+
+def test_report_lru_evicts_and_expires():
+    lru = wcl_client.ReportLRU(max_entries=2, max_age=100)
+    lru.put("A", {"code": "A"}, ttl=10, now=0)
+    lru.put("B", {"code": "B"}, ttl=1000, now=0)
+    assert lru.get("A", now=1) == {"code": "A"}
+    lru.put("C", {"code": "C"}, ttl=1000, now=1)
+    assert lru.get("B", now=2) is None  # least recently used
+    assert lru.get("A", now=11) is None  # report TTL elapsed
+    assert lru.get("C", now=100) == {"code": "C"}
+    assert lru.get("C", now=101) is None  # capped by max_age
+
+
+def test_memory_tier_sits_in_front_of_redis():
+    dr = DummyRedis()
+    dr.store["test:ABC"] = wcl_client.encode_bundle({"code": "ABC", "startTime": 0})
+    client = WCLClient("id", "secret", redis_client=dr, cache_prefix="test:")
+    reads = {"n": 0}
+    original_get = dr.get
+
+    def counting_get(key):
+        reads["n"] += 1
+        return original_get(key)
+
+    dr.get = counting_get
+
+    assert client.fetch_report_bundle("ABC")["code"] == "ABC"
+    assert client.fetch_report_bundle("ABC")["code"] == "ABC"
+    assert reads["n"] == 1
+    assert client.cache_counters() == {
+        "memory": {"hits": 1, "misses": 1},
+        "shared": {"hits": 1, "misses": 0, "stale": 0},
+    }
+
+    disabled = WCLClient("id", "secret", redis_client=dr, cache_prefix="test:", memory_cache_entries=0)
+    disabled.fetch_report_bundle("ABC")
+    disabled.fetch_report_bundle("ABC")
+    assert reads["n"] == 3
+
+
+def test_memory_tier_expires_with_the_shared_entry(monkeypatch):
+    monkeypatch.setattr(wcl_client.time, "time", lambda: 1_000.0)
+    dr = DummyRedis()
+    # An old report (long TTL) whose shared entry has 5s left.
+    dr.store["test:ABC"] = wcl_client.encode_bundle({"code": "ABC", "startTime": 0}, expires_at=1_005)
+    client = WCLClient("id", "secret", redis_client=dr, cache_prefix="test:")
+
+    client.fetch_report_bundle("ABC")
+
+    assert client._memory_cache.get("ABC", now=1_004) == {"code": "ABC", "startTime": 0}
+    assert client._memory_cache.get("ABC", now=1_005) is None
+
+
+def test_cached_report_bundles_uses_single_mget():
+    dr = DummyRedis()
+    dr.store["test:A"] = wcl_client.encode_bundle({"code": "A", "startTime": 0})
+    dr.store["test:B"] = b'{"code": "B", "startTime": 0}'
+    calls = []
+    original_mget = dr.mget
+    dr.mget = lambda keys: calls.append(list(keys)) or original_mget(keys)
+    client = WCLClient("id", "secret", redis_client=dr, cache_prefix="test:")
+
+    res = client.cached_report_bundles(["A", "B", "C"])
+
+    assert sorted(res) == ["A", "B"]
+    assert calls == [["test:A", "test:B", "test:C"]]
+    assert client.cache_counters()["shared"] == {"hits": 2, "misses": 1, "stale": 0}
+
+    assert sorted(client.cached_report_bundles(["A", "B"])) == ["A", "B"]
+    assert len(calls) == 1  # served by the in-process tier
+
+
+def test_disk_cache_backend_round_trip_and_expiry(tmp_path, monkeypatch):
+    from pebble.cache_backends import DiskCacheBackend
+
+    backend = DiskCacheBackend(tmp_path)
+    backend.set("test:A", b"alpha", 60)
+    backend.set("test:B", "beta", 60)
+    backend.set("other:C", b"gamma", 60)
+
+    assert backend.get("test:A") == b"alpha"
+    assert backend.get_many(["test:B", "test:missing"]) == [b"beta", None]
+    with monkeypatch.context() as m:
+        m.setattr(DiskCacheBackend, "_read", lambda path: pytest.fail("scan should not open values"))
+        assert sorted(backend.scan("test:")) == ["test:A", "test:B"]
+    assert not list(tmp_path.glob("*/.tmp-*"))
+
+    assert backend.delete(["other:C"]) == 1
+    assert len(list(tmp_path.glob("??/*"))) == 4  # two values, two sidecars
+
+    real_time = time.time
+    monkeypatch.setattr("pebble.cache_backends.time.time", lambda: real_time() + 120)
+    assert backend.get("test:A") is None
+    assert list(backend.scan("test:")) == []
+
+
+def test_flush_cache_and_client_work_with_memory_backend():
+    from pebble.cache_backends import MemoryCacheBackend
+
+    backend = MemoryCacheBackend()
+    client = WCLClient("id", "secret", cache_backend=backend, cache_prefix="test:", memory_cache_entries=0)
+    client._ensure_token = lambda: None
+    calls = {"n": 0}
+
+    def fake_post(query, variables=None):
+        calls["n"] += 1
+        return {"data": {"reportData": {"report": {"code": variables["code"], "startTime": 0}}}}
+
+    client._post = fake_post
+    client.fetch_report_bundle("ABC")
+    client.fetch_report_bundle("ABC")
+    assert calls["n"] == 1
+    assert wcl_client.cache_stats(backend, "test:")["keys"] == 1
+
+    backend.set("test:oauth:abc", b"token", 60)
+    assert wcl_client.flush_cache(backend, "test:") == 1
+    assert backend.get("test:oauth:abc") == b"token"
+    client.fetch_report_bundle("ABC")
+    assert calls["n"] == 2
+
+
+def test_stale_fresh_report_is_served_and_refreshed_in_background(monkeypatch):
+    dr = DummyRedis()
+    client = WCLClient(
+        "id", "secret", redis_client=dr, cache_prefix="test:", memory_cache_entries=0, stale_ttl=3600
+    )
+    client._ensure_token = lambda: None
+    now_ms = int(time.time() * 1000)
+    versions = iter(["v1", "v2"])
+    posts = []
+
+    def fake_post(query, variables=None):
+        posts.append(variables["code"])
+        return {"data": {"reportData": {"report": {"code": "ABC", "startTime": now_ms, "title": next(versions)}}}}
+
+    client._post = fake_post
+    assert client.fetch_report_bundle("ABC")["title"] == "v1"
+    assert dr.last_ttl == wcl_client.CACHE_TTL_SHORT + 3600
+
+    real_time = time.time
+    monkeypatch.setattr(wcl_client.time, "time", lambda: real_time() + wcl_client.CACHE_TTL_SHORT + 1)
+    assert client.fetch_report_bundle("ABC")["title"] == "v1"  # stale, served immediately
+    assert client.cached_report_bundles(["ABC"])["ABC"]["title"] in {"v1", "v2"}
+    client.wait_for_refreshes(timeout=5)
+
+    assert posts == ["ABC", "ABC"]  # one background refresh despite two stale reads
+    assert client.cache_counters()["shared"]["stale"] >= 1
+    monkeypatch.setattr(wcl_client.time, "time", real_time)
+    assert client.fetch_report_bundle("ABC")["title"] == "v2"
@@ -0,0 +1,144 @@
+import json
+
+import pytest
+import requests
+from click.testing import CliRunner
+
+from pebble import cli
+from pebble.wcl_client import PRIORITY_LOW, WCLClient
+from pebble.wcl_standin import StandinOptions, WCLStandin, load_recordings, save_recording
+
+
+def _bundle(code, start_ms=1_700_000_000_000):
+    return {
+        "code": code,
+        "title": f"Report {code}",
+        "startTime": start_ms,
+        "endTime": start_ms + 3 * 60 * 60 * 1000,
+        "owner": {"name": "Creator"},
+        "fights": [
+            {"id": i, "encounterID": 3000 + i, "name": f"Boss {i}", "difficulty": 5,
+             "startTime": i * 600_000, "endTime": i * 600_000 + 300_000,
+             "friendlyPlayers": [1, 2], "kill": True}
+            for i in range(1, 4)
+        ],
+        "masterData": {
+            "actors": [
+                {"id": 1, "name": "Alice", "server": "Illidan", "subType": "Mage", "type": "Player"},
+                {"id": 2, "name": "Bob", "server": "Illidan", "subType": "Druid", "type": "Player"},
+            ]
+        },
+    }
+
+
+def test_client_round_trip_against_standin():
+    recordings = {"AAA": _bundle("AAA"), "BBB": _bundle("BBB")}
+    with WCLStandin(recordings) as standin:
+        client = WCLClient("id", "secret", base_url=standin.base_url, token_url=standin.token_url)
+
+        assert client.fetch_report_bundle("AAA")["title"] == "Report AAA"
+        assert set(client.fetch_report_bundles(["AAA", "BBB"])) == {"AAA", "BBB"}
+        since = client.fetch_report_fights_since("AAA", 2)
+        assert [f["id"] for f in since["fights"]] == [2, 3]
+        # Full pages keep paging, so growth past one window is not dropped.
+        paged = client.fetch_report_fights_since("AAA", 1, window=2)
+        assert [f["id"] for f in paged["fights"]] == [1, 2, 3]
+        assert client.refresh_rate_limit(force=True).limit_per_hour == 3600
+        with pytest.raises(RuntimeError):
+            client._post(
+                "query Q($code: String!) { reportData { report(code: $code) { code } } }",
+                {"code": "NOPE"},
+            )
+
+        assert standin.stats.token_requests == 1
+        assert standin.stats.missing_reports == {"NOPE": 1}
+
+
+def test_standin_pages_recorded_events():
+    bundle = _bundle("AAA")
+    bundle["events"] = [{"timestamp": ts, "fight": 1 + ts % 2, "sourceID": 1} for ts in range(10)]
+    with WCLStandin({"AAA": bundle}) as standin:
+        client = WCLClient("id", "secret", base_url=standin.base_url, token_url=standin.token_url)
+        pages = list(client.iter_report_events("AAA", 2, 9, fight_ids=[1], limit=2))
+        assert "events" not in client.fetch_report_bundle("AAA")
+
+    assert [[ev["timestamp"] for ev in page] for page in pages] == [[2, 4], [6, 8]]
+
+
+def test_null_rate_limit_data_keeps_the_header_reading():
+    options = StandinOptions(limit_per_hour=100, null_rate_limit_data=True)
+    with WCLStandin({}, options) as standin:
+        client = WCLClient("id", "secret", base_url=standin.base_url, token_url=standin.token_url)
+        budget = client.refresh_rate_limit(force=True)
+
+    assert budget.limit_per_hour == 100
+    assert budget.remaining == 100
+    assert budget.allows(PRIORITY_LOW)
+
+
+def test_standin_injects_throttling_with_rate_limit_headers():
+    options = StandinOptions(error_rate_429=1.0, limit_per_hour=100, seed=1)
+    with WCLStandin({}, options) as standin:
+        resp = requests.post(standin.base_url, json={"query": "{ rateLimitData { limitPerHour } }"}, timeout=5)
+
+    assert resp.status_code == 429
+    assert resp.headers["Retry-After"] == "1"
+    assert resp.headers["X-RateLimit-Limit"] == "100"
+    assert standin.stats.throttled == 1
+
+
+def test_bench_ingest_walks_recorded_events_for_presence(tmp_path, monkeypatch):
+    bundle = _bundle("AAA")
+    bundle["events"] = [
+        {"timestamp": f["startTime"] + 1_000, "fight": f["id"], "sourceID": pid}
+        for f in bundle["fights"]
+        for pid in (1, 2)
+    ]
+    save_recording(tmp_path, "AAA", bundle)
+    save_recording(tmp_path / "plain", "AAA", _bundle("AAA"))
+    logged = []
+
+    class Log:
+        def info(self, msg, extra=None):
+            logged.append((msg, extra))
+
+    monkeypatch.setattr(cli, "setup_logging", lambda: Log())
+    args = ["bench", "ingest", "--latency-ms", "0", "--jitter-ms", "0", "--iterations", "1", "--events-presence"]
+
+    result = CliRunner().invoke(cli.cli, args + ["--recordings", str(tmp_path)])
+
+    assert result.exit_code == 0, result.output
+    (run,) = logged[-1][1]["runs"]
+    assert run["presence_intervals"] > 0
+
+    result = CliRunner().invoke(cli.cli, args + ["--recordings", str(tmp_path / "plain")])
+    assert result.exit_code != 0
+    assert "bench record --events" in result.output
+
+
+def test_bench_ingest_command_reports_cold_and_warm_runs(tmp_path, monkeypatch):
+    for code in ("AAA", "BBB"):
+        save_recording(tmp_path, code, _bundle(code))
+    assert sorted(load_recordings(tmp_path)) == ["AAA", "BBB"]
+
+    logged = []
+
+    class Log:
+        def info(self, msg, extra=None):
+            logged.append((msg, extra))
+
+    monkeypatch.setattr(cli, "setup_logging", lambda: Log())
+    result = CliRunner().invoke(
+        cli.cli,
+        ["bench", "ingest", "--recordings", str(tmp_path), "--latency-ms", "0", "--jitter-ms", "0"],
+    )
+
+    assert result.exit_code == 0, result.output
+    msg, extra = logged[-1]
+    assert msg == "bench ingest complete"
+    cold, warm = extra["runs"]
+    assert cold["reports"] == 2 and warm["reports"] == 2
+    assert cold["fights"] == 6
+    assert cold["graphql_requests"] >= 2
+    assert warm["graphql_requests"] == 0
+    assert json.dumps(extra)  # log payload stays JSON serializable
@@ -3,6 +3,7 @@ import mongomock
 from pebble.week_agg import (
     materialize_rankings,
     materialize_week_totals,
+    merge_week_totals,
     week_id_from_night_id,
 )
 
@@ -337,3 +338,80 @@ def test_materialize_rankings_skips_roster_after_leave_date():
             "bench_to_played_ratio": None,
         }
     ]
+
+
+def test_swap_publication_matches_replace():
+    def run(mode):
+        db = mongomock.MongoClient().db
+        db["bench_night_totals"].insert_many(
+            [
+                {"night_id": "2024-07-02", "main": "Alice-Illidan", "played_pre_min": 5, "bench_post_min": 7},
+                {"night_id": "2024-07-10", "main": "Bob-Illidan", "played_post_min": 9, "bench_pre_min": 3},
+            ]
+        )
+        db["team_roster"].insert_many([{"main": "Alice-Illidan"}, {"main": "Bob-Illidan"}])
+        # Stale rows from an earlier run must not survive either mode.
+        db["bench_week_totals"].insert_one({"game_week": "2024-06-25", "main": "Gone-Illidan"})
+        weeks = materialize_week_totals(db, publish_mode=mode)
+        ranks = materialize_rankings(db, publish_mode=mode)
+        week_rows = list(db["bench_week_totals"].find({}, {"_id": 0, "updated_at": 0}))
+        rank_rows = list(db["bench_rankings"].find({}, {"_id": 0, "updated_at": 0}))
+        return weeks, ranks, week_rows, rank_rows, sorted(db.list_collection_names())
+
+    swap = run("swap")
+    assert swap == run("replace")
+    assert swap[0] == 4
+    assert "bench_week_totals__staging" not in swap[4]
+
+
+def test_merge_week_totals_refreshes_only_changed_weeks():
+    db = mongomock.MongoClient().db
+    db["bench_night_totals"].insert_many(
+        [
+            {"night_id": "2024-07-03", "main": "Alice-Illidan", "played_pre_min": 30, "bench_post_min": 5},
+            {"night_id": "2024-07-10", "main": "Alice-Illidan", "played_pre_min": 20},
+            {"night_id": "2024-07-15", "main": "Bob-Illidan", "bench_pre_min": 15, "bench_post_min": 10},
+        ]
+    )
+    db["team_roster"].insert_many(
+        [
+            {"main": "Alice-Illidan"},
+            {"main": "Bob-Illidan"},
+            {"main": "Cara-Illidan", "join_night": "2024-07-09"},
+        ]
+    )
+    materialize_week_totals(db)
+    untouched = db["bench_week_totals"].find_one({"game_week": "2024-07-02", "main": "Alice-Illidan"})
+
+    # Alice's night is recomputed without her; Bob takes her place.
+    db["bench_night_totals"].delete_one({"night_id": "2024-07-10"})
+    db["bench_night_totals"].insert_one({"night_id": "2024-07-10", "main": "Bob-Illidan", "played_post_min": 40})
+
+    pipelines = []
+    real_aggregate = db["bench_night_totals"].aggregate
+
+    def recording_aggregate(pipeline, *args, **kwargs):
+        pipelines.append(pipeline)
+        return real_aggregate(pipeline, *args, **kwargs)
+
+    db["bench_night_totals"].aggregate = recording_aggregate
+    merged = merge_week_totals(db, ["2024-07-10"], db["team_roster"].find({}, {"_id": 0}))
+
+    # $merge is tried first; mongomock lacks it, so rows are upserted instead.
+    assert "$merge" in pipelines[1][-1]
+    assert all("$merge" not in stage for stage in pipelines[2])
+    assert merged == 3
+    assert db["bench_week_totals"].find_one({"game_week": "2024-07-02", "main": "Alice-Illidan"}) == untouched
+
+    def rows():
+        return sorted(
+            (d["game_week"], d["main"], d["played_min"], d["bench_min"], d["bench_pre_min"], d["bench_post_min"])
+            for d in db["bench_week_totals"].find({})
+        )
+
+    incremental = rows()
+    assert ("2024-07-09", "Alice-Illidan", 0, 0, 0, 0) in incremental
+    assert ("2024-07-09", "Bob-Illidan", 40, 25, 15, 10) in incremental
+    materialize_week_totals(db)
+    assert incremental == rows()
+    assert merge_week_totals(db, [], []) == 0